@@ -5,422 +5,490 @@ Utilisation avancée de Prophet avec regressors externes
 
 Usage:
     python analyse_enrichie_complete.py
+    python cli.py report --produit "Poulet frais"
 
 Author: Claude Code
 Dataset: dataset_stock_hopital_ENRICHI.csv (v3.0)
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime, timedelta
-import warnings
 import json
+import warnings
+from datetime import datetime
 from pathlib import Path
 
-warnings.filterwarnings('ignore')
-
-# Configuration
-pd.set_option('display.max_columns', None)
-pd.set_option('display.float_format', '{:.2f}'.format)
-plt.style.use('seaborn-v0_8-darkgrid')
-plt.rcParams['figure.figsize'] = (16, 8)
-
-# ============================================================================
-# ÉTAPE 1 : IMPORTS ET CONFIGURATION
-# ============================================================================
-
-print("="*70)
-print("🏥 ANALYSE AVANCÉE AVEC DATASET ENRICHI")
-print("="*70)
-
-try:
-    from prophet import Prophet
-    from prophet.plot import add_changepoints_to_plot
-    from prophet.utilities import regressor_coefficients
-    print("✅ Prophet importé avec succès")
-    PROPHET_AVAILABLE = True
-except ImportError:
-    print("❌ Prophet non disponible. Installation : pip install prophet")
-    exit(1)
-
-# Results Manager (optionnel)
-try:
-    from results_manager import ResultsManager
-    results_mgr = ResultsManager()
-    results_mgr.create_run_directory()
-    print(f"✅ Results Manager : {results_mgr.get_run_path()}")
-    USE_RESULTS_MANAGER = True
-except:
-    print("⚠️  Results Manager non disponible")
-    USE_RESULTS_MANAGER = False
-
-# ============================================================================
-# ÉTAPE 2 : CHARGEMENT DU DATASET ENRICHI
-# ============================================================================
-
-print("\\n" + "="*70)
-print("📂 CHARGEMENT DU DATASET ENRICHI")
-print("="*70)
 
 FICHIER_CSV = "../data/dataset_stock_hopital_ENRICHI.csv"
 PRODUIT_ANALYSE = "Poulet frais"  # ← Changez ici
+HORIZON = 28
+
+# Réentraîner le modèle final en partant des paramètres du modèle
+# d'évaluation (warm-start Stan) : convergence en quelques itérations
+WARM_START = True
+
+
+def load_results_manager():
+    """Crée le dossier de l'exécution (Results Manager optionnel)"""
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+        results_mgr.create_run_directory()
+        print(f"✅ Results Manager : {results_mgr.get_run_path()}")
+        return results_mgr
+    except Exception:
+        print("⚠️  Results Manager non disponible")
+        return None
+
+
+def output_path(results_mgr, filename, subdirectory=None):
+    """
+    Chemin d'écriture d'un fichier : directement dans le dossier de
+    l'exécution si le Results Manager est actif, sinon dans le répertoire courant
+    """
+    if results_mgr is not None:
+        return results_mgr.output_path(filename, subdirectory)
+    return Path(filename)
+
+
+def export_baseline(demand, produit, horizon, results_mgr=None, instr=None):
+    """
+    Sans Prophet : prévisions baseline (ETS hebdomadaire ou TSB si demande
+    intermittente) au même format d'export
+
+    Returns:
+        dict: Résumé exporté
+    """
+    from baselines import forecast_baselines
+    from instrumentation import Instrumentation
+
+    instr = Instrumentation() if instr is None else instr
+    with instr.stage("predict", lignes=horizon):
+        export_df = forecast_baselines(demand, [produit], horizon=horizon)
+    methode = export_df['methode'].iloc[0]
+
+    filename_csv = output_path(
+        results_mgr, f'predictions_{produit.replace(" ", "_")}_enrichi_{horizon}j.csv'
+    )
+    with instr.stage("export", lignes=len(export_df)):
+        export_df.to_csv(filename_csv, index=False)
+    print(f"✅ {filename_csv} (baseline {methode})")
+
+    summary = {
+        "produit": produit,
+        "date_analyse": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "performance_modele": {"methode": f"Baseline NumPy ({methode})"},
+        "predictions": {
+            "horizon": f"{horizon} jours",
+            "total_prevu": round(export_df['quantite_prevue'].sum(), 2),
+            "moyenne_jour": round(export_df['quantite_prevue'].mean(), 2)
+        },
+        "etapes": instr.as_dict(),
+    }
+    add_stage_alerts(summary, results_mgr, produit)
+    filename_json = output_path(results_mgr, f'summary_{produit.replace(" ", "_")}_enrichi.json')
+    with open(filename_json, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"✅ {filename_json}")
+
+    if results_mgr is not None:
+        results_mgr.create_summary_file(produit, summary)
+    return summary
+
+
+def add_stage_alerts(summary, results_mgr, produit):
+    """Ajoute au résumé les étapes plus lentes que lors des exécutions précédentes"""
+    if results_mgr is not None:
+        from instrumentation import stage_regressions
+        summary["alertes_etapes"] = stage_regressions(results_mgr, produit, summary["etapes"])
+
+
+def save_plots(model_final, forecast, produit, results_mgr=None, preset="impression"):
+    """
+    Graphiques Prophet : prédictions, composants et changepoints
+
+    Le rendu (matplotlib, backend Agg) est délégué à plot_report : les
+    graphiques dont les données n'ont pas changé sont repris du cache.
+
+    Args:
+        preset: Résolution/format (voir plot_report.PRESETS, défaut 300 dpi)
+
+    Returns:
+        list: Fichiers créés (dans graphs/ du dossier de l'exécution)
+    """
+    from plot_report import payload_from_prophet, render_reports
+
+    report = render_reports([payload_from_prophet(model_final, forecast, produit)],
+                            results_mgr=results_mgr, preset=preset)
+    for filename in report["fichiers"]:
+        print(f"✅ {filename}")
+    return report["fichiers"]
+
+
+def run_analysis(fichier_csv=FICHIER_CSV, produit=PRODUIT_ANALYSE, horizon=HORIZON,
+                 preset="impression", profil=None, trace_memoire=None, fenetres=None,
+                 scenario=None):
+    """
+    Analyse complète d'un produit : chargement, Prophet avec régresseurs,
+    évaluation, prédictions, graphiques et export
+
+    Args:
+        fichier_csv: Dataset enrichi
+        produit: Produit à analyser
+        horizon: Nombre de jours à prédire
+        preset: Résolution des graphiques (miniature, ecran, svg, impression)
+        profil: Étape profilée avec cProfile (voir instrumentation.ETAPES)
+        trace_memoire: Étape suivie avec tracemalloc
+        fenetres: {holiday: (lower_window, upper_window)} (voir holiday_calendar)
+        scenario: Chocs appliqués aux régresseurs projetés (voir
+            regressor_projection.RegressorProjection.with_scenario)
+
+    Returns:
+        dict: Résumé exporté (summary JSON)
+    """
+    import numpy as np
+    import pandas as pd
+
+    from forecasting import PROPHET_AVAILABLE
+    from instrumentation import Instrumentation
+
+    warnings.filterwarnings('ignore')
+
+    # Configuration
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.float_format', '{:.2f}'.format)
+
+    # ============================================================================
+    # ÉTAPE 1 : IMPORTS ET CONFIGURATION
+    # ============================================================================
+
+    print("="*70)
+    print("🏥 ANALYSE AVANCÉE AVEC DATASET ENRICHI")
+    print("="*70)
+
+    if PROPHET_AVAILABLE:
+        print("✅ Prophet disponible")
+    else:
+        print("⚠️  Prophet non disponible : prévisions baseline NumPy (pip install prophet)")
+
+    # Results Manager (optionnel)
+    results_mgr = load_results_manager()
+    USE_RESULTS_MANAGER = results_mgr is not None
+
+    # Durée, CPU et mémoire de chaque étape (résumé JSON et README)
+    instr = Instrumentation(profil, trace_memoire,
+                            output_dir=results_mgr.get_run_path() if USE_RESULTS_MANAGER else None)
+
+    # ============================================================================
+    # ÉTAPE 2 : CHARGEMENT DU DATASET ENRICHI
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print("📂 CHARGEMENT DU DATASET ENRICHI")
+    print("="*70)
+
+    if not Path(fichier_csv).exists():
+        print(f"❌ Fichier introuvable : {fichier_csv}")
+        raise SystemExit(1)
+
+    # Lecture via le cache colonnaire (dates parsées, colonnes catégorielles)
+    from data_loader import load_stock_data
+    with instr.stage("chargement") as m:
+        df = load_stock_data(fichier_csv)
+        m["lignes"] = len(df)
+
+    print(f"✅ Dataset : {len(df):,} lignes × {len(df.columns)} colonnes")
+    print(f"📅 Période : {df['date'].min().date()} → {df['date'].max().date()}")
+
+    # ============================================================================
+    # ÉTAPE 3 : FILTRAGE ET AGRÉGATION
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print(f"🔍 ANALYSE DU PRODUIT : {produit}")
+    print("="*70)
+
+    # Matrice (date × produit) construite en une seule passe pour tous les produits
+    from demand_matrix import build_demand_matrix
+    with instr.stage("agregation", lignes=len(df)):
+        demand = build_demand_matrix(df)
+
+    print(f"✅ {demand.nb_sorties[demand.product_index(produit)]:,} sorties trouvées")
+
+    # Série quotidienne du produit : dates complètes, trous déjà comblés
+    with instr.stage("filtrage") as m:
+        daily = demand.daily_frame(produit)
+
+        # Renommer pour Prophet
+        prophet_df = daily.rename(columns={'date': 'ds', 'quantite': 'y'})
+        m["lignes"] = len(prophet_df)
+
+    print(f"✅ {len(daily)} jours préparés")
+
+    if not PROPHET_AVAILABLE:
+        return export_baseline(demand, produit, horizon, results_mgr, instr)
+
+    # ============================================================================
+    # ÉTAPE 4 : CONFIGURATION DES HOLIDAYS
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print("📅 CONFIGURATION DES HOLIDAYS")
+    print("="*70)
+
+    # Calendrier du site, construit sur tous les produits : un jour férié
+    # sans sortie du produit analysé reste un jour férié
+    from holiday_calendar import calendar_for
+    with instr.stage("holidays"):
+        calendar = calendar_for(demand, fenetres=fenetres)
+        holidays = calendar.holidays
+
+    jours = calendar.counts()
+    print(f"✅ {len(holidays)} holidays configurés")
+    print(f"   - Jours fériés : {jours.get('jour_ferie', 0)}")
+    print(f"   - Vacances : {jours.get('vacances_scolaires', 0)}")
+    print(f"   - COVID : {jours.get('covid_19', 0)}")
 
-if not Path(FICHIER_CSV).exists():
-    print(f"❌ Fichier introuvable : {FICHIER_CSV}")
-    exit(1)
-
-df = pd.read_csv(FICHIER_CSV)
-df['date'] = pd.to_datetime(df['date'])
-
-print(f"✅ Dataset : {len(df):,} lignes × {len(df.columns)} colonnes")
-print(f"📅 Période : {df['date'].min().date()} → {df['date'].max().date()}")
-
-# ============================================================================
-# ÉTAPE 3 : FILTRAGE ET AGRÉGATION
-# ============================================================================
-
-print("\\n" + "="*70)
-print(f"🔍 ANALYSE DU PRODUIT : {PRODUIT_ANALYSE}")
-print("="*70)
-
-produit_df = df[
-    (df['nom_produit'] == PRODUIT_ANALYSE) &
-    (df['type_sortie'] == 'CONSOMMATION')
-].copy()
-
-print(f"✅ {len(produit_df):,} sorties trouvées")
-
-# Agrégation quotidienne
-daily = produit_df.groupby('date').agg({
-    'quantite': 'sum',
-    'temperature': 'mean',
-    'taux_occupation': 'mean',
-    'nb_patients': 'mean',
-    'epidemie_grippe': 'max',
-    'vacances_scolaires': 'max',
-    'jour_ferie': 'max',
-    'covid_impact': 'max'
-}).reset_index()
-
-# Compléter les dates manquantes
-date_range = pd.date_range(
-    start=daily['date'].min(),
-    end=daily['date'].max(),
-    freq='D'
-)
-full_dates = pd.DataFrame({'date': date_range})
-daily = full_dates.merge(daily, on='date', how='left')
-
-# Remplir les NaN
-daily['quantite'].fillna(0, inplace=True)
-for col in ['temperature', 'taux_occupation', 'nb_patients']:
-    daily[col].fillna(daily[col].mean(), inplace=True)
-for col in ['epidemie_grippe', 'vacances_scolaires', 'jour_ferie', 'covid_impact']:
-    daily[col].fillna(0, inplace=True)
-
-print(f"✅ {len(daily)} jours préparés")
-
-# Renommer pour Prophet
-prophet_df = daily.rename(columns={'date': 'ds', 'quantite': 'y'})
-
-# ============================================================================
-# ÉTAPE 4 : CONFIGURATION DES HOLIDAYS
-# ============================================================================
-
-print("\\n" + "="*70)
-print("📅 CONFIGURATION DES HOLIDAYS")
-print("="*70)
-
-# Jours fériés
-holidays_jf = daily[daily['jour_ferie'] == 1][['date']].drop_duplicates()
-holidays_jf.columns = ['ds']
-holidays_jf['holiday'] = 'jour_ferie'
-holidays_jf['lower_window'] = 0
-holidays_jf['upper_window'] = 0
-
-# Vacances scolaires
-holidays_vac = daily[daily['vacances_scolaires'] == 1][['date']].drop_duplicates()
-holidays_vac.columns = ['ds']
-holidays_vac['holiday'] = 'vacances_scolaires'
-holidays_vac['lower_window'] = 0
-holidays_vac['upper_window'] = 0
-
-# COVID
-holidays_covid = daily[daily['covid_impact'] == 1][['date']].drop_duplicates()
-holidays_covid.columns = ['ds']
-holidays_covid['holiday'] = 'covid_19'
-holidays_covid['lower_window'] = 0
-holidays_covid['upper_window'] = 0
-
-holidays = pd.concat([holidays_jf, holidays_vac, holidays_covid])
-
-print(f"✅ {len(holidays)} holidays configurés")
-print(f"   - Jours fériés : {len(holidays_jf)}")
-print(f"   - Vacances : {len(holidays_vac)}")
-print(f"   - COVID : {len(holidays_covid)}")
-
-# ============================================================================
-# ÉTAPE 5 : CHANGEPOINTS
-# ============================================================================
-
-changepoints_manuels = [
-    '2020-03-15',  # COVID-19 Vague 1
-    '2020-11-01',  # COVID-19 Vague 2
-    '2021-05-01',  # Déconfinement
-    '2022-01-01',  # Nouvelle Direction
-    '2023-09-01'   # Extension Hôpital
-]
-
-print(f"✅ {len(changepoints_manuels)} changepoints manuels")
-
-# ============================================================================
-# ÉTAPE 6 : SPLIT TRAIN/TEST
-# ============================================================================
-
-print("\\n" + "="*70)
-print("📊 SPLIT TRAIN/TEST")
-print("="*70)
-
-split_date = prophet_df['ds'].max() - pd.Timedelta(days=365)
-train = prophet_df[prophet_df['ds'] <= split_date].copy()
-test = prophet_df[prophet_df['ds'] > split_date].copy()
-
-print(f"✅ Train : {len(train)} jours ({train['ds'].min().date()} → {train['ds'].max().date()})")
-print(f"✅ Test  : {len(test)} jours ({test['ds'].min().date()} → {test['ds'].max().date()})")
-
-# ============================================================================
-# ÉTAPE 7 : MODÈLE PROPHET
-# ============================================================================
-
-print("\\n" + "="*70)
-print("🤖 CONFIGURATION ET ENTRAÎNEMENT DU MODÈLE")
-print("="*70)
-
-model = Prophet(
-    holidays=holidays,
-    holidays_prior_scale=10.0,
-    yearly_seasonality=20,
-    weekly_seasonality=5,
-    daily_seasonality=False,
-    seasonality_mode='multiplicative',
-    seasonality_prior_scale=10.0,
-    changepoints=changepoints_manuels,
-    changepoint_prior_scale=0.5,
-    changepoint_range=0.9,
-    interval_width=0.85,
-    growth='linear'
-)
-
-# Ajouter les régresseurs
-model.add_regressor('temperature', prior_scale=0.5, standardize=True)
-model.add_regressor('taux_occupation', prior_scale=1.0, standardize=True)
-model.add_regressor('nb_patients', prior_scale=0.5, standardize=True)
-model.add_regressor('epidemie_grippe', prior_scale=0.5, standardize=False)
-
-print("✅ Modèle configuré avec 4 régresseurs")
-print("⏳ Entraînement en cours...")
-
-model.fit(train)
-
-print("✅ Modèle entraîné !")
-
-# ============================================================================
-# ÉTAPE 8 : ÉVALUATION
-# ============================================================================
-
-print("\\n" + "="*70)
-print("📊 ÉVALUATION SUR LE TEST")
-print("="*70)
-
-predictions_test = model.predict(test)
-
-y_true = test['y'].values
-y_pred = predictions_test['yhat'].values
-
-mae = np.mean(np.abs(y_true - y_pred))
-mape = np.mean(np.abs((y_true - y_pred) / (y_true + 0.01))) * 100
-rmse = np.sqrt(np.mean((y_true - y_pred)**2))
-
-print(f"\\nMAE  : {mae:.2f} kg")
-print(f"MAPE : {mape:.2f}%")
-print(f"RMSE : {rmse:.2f} kg")
-
-if mape < 15:
-    print("\\n✅ Excellente précision ! (MAPE < 15%)")
-elif mape < 25:
-    print("\\n✅ Bonne précision (MAPE < 25%)")
-else:
-    print("\\n⚠️  Précision moyenne (MAPE > 25%)")
-
-# ============================================================================
-# ÉTAPE 9 : ANALYSE DES COEFFICIENTS
-# ============================================================================
-
-print("\\n" + "="*70)
-print("📊 COEFFICIENTS DES RÉGRESSEURS")
-print("="*70)
-
-try:
-    coeffs = regressor_coefficients(model)
-    print(coeffs)
-
-    print("\\n💡 Interprétation :")
-    for idx, row in coeffs.iterrows():
-        regressor = row['regressor']
-        coeff = row['coef']
-
-        if coeff > 0:
-            print(f"   📈 {regressor:20s} : +{coeff:.4f} (effet positif)")
-        else:
-            print(f"   📉 {regressor:20s} : {coeff:.4f} (effet négatif)")
-except Exception as e:
-    print(f"⚠️  Impossible d'extraire les coefficients : {e}")
-
-# ============================================================================
-# ÉTAPE 10 : PRÉDICTIONS FUTURES
-# ============================================================================
-
-print("\\n" + "="*70)
-print("🔮 PRÉDICTIONS FUTURES (28 JOURS)")
-print("="*70)
-
-# Réentraîner sur toutes les données
-model_final = Prophet(
-    holidays=holidays,
-    holidays_prior_scale=10.0,
-    yearly_seasonality=20,
-    weekly_seasonality=5,
-    seasonality_mode='multiplicative',
-    changepoints=changepoints_manuels,
-    changepoint_prior_scale=0.5,
-    interval_width=0.85
-)
-
-model_final.add_regressor('temperature', prior_scale=0.5, standardize=True)
-model_final.add_regressor('taux_occupation', prior_scale=1.0, standardize=True)
-model_final.add_regressor('nb_patients', prior_scale=0.5, standardize=True)
-model_final.add_regressor('epidemie_grippe', prior_scale=0.5, standardize=False)
-
-model_final.fit(prophet_df)
-
-# Créer les dates futures
-future = model_final.make_future_dataframe(periods=28)
-
-# Ajouter les valeurs des régresseurs (moyenne pour le futur)
-future = future.merge(
-    prophet_df[['ds', 'temperature', 'taux_occupation', 'nb_patients', 'epidemie_grippe']],
-    on='ds',
-    how='left'
-)
-
-for col in ['temperature', 'taux_occupation', 'nb_patients']:
-    future[col].fillna(prophet_df[col].mean(), inplace=True)
-
-# Épidémie de grippe : activer si hiver (jan-mars)
-future['epidemie_grippe'].fillna(
-    future['ds'].dt.month.isin([1, 2, 3]).astype(int),
-    inplace=True
-)
-
-# Prédire
-forecast = model_final.predict(future)
-predictions_futures = forecast[forecast['ds'] > prophet_df['ds'].max()]
-
-print(f"✅ {len(predictions_futures)} jours de prédictions")
-print(f"   Total prévu : {predictions_futures['yhat'].sum():.2f} kg")
-print(f"   Moyenne/jour : {predictions_futures['yhat'].mean():.2f} kg")
-
-# ============================================================================
-# ÉTAPE 11 : VISUALISATIONS
-# ============================================================================
-
-print("\\n" + "="*70)
-print("📈 GÉNÉRATION DES VISUALISATIONS")
-print("="*70)
-
-# Graphique principal
-fig1 = model_final.plot(forecast)
-plt.title(f'Prédictions Prophet - {PRODUIT_ANALYSE}', fontsize=14, fontweight='bold')
-filename1 = f'predictions_{PRODUIT_ANALYSE.replace(" ", "_")}_enrichi.png'
-plt.savefig(filename1, dpi=300, bbox_inches='tight')
-print(f"✅ {filename1}")
-plt.close()
-
-# Composants
-fig2 = model_final.plot_components(forecast)
-filename2 = f'components_{PRODUIT_ANALYSE.replace(" ", "_")}_enrichi.png'
-plt.savefig(filename2, dpi=300, bbox_inches='tight')
-print(f"✅ {filename2}")
-plt.close()
-
-# Changepoints
-fig3 = model_final.plot(forecast)
-add_changepoints_to_plot(fig3.gca(), model_final, forecast)
-plt.title(f'Changepoints - {PRODUIT_ANALYSE}', fontsize=14, fontweight='bold')
-filename3 = f'changepoints_{PRODUIT_ANALYSE.replace(" ", "_")}_enrichi.png'
-plt.savefig(filename3, dpi=300, bbox_inches='tight')
-print(f"✅ {filename3}")
-plt.close()
-
-# ============================================================================
-# ÉTAPE 12 : EXPORT DES RÉSULTATS
-# ============================================================================
-
-print("\\n" + "="*70)
-print("💾 EXPORT DES RÉSULTATS")
-print("="*70)
-
-# Export CSV
-export_df = predictions_futures[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
-export_df.columns = ['date', 'quantite_prevue', 'quantite_min', 'quantite_max']
-export_df['date'] = export_df['date'].dt.date
-export_df['produit'] = PRODUIT_ANALYSE
-export_df['confiance'] = '85%'
-
-filename_csv = f'predictions_{PRODUIT_ANALYSE.replace(" ", "_")}_enrichi_28j.csv'
-export_df.to_csv(filename_csv, index=False)
-print(f"✅ {filename_csv}")
-
-# Export JSON
-summary = {
-    "produit": PRODUIT_ANALYSE,
-    "date_analyse": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-    "performance_modele": {
-        "MAE": round(mae, 2),
-        "MAPE": round(mape, 2),
-        "RMSE": round(rmse, 2),
-        "methode": "Prophet avec regressors enrichis"
-    },
-    "regresseurs_utilises": [
-        "temperature", "taux_occupation", "nb_patients", "epidemie_grippe"
-    ],
-    "holidays_utilises": [
-        "jour_ferie", "vacances_scolaires", "covid_19"
-    ],
-    "changepoints": changepoints_manuels,
-    "predictions": {
-        "horizon": "28 jours",
-        "total_prevu": round(predictions_futures['yhat'].sum(), 2),
-        "moyenne_jour": round(predictions_futures['yhat'].mean(), 2)
+    # ============================================================================
+    # ÉTAPE 5 : CHANGEPOINTS
+    # ============================================================================
+
+    changepoints_manuels = calendar.changepoints
+
+    print(f"✅ {len(changepoints_manuels)} changepoints manuels")
+
+    # ============================================================================
+    # ÉTAPE 6 : SPLIT TRAIN/TEST
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print("📊 SPLIT TRAIN/TEST")
+    print("="*70)
+
+    split_date = prophet_df['ds'].max() - pd.Timedelta(days=365)
+    train = prophet_df[prophet_df['ds'] <= split_date].copy()
+    test = prophet_df[prophet_df['ds'] > split_date].copy()
+
+    print(f"✅ Train : {len(train)} jours ({train['ds'].min().date()} → {train['ds'].max().date()})")
+    print(f"✅ Test  : {len(test)} jours ({test['ds'].min().date()} → {test['ds'].max().date()})")
+
+    # ============================================================================
+    # ÉTAPE 7 : MODÈLE PROPHET
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print("🤖 CONFIGURATION ET ENTRAÎNEMENT DU MODÈLE")
+    print("="*70)
+
+    from forecasting import fit_or_load, regressors_in, future_regressors
+
+    # Cache des modèles entraînés (results/_models) : pas de réentraînement
+    # si ni les données ni la configuration n'ont changé
+    model_store = None
+    if USE_RESULTS_MANAGER:
+        from model_store import ModelStore
+        model_store = ModelStore.from_results_manager(results_mgr)
+
+    # Même fabrique pour le modèle d'évaluation et le modèle final (étape 10)
+    regresseurs = regressors_in(prophet_df)
+
+    print(f"✅ Modèle configuré avec {len(regresseurs)} régresseurs")
+    print("⏳ Entraînement en cours...")
+
+    with instr.stage("fit", lignes=len(train)):
+        model, duree_fit_eval, cache_eval = fit_or_load(
+            train, holidays, changepoints_manuels, regresseurs, store=model_store,
+            meta={"produit": produit, "role": "evaluation"}
+        )
+
+    if cache_eval:
+        print("⚡ Modèle chargé depuis le cache")
+    else:
+        print(f"✅ Modèle entraîné ! ({duree_fit_eval:.1f}s)")
+
+    # ============================================================================
+    # ÉTAPE 8 : ÉVALUATION
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print("📊 ÉVALUATION SUR LE TEST")
+    print("="*70)
+
+    with instr.stage("predict", lignes=len(test)):
+        predictions_test = model.predict(test)
+
+    y_true = test['y'].values
+    y_pred = predictions_test['yhat'].values
+
+    mae = np.mean(np.abs(y_true - y_pred))
+    mape = np.mean(np.abs((y_true - y_pred) / (y_true + 0.01))) * 100
+    rmse = np.sqrt(np.mean((y_true - y_pred)**2))
+
+    print(f"\\nMAE  : {mae:.2f} kg")
+    print(f"MAPE : {mape:.2f}%")
+    print(f"RMSE : {rmse:.2f} kg")
+
+    if mape < 15:
+        print("\\n✅ Excellente précision ! (MAPE < 15%)")
+    elif mape < 25:
+        print("\\n✅ Bonne précision (MAPE < 25%)")
+    else:
+        print("\\n⚠️  Précision moyenne (MAPE > 25%)")
+
+    # ============================================================================
+    # ÉTAPE 9 : ANALYSE DES COEFFICIENTS
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print("📊 COEFFICIENTS DES RÉGRESSEURS")
+    print("="*70)
+
+    try:
+        from prophet.utilities import regressor_coefficients
+        coeffs = regressor_coefficients(model)
+        print(coeffs)
+
+        print("\\n💡 Interprétation :")
+        for idx, row in coeffs.iterrows():
+            regressor = row['regressor']
+            coeff = row['coef']
+
+            if coeff > 0:
+                print(f"   📈 {regressor:20s} : +{coeff:.4f} (effet positif)")
+            else:
+                print(f"   📉 {regressor:20s} : {coeff:.4f} (effet négatif)")
+    except Exception as e:
+        print(f"⚠️  Impossible d'extraire les coefficients : {e}")
+
+    # ============================================================================
+    # ÉTAPE 10 : PRÉDICTIONS FUTURES
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print(f"🔮 PRÉDICTIONS FUTURES ({horizon} JOURS)")
+    print("="*70)
+
+    # Réentraîner sur toutes les données (warm-start, voir WARM_START)
+    with instr.stage("fit", lignes=len(prophet_df)):
+        model_final, duree_fit_final, cache_final = fit_or_load(
+            prophet_df, holidays, changepoints_manuels, regresseurs, store=model_store,
+            init_from=model if WARM_START else None,
+            meta={"produit": produit, "role": "final"}
+        )
+
+    if cache_final:
+        print("⚡ Modèle final chargé depuis le cache")
+    else:
+        print(f"✅ Modèle final entraîné ({duree_fit_final:.1f}s, warm-start : {'oui' if WARM_START else 'non'})")
+
+    # Projection des régresseurs du site (climatologie, profil hebdomadaire)
+    from regressor_projection import projection_for
+    with instr.stage("projection"):
+        projection = projection_for(demand, horizon)
+        if scenario:
+            projection = projection.with_scenario(scenario)
+    resume_projection = projection.summary()
+    for col, valeur in resume_projection["moyennes_projetees"].items():
+        print(f"   - {col} : {valeur:.2f} (moyenne projetée, "
+              f"{resume_projection['methodes'][col]})")
+    if scenario:
+        print(f"   🧪 Scénario : {len(scenario)} choc(s) appliqué(s)")
+
+    # Créer les dates futures avec les régresseurs projetés
+    with instr.stage("predict", lignes=horizon):
+        future = model_final.make_future_dataframe(periods=horizon)
+        future = future_regressors(future, prophet_df, projection)
+
+        # Prédire (graine fixe : les intervalles, tirés par simulation, sont
+        # reproductibles et les graphiques inchangés sont repris du cache)
+        np.random.seed(0)
+        forecast = model_final.predict(future)
+    predictions_futures = forecast[forecast['ds'] > prophet_df['ds'].max()]
+
+    print(f"✅ {len(predictions_futures)} jours de prédictions")
+    print(f"   Total prévu : {predictions_futures['yhat'].sum():.2f} kg")
+    print(f"   Moyenne/jour : {predictions_futures['yhat'].mean():.2f} kg")
+
+    # ============================================================================
+    # ÉTAPE 11 : VISUALISATIONS
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print("📈 GÉNÉRATION DES VISUALISATIONS")
+    print("="*70)
+
+    with instr.stage("graphiques"):
+        save_plots(model_final, forecast, produit, results_mgr, preset=preset)
+
+    # ============================================================================
+    # ÉTAPE 12 : EXPORT DES RÉSULTATS
+    # ============================================================================
+
+    print("\\n" + "="*70)
+    print("💾 EXPORT DES RÉSULTATS")
+    print("="*70)
+
+    # Export CSV
+    export_df = predictions_futures[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
+    export_df.columns = ['date', 'quantite_prevue', 'quantite_min', 'quantite_max']
+    export_df['date'] = export_df['date'].dt.date
+    export_df['produit'] = produit
+    export_df['confiance'] = '85%'
+
+    filename_csv = output_path(
+        results_mgr, f'predictions_{produit.replace(" ", "_")}_enrichi_{horizon}j.csv'
+    )
+    with instr.stage("export", lignes=len(export_df)):
+        export_df.to_csv(filename_csv, index=False)
+    print(f"✅ {filename_csv}")
+
+    # Export JSON
+    summary = {
+        "produit": produit,
+        "date_analyse": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "performance_modele": {
+            "MAE": round(mae, 2),
+            "MAPE": round(mape, 2),
+            "RMSE": round(rmse, 2),
+            "methode": "Prophet avec regressors enrichis"
+        },
+        "durees_entrainement_s": {
+            "evaluation": round(duree_fit_eval, 2),
+            "final": round(duree_fit_final, 2),
+            "warm_start": WARM_START,
+            "cache": cache_final
+        },
+        "regresseurs_utilises": [
+            "temperature", "taux_occupation", "nb_patients", "epidemie_grippe"
+        ],
+        "holidays_utilises": list(jours),
+        "fenetres_holidays": calendar.options()["fenetres"],
+        "changepoints": changepoints_manuels,
+        "projection_regresseurs": resume_projection,
+        "predictions": {
+            "horizon": f"{horizon} jours",
+            "total_prevu": round(predictions_futures['yhat'].sum(), 2),
+            "moyenne_jour": round(predictions_futures['yhat'].mean(), 2)
+        },
+        "etapes": instr.as_dict(),
     }
-}
-
-filename_json = f'summary_{PRODUIT_ANALYSE.replace(" ", "_")}_enrichi.json'
-with open(filename_json, 'w', encoding='utf-8') as f:
-    json.dump(summary, f, indent=2, ensure_ascii=False)
-print(f"✅ {filename_json}")
-
-# Sauvegarder avec Results Manager si disponible
-if USE_RESULTS_MANAGER:
-    for f in [filename1, filename2, filename3]:
-        results_mgr.save_graph(f)
-    results_mgr.save_data(filename_csv)
-    results_mgr.save_data(filename_json)
-    results_mgr.create_summary_file(PRODUIT_ANALYSE, summary)
-    print(f"\\n✅ Résultats sauvegardés dans : {results_mgr.get_run_path()}")
-
-print("\\n" + "="*70)
-print("🎉 ANALYSE TERMINÉE AVEC SUCCÈS !")
-print("="*70)
+    instr.print_summary()
+    add_stage_alerts(summary, results_mgr, produit)
+
+    filename_json = output_path(results_mgr, f'summary_{produit.replace(" ", "_")}_enrichi.json')
+    with open(filename_json, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"✅ {filename_json}")
+
+    # Résumé, manifeste et déduplication avec Results Manager si disponible
+    if USE_RESULTS_MANAGER:
+        results_mgr.create_summary_file(produit, summary)
+        print(f"\\n✅ Résultats sauvegardés dans : {results_mgr.get_run_path()}")
+
+    print("\\n" + "="*70)
+    print("🎉 ANALYSE TERMINÉE AVEC SUCCÈS !")
+    print("="*70)
+
+    return summary
+
+
+if __name__ == "__main__":
+    run_analysis()
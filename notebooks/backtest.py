@@ -0,0 +1,294 @@
+"""
+Backtest - Validation croisée à origine glissante (rolling-origin)
+Entraîne Prophet sur de nombreux cutoffs (fenêtre croissante ou glissante),
+en parallèle sur un pool de processus, et renvoie une table de métriques
+par cutoff et par jour d'horizon
+
+Usage:
+    python backtest.py --produits "Poulet frais" --horizon 28 --period 28
+    python backtest.py --produits all --window sliding --window-days 730
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from defaults import INITIAL_JOURS, PERIODE_JOURS
+from forecasting import (
+    HORIZON_JOURS, changepoints_within, init_worker, make_prophet_model, regressors_in
+)
+from holiday_calendar import HolidayCalendar, shared_calendar
+
+
+def make_cutoffs(ds, horizon=HORIZON_JOURS, period=PERIODE_JOURS, initial=INITIAL_JOURS):
+    """
+    Génère les dates de cutoff, de la plus récente à la plus ancienne
+
+    Le dernier cutoff laisse exactement `horizon` jours de test ; les
+    précédents sont espacés de `period` jours tant qu'il reste au moins
+    `initial` jours d'historique.
+
+    Args:
+        ds: Dates de la série
+        horizon: Nombre de jours prédits après chaque cutoff
+        period: Écart entre deux cutoffs
+        initial: Historique minimum avant le premier cutoff
+
+    Returns:
+        List[Timestamp]: Cutoffs triés chronologiquement
+    """
+    debut, fin = pd.Timestamp(ds.min()), pd.Timestamp(ds.max())
+    cutoff = fin - pd.Timedelta(days=horizon)
+    premier = debut + pd.Timedelta(days=initial)
+
+    cutoffs = []
+    while cutoff >= premier:
+        cutoffs.append(cutoff)
+        cutoff -= pd.Timedelta(days=period)
+    return sorted(cutoffs)
+
+
+def split_at_cutoff(prophet_df, cutoff, horizon=HORIZON_JOURS, window="expanding",
+                    window_days=None):
+    """
+    Découpe la série autour d'un cutoff
+
+    Args:
+        prophet_df: Série quotidienne (ds, y, régresseurs)
+        cutoff: Dernière date d'entraînement
+        horizon: Nombre de jours de test
+        window: "expanding" (tout l'historique) ou "sliding" (fenêtre fixe)
+        window_days: Taille de la fenêtre glissante
+
+    Returns:
+        tuple: (train, test)
+    """
+    ds = prophet_df['ds']
+    mask_train = ds <= cutoff
+    if window == "sliding":
+        if not window_days:
+            raise ValueError("window_days est requis pour une fenêtre glissante")
+        mask_train &= ds > cutoff - pd.Timedelta(days=window_days)
+    elif window != "expanding":
+        raise ValueError(f"Fenêtre inconnue : {window} (expanding ou sliding)")
+
+    mask_test = (ds > cutoff) & (ds <= cutoff + pd.Timedelta(days=horizon))
+    return prophet_df[mask_train], prophet_df[mask_test]
+
+
+def _backtest_task(produit, cutoff, train, test, changepoints, regressors, overrides):
+    """
+    Entraîne un modèle sur un cutoff et renvoie les prédictions du test
+    (holidays : calendrier partagé avec le worker)
+
+    Returns:
+        dict: produit, cutoff, statut (ok, erreur), predictions ou erreur
+    """
+    try:
+        model = make_prophet_model(
+            shared_calendar().holidays, changepoints_within(changepoints, train), regressors,
+            **overrides
+        )
+        model.fit(train)
+        forecast = model.predict(test)
+
+        result = pd.DataFrame({
+            'produit': produit,
+            'cutoff': cutoff,
+            'ds': test['ds'].to_numpy(),
+            'y': test['y'].to_numpy(),
+            'yhat': forecast['yhat'].to_numpy(),
+        })
+        if 'yhat_lower' in forecast:
+            result['yhat_lower'] = forecast['yhat_lower'].to_numpy()
+            result['yhat_upper'] = forecast['yhat_upper'].to_numpy()
+        return {"produit": produit, "cutoff": cutoff, "statut": "ok", "predictions": result}
+    except Exception as e:
+        return {
+            "produit": produit,
+            "cutoff": cutoff,
+            "statut": "erreur",
+            "erreur": f"{type(e).__name__}: {e}",
+        }
+
+
+def run_backtest(frames, horizon=HORIZON_JOURS, period=PERIODE_JOURS, initial=INITIAL_JOURS,
+                 window="expanding", window_days=None, changepoints=None, n_workers=None,
+                 intervals=True, calendar=None, verbose=True, **overrides):
+    """
+    Lance le backtest de plusieurs produits, tous cutoffs en parallèle
+
+    Un cutoff en échec n'interrompt pas les autres : il est reporté dans la
+    table des échecs.
+
+    Args:
+        frames: Dictionnaire {produit: série Prophet (ds, y, régresseurs)}
+        horizon: Nombre de jours prédits après chaque cutoff
+        period: Écart entre deux cutoffs
+        initial: Historique minimum avant le premier cutoff
+        window: "expanding" ou "sliding"
+        window_days: Taille de la fenêtre glissante
+        changepoints: Changepoints manuels (défaut : ceux du calendrier)
+        n_workers: Nombre de processus (défaut : nombre de CPU)
+        intervals: Calculer yhat_lower/yhat_upper (désactiver accélère predict)
+        calendar: HolidayCalendar commun aux produits (défaut : construit
+            sur toutes les séries de `frames`)
+        verbose: Afficher la progression
+        **overrides: Paramètres Prophet remplaçant PROPHET_CONFIG
+
+    Returns:
+        tuple: (DataFrame avec une ligne par (produit, cutoff, date) :
+        horizon_jour, y, yhat, erreurs et couverture de l'intervalle ;
+        DataFrame des cutoffs en échec : produit, cutoff, erreur)
+    """
+    calendar = HolidayCalendar.from_frames(frames) if calendar is None else calendar
+    changepoints = calendar.changepoints if changepoints is None else changepoints
+    n_workers = n_workers or os.cpu_count() or 1
+    if not intervals:
+        overrides.setdefault('uncertainty_samples', 0)
+
+    tasks = []
+    for produit, prophet_df in frames.items():
+        regressors = regressors_in(prophet_df)
+        for cutoff in make_cutoffs(prophet_df['ds'], horizon, period, initial):
+            train, test = split_at_cutoff(prophet_df, cutoff, horizon, window, window_days)
+            tasks.append((produit, cutoff, train, test, changepoints, regressors, overrides))
+
+    if not tasks:
+        raise ValueError("Aucun cutoff : historique trop court pour `initial` + `horizon`")
+
+    if verbose:
+        print(f"🔁 {len(tasks)} entraînements ({len(frames)} produit(s)) sur {n_workers} worker(s)")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker,
+                             initargs=(calendar,)) as pool:
+        futures = [pool.submit(_backtest_task, *task) for task in tasks]
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            if verbose and result["statut"] == "erreur":
+                print(f"   ❌ {result['produit']:25s} {result['cutoff'].date()} {result['erreur']}")
+            if verbose and (i % 10 == 0 or i == len(futures)):
+                print(f"   ⏳ {i}/{len(futures)} cutoffs ({time.perf_counter() - start:.1f}s)")
+
+    echecs_df = pd.DataFrame(
+        [{k: r[k] for k in ("produit", "cutoff", "erreur")}
+         for r in results if r["statut"] == "erreur"],
+        columns=["produit", "cutoff", "erreur"]
+    ).sort_values(['produit', 'cutoff'], ignore_index=True)
+    predictions = [r["predictions"] for r in results if r["statut"] == "ok"]
+    if not predictions:
+        raise RuntimeError(f"Tous les cutoffs ont échoué ({echecs_df['erreur'].iloc[0]})")
+    return add_errors(pd.concat(predictions, ignore_index=True)), echecs_df
+
+
+def add_errors(backtest_df):
+    """Ajoute horizon_jour et les colonnes d'erreur (calcul vectorisé)"""
+    df = backtest_df.sort_values(['produit', 'cutoff', 'ds'], ignore_index=True)
+    df['horizon_jour'] = (df['ds'] - df['cutoff']).dt.days.astype(np.int16)
+
+    errors = df['y'].to_numpy() - df['yhat'].to_numpy()
+    df['erreur'] = errors
+    df['erreur_abs'] = np.abs(errors)
+    df['erreur_pct'] = np.abs(errors / (df['y'].to_numpy() + 0.01)) * 100
+    df['erreur_carre'] = errors ** 2
+    if 'yhat_lower' in df:
+        df['dans_intervalle'] = (df['y'] >= df['yhat_lower']) & (df['y'] <= df['yhat_upper'])
+    return df
+
+
+def backtest_metrics(backtest_df, by=('produit', 'horizon_jour')):
+    """
+    Agrège les erreurs du backtest
+
+    Args:
+        backtest_df: Résultat de run_backtest
+        by: Colonnes de regroupement, ex. ('produit',), ('produit', 'cutoff'),
+            ('produit', 'horizon_jour')
+
+    Returns:
+        DataFrame: MAE, MAPE, RMSE (et couverture) par groupe
+    """
+    aggs = {
+        'MAE': ('erreur_abs', 'mean'),
+        'MAPE': ('erreur_pct', 'mean'),
+        'MSE': ('erreur_carre', 'mean'),
+        'biais': ('erreur', 'mean'),
+        'nb_points': ('erreur', 'size'),
+    }
+    if 'dans_intervalle' in backtest_df:
+        aggs['couverture'] = ('dans_intervalle', 'mean')
+
+    metrics = backtest_df.groupby(list(by), observed=True).agg(**aggs).reset_index()
+    metrics['RMSE'] = np.sqrt(metrics.pop('MSE'))
+    return metrics
+
+
+def main(args):
+    """
+    Backtest en ligne de commande (voir cli.add_backtest_arguments)
+    """
+    from demand_matrix import load_demand_matrix
+    from batch_forecast import resolve_products
+    from holiday_calendar import calendar_for
+
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+    except ImportError:
+        results_mgr = None
+
+    # Écriture directe dans le dossier de l'exécution (sinon répertoire courant)
+    def output(filename):
+        return results_mgr.output_path(filename) if results_mgr is not None else Path(filename)
+
+    demand = load_demand_matrix(args.csv, chunksize=args.chunksize)
+    produits = resolve_products(demand, args.produits)
+
+    backtest_df, echecs_df = run_backtest(
+        {p: demand.prophet_frame(p) for p in produits},
+        horizon=args.horizon, period=args.period, initial=args.initial,
+        window=args.window, window_days=args.window_days, n_workers=args.workers,
+        intervals=not args.no_intervals,
+        calendar=calendar_for(demand, fenetres=dict(args.fenetre or []))
+    )
+
+    par_produit = backtest_metrics(backtest_df, by=['produit'])
+    print("\n📊 MÉTRIQUES PAR PRODUIT")
+    print(par_produit.round(2).to_string(index=False))
+
+    filename_csv = output(f'backtest_{args.horizon}j.csv')
+    backtest_df.to_csv(filename_csv, index=False)
+    filename_metrics = output(f'backtest_metriques_{args.horizon}j.csv')
+    backtest_metrics(backtest_df).to_csv(filename_metrics, index=False)
+    print(f"\n✅ {filename_csv}")
+    print(f"✅ {filename_metrics}")
+    if len(echecs_df):
+        filename_echecs = output(f'backtest_echecs_{args.horizon}j.csv')
+        echecs_df.to_csv(filename_echecs, index=False)
+        print(f"⚠️  {len(echecs_df)} cutoff(s) en échec : {filename_echecs}")
+
+    if results_mgr is not None:
+        results_mgr.create_summary_file(f"Backtest ({len(produits)} produits)", {
+            "Cutoffs": backtest_df['cutoff'].nunique(),
+            "Horizon": f"{args.horizon} jours",
+            "Fenêtre": args.window,
+            "MAPE moyen": f"{par_produit['MAPE'].mean():.2f}%",
+            "Cutoffs en échec": len(echecs_df),
+        })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_backtest_arguments
+
+    parser = argparse.ArgumentParser(description="Backtest rolling-origin de Prophet")
+    add_backtest_arguments(parser)
+    main(parser.parse_args())
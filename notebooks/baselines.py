@@ -0,0 +1,276 @@
+"""
+Baselines - Prévisions rapides NumPy sur toute la matrice (date × produit)
+Naïf saisonnier hebdomadaire, lissage exponentiel avec saisonnalité
+hebdomadaire et Croston/TSB pour les produits à demande intermittente.
+Sert de repli quand Prophet n'est pas disponible et de niveau rapide pour
+la replanification intra-journalière.
+"""
+
+import numpy as np
+import pandas as pd
+
+from forecasting import HORIZON_JOURS, INTERVAL_WIDTH
+
+
+SAISON = 7
+
+# Grilles de lissage évaluées en parallèle pour chaque produit
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+GAMMAS = np.array([0.05, 0.1, 0.2])
+
+# Au-delà de cette part de jours sans consommation, un produit est intermittent
+SEUIL_INTERMITTENT = 0.3
+
+METHODES = ("naif_saisonnier", "ets_hebdo", "croston", "tsb", "auto")
+
+
+def history_matrix(demand):
+    """
+    Matrice (jours × produits) des quantités, NaN avant la première sortie
+    de chaque produit pour ne pas apprendre sur des zéros fictifs
+    """
+    Y = np.array(demand.quantite, dtype=np.float64)
+    jours = np.arange(len(demand.dates))[:, None]
+    Y[jours < np.asarray(demand.debut)[None, :]] = np.nan
+    return Y
+
+
+def seasonal_naive(Y, horizon=HORIZON_JOURS, season=SAISON):
+    """
+    Répète la dernière semaine observée
+
+    Returns:
+        tuple: (prévisions horizon × produits, résidus in-sample)
+    """
+    last = Y[-season:]
+    forecast = np.tile(last, (int(np.ceil(horizon / season)), 1))[:horizon]
+    residuals = Y[season:] - Y[:-season]
+    return np.nan_to_num(forecast), residuals
+
+
+def _ets_pass(Y, a, g, season, keep_residuals=False):
+    """
+    Une passe du lissage sur toute la série
+
+    a et g ont la forme (G, 1) (grille diffusée sur les produits) ou
+    (1, produits) (un couple par produit).
+    """
+    n_days, n_products = Y.shape
+    n_rows = max(a.shape[0], g.shape[0])
+
+    # Initialisation : moyenne globale et profil moyen par jour de semaine
+    level0 = np.nan_to_num(np.nanmean(Y, axis=0))
+    weekday = np.arange(n_days) % season
+    profile = np.stack([np.nanmean(Y[weekday == d], axis=0) for d in range(season)])
+    profile = np.nan_to_num(profile - level0)
+
+    level = np.broadcast_to(level0, (n_rows, n_products)).copy()
+    seasonal = np.broadcast_to(profile, (n_rows, season, n_products)).copy()
+    sse = np.zeros((n_rows, n_products))
+    residuals = np.full((n_days, n_products), np.nan) if keep_residuals else None
+
+    for t in range(n_days):
+        d = t % season
+        y = Y[t]
+        observed = ~np.isnan(y)
+        y_filled = np.where(observed, y, 0.0)
+
+        s = seasonal[:, d, :]
+        error = np.where(observed, y_filled - (level + s), 0.0)
+        sse += error ** 2
+        if keep_residuals:
+            residuals[t] = np.where(observed, error[0], np.nan)
+
+        new_level = np.where(observed, a * (y_filled - s) + (1 - a) * level, level)
+        seasonal[:, d, :] = np.where(observed, g * (y_filled - new_level) + (1 - g) * s, s)
+        level = new_level
+
+    return level, seasonal, sse, residuals
+
+
+def ets_weekly(Y, horizon=HORIZON_JOURS, season=SAISON, alphas=ALPHAS, gammas=GAMMAS):
+    """
+    Lissage exponentiel niveau + saisonnalité hebdomadaire (additive)
+
+    Toutes les combinaisons (alpha, gamma) sont évaluées en même temps pour
+    tous les produits ; chaque produit garde celle qui minimise l'erreur
+    quadratique à un pas.
+
+    Returns:
+        tuple: (prévisions horizon × produits, résidus in-sample)
+    """
+    n_days = Y.shape[0]
+    grid_a, grid_g = np.meshgrid(alphas, gammas, indexing='ij')
+    grid_a, grid_g = grid_a.ravel(), grid_g.ravel()
+
+    _, _, sse, _ = _ets_pass(Y, grid_a[:, None], grid_g[:, None], season)
+    best = sse.argmin(axis=0)
+
+    # Seconde passe avec le meilleur couple de chaque produit
+    level, seasonal, _, residuals = _ets_pass(
+        Y, grid_a[best][None, :], grid_g[best][None, :], season, keep_residuals=True
+    )
+
+    future_days = (n_days + np.arange(horizon)) % season
+    forecast = level[0][None, :] + seasonal[0][future_days]
+    return forecast, residuals
+
+
+def croston(Y, horizon=HORIZON_JOURS, alpha=0.1, variant="tsb", beta=0.1):
+    """
+    Croston (classique) ou TSB pour les demandes intermittentes
+
+    - croston : taille et intervalle mis à jour uniquement les jours de demande,
+      prévision = taille / intervalle
+    - tsb : probabilité de demande mise à jour chaque jour (Teunter-Syntetos-
+      Babai), prévision = probabilité × taille ; décroît pendant les
+      périodes sans demande, contrairement à Croston
+
+    Returns:
+        tuple: (prévisions horizon × produits, résidus in-sample)
+    """
+    n_days, n_products = Y.shape
+    nonzero = np.nan_to_num(Y) > 0
+
+    # Initialisation sur les jours observés
+    first = np.where(nonzero.any(axis=0), nonzero.argmax(axis=0), 0)
+    size = np.nan_to_num(Y[first, np.arange(n_products)])
+    prob = np.nan_to_num(np.nanmean(nonzero, axis=0))
+    interval = np.where(prob > 0, 1 / np.maximum(prob, 1e-9), 1.0)
+    since = np.zeros(n_products)
+
+    residuals = np.full((n_days, n_products), np.nan)
+    for t in range(n_days):
+        y = Y[t]
+        observed = ~np.isnan(y)
+        demand_day = nonzero[t]
+
+        prediction = prob * size if variant == "tsb" else size / interval
+        residuals[t] = np.where(observed, y - prediction, np.nan)
+
+        update = observed & demand_day
+        size = np.where(update, size + alpha * (y - size), size)
+        if variant == "tsb":
+            prob = np.where(observed, prob + beta * (demand_day - prob), prob)
+        else:
+            # Nombre de jours écoulés depuis la demande précédente (inclus)
+            since = since + observed
+            interval = np.where(update, interval + alpha * (since - interval), interval)
+            since = np.where(update, 0, since)
+
+    level = prob * size if variant == "tsb" else size / interval
+    return np.tile(level, (horizon, 1)), residuals
+
+
+def intermittent_mask(Y, threshold=SEUIL_INTERMITTENT):
+    """Produits dont la part de jours sans consommation dépasse le seuil"""
+    zero_share = np.nanmean(np.where(np.isnan(Y), np.nan, Y <= 0), axis=0)
+    return np.nan_to_num(zero_share) > threshold
+
+
+def residual_bounds(residuals, forecast, interval_width=INTERVAL_WIDTH):
+    """
+    Intervalle empirique à partir des quantiles des résidus in-sample
+
+    Returns:
+        tuple: (borne basse, borne haute), tronquées à 0
+    """
+    tail = (1 - interval_width) / 2
+    q_low, q_high = np.nanquantile(residuals, [tail, 1 - tail], axis=0)
+    q_low, q_high = np.nan_to_num(q_low), np.nan_to_num(q_high)
+    return np.maximum(forecast + q_low, 0.0), np.maximum(forecast + q_high, 0.0)
+
+
+def forecast_residuals(Y, method="auto", horizon=HORIZON_JOURS):
+    """
+    Prévisions et résidus in-sample de toutes les colonnes de Y
+
+    Args:
+        Y: Matrice (jours × produits), NaN = non observé
+        method: naif_saisonnier, ets_hebdo, croston, tsb ou auto
+            (auto : TSB pour les produits intermittents, ETS sinon)
+        horizon: Nombre de jours à prédire
+
+    Returns:
+        tuple: (prévision tronquée à 0, résidus, méthode par produit)
+    """
+    if method not in METHODES:
+        raise ValueError(f"Méthode inconnue : {method} ({', '.join(METHODES)})")
+
+    n_products = Y.shape[1]
+    if method == "auto":
+        intermittent = intermittent_mask(Y)
+        forecast, residuals = ets_weekly(Y, horizon)
+        if intermittent.any():
+            f_tsb, r_tsb = croston(Y[:, intermittent], horizon, variant="tsb")
+            forecast[:, intermittent] = f_tsb
+            residuals[:, intermittent] = r_tsb
+        methods = np.where(intermittent, "tsb", "ets_hebdo")
+    else:
+        if method == "naif_saisonnier":
+            forecast, residuals = seasonal_naive(Y, horizon)
+        elif method == "ets_hebdo":
+            forecast, residuals = ets_weekly(Y, horizon)
+        else:
+            forecast, residuals = croston(Y, horizon, variant=method)
+        methods = np.full(n_products, method)
+
+    return np.maximum(forecast, 0.0), residuals, methods
+
+
+def forecast_matrix(Y, method="auto", horizon=HORIZON_JOURS, interval_width=INTERVAL_WIDTH):
+    """
+    Prévoit toutes les colonnes de Y avec une méthode baseline
+
+    Args:
+        Y: Matrice (jours × produits), NaN = non observé
+        method: Voir forecast_residuals
+        horizon: Nombre de jours à prédire
+        interval_width: Largeur de l'intervalle
+
+    Returns:
+        tuple: (prévision, borne basse, borne haute, méthode par produit)
+    """
+    forecast, residuals, methods = forecast_residuals(Y, method, horizon)
+    lower, upper = residual_bounds(residuals, forecast, interval_width)
+    return forecast, lower, upper, methods
+
+
+def forecast_baselines(demand, produits=None, method="auto", horizon=HORIZON_JOURS,
+                       interval_width=INTERVAL_WIDTH):
+    """
+    Prévisions baseline au format d'export Prophet
+
+    Les prévisions partent de la dernière date de la matrice pour tous les
+    produits.
+
+    Args:
+        demand: DemandMatrix
+        produits: Liste de produits (défaut : tous)
+        method: Voir forecast_matrix
+        horizon: Nombre de jours à prédire
+        interval_width: Largeur de l'intervalle
+
+    Returns:
+        DataFrame: date, quantite_prevue, quantite_min, quantite_max,
+        produit, confiance, methode
+    """
+    Y = history_matrix(demand)
+    if produits is not None:
+        Y = Y[:, [demand.product_index(p) for p in produits]]
+    else:
+        produits = demand.products
+
+    forecast, lower, upper, methods = forecast_matrix(Y, method, horizon, interval_width)
+
+    dates = pd.date_range(demand.dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    n_products = len(produits)
+    return pd.DataFrame({
+        'date': np.tile(dates.date, n_products),
+        'quantite_prevue': forecast.T.ravel(),
+        'quantite_min': lower.T.ravel(),
+        'quantite_max': upper.T.ravel(),
+        'produit': np.repeat(produits, horizon),
+        'confiance': f"{interval_width:.0%}",
+        'methode': np.repeat(methods, horizon),
+    })
@@ -0,0 +1,363 @@
+"""
+Batch Forecast - Prévisions Prophet multi-produits en parallèle
+Répartit les entraînements Prophet (mono-thread, CPU-bound) sur un pool de
+processus ; seule la série quotidienne de chaque produit est envoyée aux
+workers, le calendrier des holidays et la projection des régresseurs une
+seule fois par worker
+
+Usage:
+    python batch_forecast.py --produits all --workers 8
+    python batch_forecast.py --produits "Poulet frais" "Pain frais"
+    python batch_forecast.py --produits all --graphiques miniature
+    python batch_forecast.py --produits all --scenario epidemie_grippe=1@2025-01-06:2025-01-12
+    python batch_forecast.py --produits all --intervalles residus --erreurs backtest_28j.csv
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from forecasting import (
+    ECHANTILLONS_INCERTITUDE, HORIZON_JOURS, PROPHET_AVAILABLE, forecast_product, init_worker,
+    residual_intervals, residual_quantiles
+)
+from instrumentation import Instrumentation
+
+
+def _forecast_task(produit, prophet_df, changepoints, horizon, store, profiling=None,
+                   config=None, intervalles="prophet", echantillons=ECHANTILLONS_INCERTITUDE):
+    """
+    Tâche exécutée dans un worker : ne renvoie que les résultats
+    sérialisables légers (pas le modèle ni le forecast complet)
+
+    En mode "residus", le worker renvoie la prévision ponctuelle et les
+    erreurs de l'année d'évaluation : les intervalles de tous les produits
+    sont calculés ensuite en une passe (voir run_batch).
+    """
+    start = time.perf_counter()
+    instr = Instrumentation.for_worker(profiling, produit)
+    try:
+        result = forecast_product(prophet_df, produit, changepoints=changepoints,
+                                  horizon=horizon, store=store, instr=instr, config=config,
+                                  intervalles="aucun" if intervalles == "residus" else intervalles,
+                                  echantillons=echantillons)
+        return {
+            "produit": produit,
+            "statut": "ok",
+            "metrics": result["metrics"],
+            "durees": result["durees"],
+            "etapes": result["etapes"],
+            "cache": result["cache"]["final"],
+            "predictions": result["predictions"],
+            "erreurs": result["erreurs"] if intervalles == "residus" else None,
+            "duree_s": time.perf_counter() - start,
+        }
+    except Exception as e:
+        return {
+            "produit": produit,
+            "statut": "erreur",
+            "erreur": f"{type(e).__name__}: {e}",
+            "duree_s": time.perf_counter() - start,
+        }
+
+
+def resolve_products(demand, produits):
+    """
+    Résout la liste des produits à prévoir
+
+    Args:
+        demand: DemandMatrix
+        produits: "all", un nom de produit ou une liste de noms
+
+    Returns:
+        List[str]: Produits présents dans la matrice
+    """
+    if produits is None or produits == "all" or produits == ["all"]:
+        return list(demand.products)
+    if isinstance(produits, str):
+        produits = [produits]
+
+    inconnus = [p for p in produits if p not in demand.products]
+    if inconnus:
+        raise KeyError(f"Produits inconnus : {', '.join(inconnus)}")
+    return list(produits)
+
+
+def run_batch(demand, produits="all", n_workers=None, horizon=HORIZON_JOURS,
+              changepoints=None, store=None, instr=None, configs=None, calendar=None,
+              projection=None, intervalles="prophet", echantillons=ECHANTILLONS_INCERTITUDE,
+              erreurs=None, verbose=True):
+    """
+    Prévoit plusieurs produits en parallèle
+
+    Args:
+        demand: DemandMatrix construite sur le ledger
+        produits: "all" ou liste de noms de produits
+        n_workers: Nombre de processus (défaut : nombre de CPU)
+        horizon: Nombre de jours à prédire
+        changepoints: Changepoints manuels (défaut : ceux du script)
+        store: ModelStore partagé par les workers (optionnel)
+        instr: Instrumentation recevant les étapes mesurées dans les workers
+            (holidays, fit, predict : durées cumulées sur tous les produits).
+            Si elle profile une de ces étapes, chaque worker écrit les
+            rapports de son produit dans <output_dir>/profils/<produit>/
+        configs: {produit: paramètres Prophet} (voir tuning.load_best_configs)
+        calendar: HolidayCalendar commun à tous les produits (défaut : celui
+            de la matrice, voir holiday_calendar.calendar_for)
+        projection: RegressorProjection du site, avec ou sans scénario
+            (défaut : celle de la matrice, voir regressor_projection.projection_for)
+        intervalles: Calcul de quantite_min/max (voir forecasting.INTERVALLES)
+        echantillons: Simulations de Prophet en mode "prophet"
+        erreurs: Table du backtest (produit, horizon_jour, erreur) pour le
+            mode "residus" ; les produits absents prennent les erreurs de
+            leur année d'évaluation
+        verbose: Afficher la progression
+
+    Returns:
+        tuple: (predictions consolidées, métriques par produit)
+    """
+    produits = resolve_products(demand, produits)
+    n_workers = n_workers or os.cpu_count() or 1
+
+    if verbose:
+        print(f"🚀 {len(produits)} produit(s) sur {n_workers} worker(s)")
+
+    profiling = instr.worker_options() if instr is not None else None
+    if calendar is None:
+        from holiday_calendar import calendar_for
+        calendar = calendar_for(demand)
+    if projection is None:
+        from regressor_projection import projection_for
+        projection = projection_for(demand, horizon)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker,
+                             initargs=(calendar, projection)) as pool:
+        futures = [
+            pool.submit(_forecast_task, p, demand.prophet_frame(p), changepoints, horizon, store,
+                        profiling, (configs or {}).get(p), intervalles, echantillons)
+            for p in produits
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if instr is not None and "etapes" in result:
+                instr.merge(result["etapes"])
+            if verbose:
+                if result["statut"] == "ok":
+                    source = "cache" if result["cache"] else f"{result['duree_s']:.1f}s"
+                    print(f"   ✅ {result['produit']:25s} MAPE {result['metrics']['MAPE']:6.2f}% "
+                          f"({source})")
+                else:
+                    print(f"   ❌ {result['produit']:25s} {result['erreur']}")
+
+    predictions_df, metrics_df = consolidate(results)
+    if intervalles == "residus" and len(predictions_df):
+        errors = [r["erreurs"] for r in results if r["statut"] == "ok"]
+        if erreurs is not None:
+            backtest = erreurs[erreurs['produit'].isin(produits)]
+            errors = [e for e in errors if not e['produit'].isin(backtest['produit']).any()]
+            errors.append(backtest[['produit', 'horizon_jour', 'erreur']])
+        quantiles = residual_quantiles(pd.concat(errors, ignore_index=True), horizon)
+        predictions_df = residual_intervals(predictions_df, quantiles)
+    return predictions_df, metrics_df
+
+
+def consolidate(results):
+    """
+    Regroupe les résultats des workers
+
+    Returns:
+        tuple: (DataFrame des prédictions, DataFrame des métriques)
+    """
+    predictions = [r["predictions"] for r in results if r["statut"] == "ok"]
+    predictions_df = (
+        pd.concat(predictions, ignore_index=True).sort_values(['produit', 'date'])
+        if predictions else pd.DataFrame()
+    )
+
+    metrics_df = pd.DataFrame([
+        {
+            "produit": r["produit"],
+            "statut": r["statut"],
+            **r.get("metrics", {}),
+            **r.get("durees", {}),
+            **{f"{etape}_s": mesure["duree_s"] for etape, mesure in r.get("etapes", {}).items()},
+            "cache": r.get("cache", False),
+            "erreur": r.get("erreur"),
+            "duree_s": round(r["duree_s"], 2),
+        }
+        for r in results
+    ]).sort_values('produit', ignore_index=True)
+
+    return predictions_df.reset_index(drop=True), metrics_df
+
+
+def _scenario_label(chocs):
+    """Scénario lisible pour le README de l'exécution"""
+    if not chocs:
+        return "aucun"
+    labels = []
+    for choc in chocs:
+        operation = f"×{choc['facteur']:g}" if "facteur" in choc else f"= {choc['valeur']:g}"
+        periode = ""
+        if choc["debut"] or choc["fin"]:
+            periode = f" ({choc['debut'] or '…'} → {choc['fin'] or '…'})"
+        labels.append(f"{choc['regresseur']} {operation}{periode}")
+    return ", ".join(labels)
+
+
+def _intervals_label(args):
+    """Calcul des intervalles lisible pour le résumé de l'exécution"""
+    if args.methode == "baseline" or not PROPHET_AVAILABLE:
+        return "quantiles des résidus in-sample (baselines)"
+    if args.intervalles == "prophet":
+        return f"simulations Prophet ({args.echantillons} tirages)"
+    if args.intervalles == "residus":
+        source = f"backtest {args.erreurs}" if args.erreurs else "année d'évaluation"
+        return f"quantiles des erreurs ({source})"
+    return "aucun (prévision ponctuelle)"
+
+
+def main(args):
+    """
+    Prévisions multi-produits en ligne de commande (voir cli.add_forecast_arguments)
+    """
+    import json
+    from datetime import datetime
+
+    from data_loader import load_stock_data
+    from demand_matrix import build_demand_matrix, build_demand_matrix_streaming
+    from holiday_calendar import calendar_for
+    from instrumentation import stage_regressions
+    from regressor_projection import projection_for
+
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+    except ImportError:
+        results_mgr = None
+
+    instr = Instrumentation(args.profil, args.trace_memoire,
+                            output_dir=results_mgr.get_run_path() if results_mgr is not None else None)
+
+    if args.chunksize:
+        with instr.stage("agregation") as m:
+            demand = build_demand_matrix_streaming(args.csv, args.chunksize)
+            m["lignes"] = int(demand.nb_sorties.sum())
+    else:
+        with instr.stage("chargement") as m:
+            df = load_stock_data(args.csv)
+            m["lignes"] = len(df)
+        with instr.stage("agregation", lignes=len(df)):
+            demand = build_demand_matrix(df)
+        del df
+
+    start = time.perf_counter()
+    if args.methode == "baseline" or not PROPHET_AVAILABLE:
+        from baselines import forecast_baselines
+
+        print("⚡ Prévisions baseline NumPy (sans Prophet)")
+        if args.scenario:
+            print("⚠️  Scénario ignoré : les baselines n'utilisent pas les régresseurs")
+        produits = resolve_products(demand, args.produits)
+        with instr.stage("predict", lignes=len(produits)):
+            predictions_df = forecast_baselines(demand, produits, horizon=args.horizon)
+        metrics_df = (predictions_df.groupby('produit', sort=True)['methode'].first()
+                      .reset_index().assign(statut="ok", cache=False))
+    else:
+        store = None
+        if results_mgr is not None and not args.no_cache:
+            from model_store import ModelStore
+            store = ModelStore.from_results_manager(results_mgr)
+
+        configs = None
+        if args.configs_tunees and results_mgr is not None:
+            from tuning import load_best_configs
+            configs = load_best_configs(results_mgr)
+            print(f"🎛️  {len(configs)} configuration(s) issues du tuning")
+
+        with instr.stage("holidays"):
+            calendar = calendar_for(demand, fenetres=dict(args.fenetre or []))
+        print(f"📅 {calendar}")
+        with instr.stage("projection"):
+            projection = projection_for(demand, args.horizon)
+            if args.scenario:
+                projection = projection.with_scenario(args.scenario)
+        print(f"🌡️  {projection}")
+
+        erreurs = None
+        if args.intervalles == "residus" and args.erreurs:
+            erreurs = pd.read_csv(args.erreurs, usecols=['produit', 'horizon_jour', 'erreur'])
+            print(f"📏 Intervalles : erreurs du backtest {args.erreurs} "
+                  f"({erreurs['produit'].nunique()} produit(s))")
+
+        predictions_df, metrics_df = run_batch(
+            demand, args.produits, n_workers=args.workers, horizon=args.horizon, store=store,
+            instr=instr, configs=configs, calendar=calendar, projection=projection,
+            intervalles=args.intervalles, echantillons=args.echantillons, erreurs=erreurs
+        )
+    duree = time.perf_counter() - start
+    print(f"\n⏱️  {len(metrics_df)} produit(s) en {duree:.1f}s")
+
+    # Écriture directe dans le dossier de l'exécution (sinon répertoire courant)
+    def output(filename):
+        return results_mgr.output_path(filename) if results_mgr is not None else Path(filename)
+
+    # Graphiques de tout le catalogue (rendu parallèle, sans affichage)
+    if args.graphiques and len(predictions_df):
+        from plot_report import payloads_from_predictions, render_reports
+
+        with instr.stage("graphiques", lignes=predictions_df['produit'].nunique()):
+            render_reports(payloads_from_predictions(demand, predictions_df),
+                           output_dir=None if results_mgr is not None else Path('graphs'),
+                           results_mgr=results_mgr, kinds=["predictions"],
+                           preset=args.graphiques, n_workers=args.workers)
+
+    filename_csv = output(f'predictions_batch_{args.horizon}j.csv')
+    with instr.stage("export", lignes=len(predictions_df)):
+        predictions_df.to_csv(filename_csv, index=False)
+    print(f"✅ {filename_csv}")
+
+    label = f"Batch ({len(metrics_df)} produits)"
+    etapes = instr.as_dict()
+    instr.print_summary()
+    summary = {
+        "date_analyse": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "horizon": f"{args.horizon} jours",
+        "duree_totale_s": round(duree, 2),
+        "etapes": etapes,
+        "scenario": args.scenario or [],
+        "intervalles": _intervals_label(args),
+        "produits": json.loads(metrics_df.round(2).to_json(orient='records', force_ascii=False)),
+    }
+    if results_mgr is not None:
+        summary["alertes_etapes"] = stage_regressions(results_mgr, label, etapes)
+    filename_json = output('summary_batch.json')
+    with open(filename_json, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"✅ {filename_json}")
+
+    if results_mgr is not None:
+        results_mgr.create_summary_file(label, {
+            "Produits OK": int((metrics_df['statut'] == 'ok').sum()),
+            "Modèles en cache": int(metrics_df['cache'].sum()),
+            "MAPE médian": f"{metrics_df['MAPE'].median():.2f}%" if 'MAPE' in metrics_df else "N/A",
+            "Durée": f"{duree:.1f}s",
+            "Scénario": _scenario_label(args.scenario),
+            "Intervalles": _intervals_label(args),
+            "etapes": etapes,
+        })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_forecast_arguments
+
+    parser = argparse.ArgumentParser(description="Prévisions Prophet multi-produits")
+    add_forecast_arguments(parser)
+    main(parser.parse_args())
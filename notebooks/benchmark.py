@@ -0,0 +1,250 @@
+"""
+Benchmark - Mesure des étapes du pipeline sur des ledgers synthétiques
+Chronomètre chargement, agrégation, holidays, projection des régresseurs,
+fit, predict, graphiques et export
+(temps réel, temps CPU, pic mémoire) et enregistre le résultat en JSON avec
+le commit courant, pour comparer deux versions du code.
+
+Usage:
+    python cli.py bench --taille moyen
+    python cli.py bench --taille grand --fits 0
+    python cli.py bench --taille petit --compare ../results/_benchmarks/bench_X.json
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from defaults import TAILLES
+from instrumentation import TOUTES, Instrumentation
+
+
+# Ralentissement signalé lors d'une comparaison (temps réel, ratio)
+SEUIL_REGRESSION = 1.2
+
+# Étapes plus courtes que ce seuil : trop bruitées pour être comparées
+DUREE_MIN_COMPARAISON = 0.05
+
+
+def git_commit():
+    """Commit courant du dépôt (None hors d'un dépôt git)"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Versions et matériel, pour ne comparer que des mesures comparables"""
+    import numpy
+    import pandas
+
+    from forecasting import PROPHET_AVAILABLE
+
+    env = {
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "cpu": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+    }
+    if PROPHET_AVAILABLE:
+        from importlib.metadata import version
+        env["prophet"] = version("prophet")
+    return env
+
+
+def run_benchmark(taille="petit", csv=None, fits=3, graphiques=6, horizon=28, seed=0,
+                  memoire=False, workdir=None):
+    """
+    Exécute toutes les étapes sur un ledger synthétique (ou un CSV donné)
+
+    Args:
+        taille: Clé de TAILLES (ignorée si csv est donné)
+        csv: Ledger existant à mesurer au lieu d'un ledger synthétique
+        fits: Nombre de produits entraînés avec Prophet (0 : sans Prophet)
+        graphiques: Nombre de graphiques rendus
+        horizon: Horizon de prévision
+        seed: Graine du générateur
+        memoire: Mesurer les pics d'allocation par étape (tracemalloc
+            multiplie les durées par 2 à 5 : ne pas comparer les temps
+            d'un benchmark avec et sans)
+        workdir: Dossier des fichiers temporaires (CSV, cache, exports),
+            créé dans /tmp et conservé si absent
+
+    Returns:
+        dict: Paramètres, environnement et mesures par étape
+    """
+    from baselines import forecast_baselines
+    from data_loader import clear_cache, load_stock_data
+    from demand_matrix import build_demand_matrix, build_demand_matrix_streaming
+    from forecasting import PROPHET_AVAILABLE
+
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="bench_"))
+    bench = Instrumentation(trace_memoire=TOUTES if memoire else None, output_dir=workdir,
+                            verbose=True)
+    params = {"taille": None if csv else taille, "csv": str(csv) if csv else None,
+              "fits": fits, "graphiques": graphiques, "horizon": horizon, "seed": seed,
+              "memoire": memoire}
+
+    print(f"⏱️  Benchmark ({taille if csv is None else csv})")
+    if csv is None:
+        from synthetic_ledger import generate_ledger, write_ledger
+
+        with bench.stage("generation") as m:
+            df = generate_ledger(TAILLES[taille]["produits"], TAILLES[taille]["sites"],
+                                 debut=TAILLES[taille]["debut"], seed=seed, verbose=False)
+            m["lignes"] = len(df)
+        csv = workdir / f"ledger_{taille}.csv"
+        with bench.stage("ecriture_csv", lignes=len(df)):
+            write_ledger(df, csv)
+        del df
+
+    cache_dir = workdir / ".cache"
+    clear_cache(csv, cache_dir)
+    with bench.stage("chargement_csv") as m:
+        df = load_stock_data(csv, cache_dir=cache_dir, verbose=False)
+        m["lignes"] = len(df)
+    with bench.stage("chargement_cache", lignes=len(df)):
+        df = load_stock_data(csv, cache_dir=cache_dir, verbose=False)
+
+    with bench.stage("agregation", lignes=len(df)):
+        demand = build_demand_matrix(df)
+    with bench.stage("agregation_streaming", lignes=len(df)):
+        build_demand_matrix_streaming(csv, verbose=False)
+    del df
+
+    with bench.stage("baselines", lignes=len(demand)):
+        predictions = forecast_baselines(demand, horizon=horizon)
+
+    # Les produits les plus consommés : ceux dont le fit est le plus représentatif
+    produits = [demand.products[j] for j in demand.quantite.sum(axis=0).argsort()[::-1]]
+    if fits and PROPHET_AVAILABLE:
+        from forecasting import fit_or_load, future_regressors, init_worker, regressors_in
+        from holiday_calendar import HolidayCalendar
+        from regressor_projection import RegressorProjection
+
+        init_worker()
+        with bench.stage("holidays", lignes=len(demand.dates)):
+            calendar = HolidayCalendar.from_demand(demand)
+        with bench.stage("projection", lignes=len(demand.dates)):
+            projection = RegressorProjection.from_demand(demand, horizon)
+        models = []
+        with bench.stage("fit", lignes=fits):
+            for produit in produits[:fits]:
+                prophet_df = demand.prophet_frame(produit)
+                model, _, _ = fit_or_load(prophet_df, calendar.holidays, calendar.changepoints,
+                                          regressors_in(prophet_df))
+                models.append((model, prophet_df))
+        with bench.stage("predict", lignes=fits):
+            for model, prophet_df in models:
+                future = future_regressors(model.make_future_dataframe(periods=horizon), prophet_df,
+                                           projection)
+                model.predict(future)
+    elif fits:
+        print("   ⚠️  Prophet non disponible : fit/predict non mesurés")
+
+    if graphiques:
+        from plot_report import payloads_from_predictions, render_reports
+
+        subset = predictions[predictions['produit'].isin(produits[:graphiques])]
+        with bench.stage("graphiques", lignes=graphiques):
+            render_reports(payloads_from_predictions(demand, subset), output_dir=workdir / "graphs",
+                           kinds=["predictions"], preset="ecran", n_workers=1, verbose=False)
+
+    with bench.stage("export", lignes=len(predictions)):
+        predictions.to_csv(workdir / "predictions.csv", index=False)
+        with open(workdir / "summary.json", 'w', encoding='utf-8') as f:
+            json.dump(json.loads(predictions.groupby('produit')['quantite_prevue'].sum()
+                                 .to_json(force_ascii=False)), f, ensure_ascii=False)
+
+    return {
+        "date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "commit": git_commit(),
+        "parametres": params,
+        "environnement": environment(),
+        "ledger": {"produits": len(demand), "jours": len(demand.dates)},
+        "etapes": [{"etape": name, **mesure} for name, mesure in bench.as_dict().items()],
+        "duree_totale_s": round(sum(e["duree_s"] for e in bench.etapes.values()), 3),
+    }
+
+
+def compare(result, reference, seuil=SEUIL_REGRESSION):
+    """
+    Compare deux benchmarks étape par étape
+
+    Returns:
+        List[dict]: etape, reference_s, actuel_s, ratio, regression
+    """
+    ref = {e["etape"]: e for e in reference["etapes"]}
+    rows = []
+    for etape in result["etapes"]:
+        before = ref.get(etape["etape"])
+        if before is None:
+            continue
+        ratio = etape["duree_s"] / before["duree_s"] if before["duree_s"] > 0 else None
+        rows.append({
+            "etape": etape["etape"],
+            "reference_s": before["duree_s"],
+            "actuel_s": etape["duree_s"],
+            "ratio": None if ratio is None else round(ratio, 3),
+            "regression": bool(ratio is not None and ratio > seuil
+                               and max(etape["duree_s"], before["duree_s"]) >= DUREE_MIN_COMPARAISON),
+        })
+    return rows
+
+
+def main(args):
+    """Benchmark en ligne de commande (voir cli.add_bench_arguments)"""
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        result = run_benchmark(args.taille, csv=args.csv, fits=args.fits,
+                               graphiques=args.graphiques, horizon=args.horizon, seed=args.seed,
+                               memoire=args.memoire, workdir=workdir)
+
+    output = args.output
+    if output is None:
+        try:
+            from results_manager import ResultsManager
+            bench_dir = ResultsManager(args.results_dir).get_store_dir("benchmarks")
+        except ImportError:
+            bench_dir = Path(".")
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = Path(bench_dir) / f"bench_{stamp}_{result['commit'] or 'local'}.json"
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ {output} ({result['duree_totale_s']:.1f}s au total)")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            reference = json.load(f)
+        print(f"\n📊 Comparaison avec {reference.get('commit')} ({reference.get('date')})")
+        differences = [k for k, v in result["parametres"].items()
+                       if reference.get("parametres", {}).get(k) != v]
+        if differences:
+            print(f"⚠️  Paramètres différents ({', '.join(differences)}) : durées peu comparables")
+        regressions = 0
+        for row in compare(result, reference):
+            flag = "⚠️ " if row["regression"] else "  "
+            ratio = f"×{row['ratio']:.2f}" if row["ratio"] is not None else "-"
+            print(f"{flag} {row['etape']:22s} {row['reference_s']:8.3f}s → "
+                  f"{row['actuel_s']:8.3f}s  {ratio}")
+            regressions += row["regression"]
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_bench_arguments
+
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline")
+    add_bench_arguments(parser)
+    main(parser.parse_args())
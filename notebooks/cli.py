@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+CLI - Point d'entrée unique des analyses de stock
+Chaque sous-commande n'importe que ce dont elle a besoin : `runs list` et
+les prévisions baseline démarrent sans charger Prophet ni matplotlib
+
+Usage:
+    python cli.py forecast --produits all --methode baseline
+    python cli.py forecast --produits "Poulet frais" --workers 8
+    python cli.py forecast --produits all --methode baseline --graphiques miniature
+    python cli.py backtest --produits "Poulet frais" --horizon 28
+    python cli.py forecast --produits all --methode baseline --chunksize 500000
+    python cli.py forecast --produits all --fenetre jour_ferie=-1:1
+    python cli.py forecast --produits all --scenario epidemie_grippe=1@2025-01-06:2025-01-12
+    python cli.py forecast --produits all --intervalles residus --erreurs backtest_28j.csv
+    python cli.py refresh --methode prophet --seuil-derive 0.25
+    python cli.py refresh --validation exclure
+    python cli.py validate --csv ../data/dataset_stock_hopital_ENRICHI.csv --strict
+    python cli.py tune --produits all --par famille --candidats 24
+    python cli.py hierarchy --reconciliation mint --covariance shrink --evaluer
+    python cli.py hierarchy --par-site --prophet-niveaux famille --reconciliation top_down --depuis famille
+    python cli.py pipeline --produits all --workers 6 --workers-rendu 2 --en-cours 8
+    python cli.py report --produit "Poulet frais" --preset ecran
+    python cli.py report --produit "Poulet frais" --profil fit
+    python cli.py serve --port 8765
+    python cli.py generate --produits 200 --sites 3 --output ../data/synthetique.csv
+    python cli.py bench --taille moyen --compare ../results/_benchmarks/bench_X.json
+    python cli.py runs list --limit 5 --produit "Poulet frais"
+    python cli.py runs compare --produit "Poulet frais" --metriques performance_modele.MAPE
+    python cli.py runs gc --keep-last 100 --max-age-days 90
+"""
+
+import argparse
+from datetime import date
+
+# Choix et valeurs par défaut partagés avec les modules (sans dépendance)
+from defaults import (
+    COVARIANCES, CRITERES, DEBUT, ECHANTILLONS_INCERTITUDE, ETAPES, FIN, HOLIDAYS_COLONNES,
+    HORIZON_JOURS, INITIAL_JOURS, INTERVALLES, NB_CANDIDATS, NB_CUTOFFS, NIVEAUX,
+    PERIODE_JOURS, PERIODE_TUNING, PORT_DEFAUT, PRESETS, RECONCILIATIONS, REGRESSEURS_PROPHET,
+    REPRISES, SEUIL_DERIVE, SEUIL_TROU_JOURS, TAILLES, TOUTES, VALIDATIONS, WORKERS_IO,
+    WORKERS_RENDU
+)
+
+
+CSV_DEFAUT = "../data/dataset_stock_hopital_ENRICHI.csv"
+ETAPES_PROFIL = [*ETAPES, TOUTES]
+HOLIDAYS = list(HOLIDAYS_COLONNES.values())
+REGRESSEURS = list(REGRESSEURS_PROPHET)
+
+
+def add_chunksize_argument(parser):
+    """Lecture du CSV en streaming (ledgers plus grands que la mémoire)"""
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Lire le CSV par blocs de N lignes sans charger le ledger complet")
+
+
+def add_instrumentation_arguments(parser):
+    """Rapports détaillés d'une étape (écrits dans le dossier de l'exécution)"""
+    parser.add_argument("--profil", choices=ETAPES_PROFIL, default=None,
+                        help="Profiler une étape avec cProfile (profil_<etape>.prof/.txt)")
+    parser.add_argument("--trace-memoire", choices=ETAPES_PROFIL, default=None,
+                        help="Suivre les allocations d'une étape avec tracemalloc (memoire_<etape>.txt)")
+
+
+def fenetre(value):
+    """
+    Fenêtre d'un holiday au format NOM=AVANT:APRES (ex: jour_ferie=-1:1)
+
+    Returns:
+        tuple: (nom, (lower_window, upper_window))
+    """
+    try:
+        name, window = value.split("=")
+        lower, upper = (int(v) for v in window.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Format attendu NOM=AVANT:APRES : {value}")
+    if name not in HOLIDAYS:
+        raise argparse.ArgumentTypeError(f"Holiday inconnu : {name} ({', '.join(HOLIDAYS)})")
+    if lower > 0 or upper < 0:
+        raise argparse.ArgumentTypeError(f"Fenêtre invalide : {value} (AVANT <= 0 <= APRES)")
+    return name, (lower, upper)
+
+
+def add_calendar_arguments(parser):
+    """Fenêtres multi-jours des holidays (holiday_calendar.py)"""
+    parser.add_argument("--fenetre", type=fenetre, action="append", default=None,
+                        metavar="NOM=AVANT:APRES",
+                        help="Jours modélisés autour d'un holiday, ex: jour_ferie=-1:1 (répétable)")
+
+
+def choc(value):
+    """
+    Choc d'un scénario : REGRESSEUR=VALEUR ou REGRESSEUR*FACTEUR, suivi
+    éventuellement de @DEBUT:FIN (ex: epidemie_grippe=1@2025-01-06:2025-01-12)
+
+    Returns:
+        dict: regresseur, valeur ou facteur, debut, fin
+    """
+    spec, _, periode = value.partition("@")
+    operation = "*" if "*" in spec else "="
+    name, _, number = spec.partition(operation)
+    try:
+        number = float(number)
+        debut, fin = (periode.split(":") if periode else ("", ""))
+        for jour in (debut, fin):
+            if jour:
+                date.fromisoformat(jour)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Format attendu REGRESSEUR=VALEUR ou REGRESSEUR*FACTEUR[@DEBUT:FIN] : {value}")
+    if name not in REGRESSEURS:
+        raise argparse.ArgumentTypeError(f"Régresseur inconnu : {name} ({', '.join(REGRESSEURS)})")
+    return {"regresseur": name, ("facteur" if operation == "*" else "valeur"): number,
+            "debut": debut or None, "fin": fin or None}
+
+
+def add_scenario_arguments(parser):
+    """Scénario appliqué aux régresseurs projetés (regressor_projection.py)"""
+    parser.add_argument("--scenario", type=choc, action="append", default=None,
+                        metavar="REGRESSEUR=VALEUR[@DEBUT:FIN]",
+                        help="Remplacer (=) ou multiplier (*) un régresseur projeté, "
+                             "ex: epidemie_grippe=1@2025-01-06:2025-01-12 (répétable)")
+
+
+def add_forecast_arguments(parser):
+    """Options de la prévision multi-produits (batch_forecast.py)"""
+    parser.add_argument("--csv", default=CSV_DEFAUT)
+    parser.add_argument("--produits", nargs="+", default=["all"],
+                        help='Noms des produits ou "all"')
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--horizon", type=int, default=HORIZON_JOURS)
+    parser.add_argument("--methode", choices=["prophet", "baseline"], default="prophet",
+                        help="baseline : prévisions NumPy de tout le catalogue en une passe")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ne pas réutiliser les modèles déjà entraînés")
+    add_chunksize_argument(parser)
+    parser.add_argument("--graphiques", choices=PRESETS, default=None,
+                        help="Graphiques des prédictions de chaque produit (preset de rendu)")
+    parser.add_argument("--configs-tunees", action="store_true",
+                        help="Paramètres Prophet retenus par la dernière commande tune")
+    parser.add_argument("--intervalles", choices=INTERVALLES, default="prophet",
+                        help="quantite_min/max : simulations Prophet, quantiles des erreurs "
+                             "hors échantillon, ou prévision ponctuelle seule")
+    parser.add_argument("--echantillons", type=int, default=ECHANTILLONS_INCERTITUDE,
+                        help="Simulations Prophet par prédiction (--intervalles prophet)")
+    parser.add_argument("--erreurs", default=None,
+                        help="CSV du backtest (produit, horizon_jour, erreur) pour "
+                             "--intervalles residus (défaut : erreurs de l'année d'évaluation)")
+    add_calendar_arguments(parser)
+    add_scenario_arguments(parser)
+    add_instrumentation_arguments(parser)
+
+
+def add_backtest_arguments(parser):
+    """Options du backtest rolling-origin (backtest.py)"""
+    parser.add_argument("--csv", default=CSV_DEFAUT)
+    parser.add_argument("--produits", nargs="+", default=["Poulet frais"],
+                        help='Noms des produits ou "all"')
+    parser.add_argument("--horizon", type=int, default=HORIZON_JOURS)
+    parser.add_argument("--period", type=int, default=PERIODE_JOURS)
+    parser.add_argument("--initial", type=int, default=INITIAL_JOURS)
+    parser.add_argument("--window", choices=["expanding", "sliding"], default="expanding")
+    parser.add_argument("--window-days", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-intervals", action="store_true")
+    add_chunksize_argument(parser)
+    add_calendar_arguments(parser)
+
+
+def add_tune_arguments(parser):
+    """Options de la recherche des paramètres Prophet (tuning.py)"""
+    parser.add_argument("--csv", default=CSV_DEFAUT)
+    parser.add_argument("--produits", nargs="+", default=["all"],
+                        help='Noms des produits ou "all"')
+    parser.add_argument("--par", choices=["produit", "famille"], default="produit",
+                        help="Une configuration par produit ou par famille (type_produit)")
+    parser.add_argument("--recherche", choices=["aleatoire", "grille"], default="aleatoire")
+    parser.add_argument("--candidats", type=int, default=NB_CANDIDATS,
+                        help="Candidats tirés en recherche aléatoire")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--critere", choices=CRITERES, default="WAPE",
+                        help="Critère minimisé (WAPE : robuste aux jours sans consommation)")
+    parser.add_argument("--horizon", type=int, default=HORIZON_JOURS)
+    parser.add_argument("--cutoffs", type=int, default=NB_CUTOFFS)
+    parser.add_argument("--period", type=int, default=PERIODE_TUNING)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Réévaluer les candidats déjà mémorisés")
+    add_chunksize_argument(parser)
+    add_calendar_arguments(parser)
+
+
+def add_hierarchy_arguments(parser):
+    """Options des prévisions hiérarchiques réconciliées (hierarchy.py)"""
+    parser.add_argument("--csv", default=CSV_DEFAUT)
+    parser.add_argument("--horizon", type=int, default=HORIZON_JOURS)
+    parser.add_argument("--par-site", action="store_true",
+                        help="Niveau site entre le total et les familles (colonne site du ledger)")
+    parser.add_argument("--reconciliation", choices=RECONCILIATIONS, default="mint")
+    parser.add_argument("--covariance", choices=COVARIANCES, default="shrink",
+                        help="Covariance des erreurs de MinT")
+    parser.add_argument("--depuis", choices=NIVEAUX[:-1], default="total",
+                        help="Niveau réparti entre les produits (top_down)")
+    parser.add_argument("--prophet-niveaux", nargs="+", default=None,
+                        choices=NIVEAUX,
+                        help="Niveaux prévus avec Prophet (les autres : baselines NumPy)")
+    parser.add_argument("--evaluer", action="store_true",
+                        help="Comparer les réconciliations sur les derniers jours (WAPE par niveau)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ne pas réutiliser les modèles déjà entraînés")
+    add_chunksize_argument(parser)
+    add_calendar_arguments(parser)
+    add_instrumentation_arguments(parser)
+
+
+def add_pipeline_arguments(parser):
+    """Options du pipeline asynchrone multi-produits (pipeline.py)"""
+    parser.add_argument("--csv", default=CSV_DEFAUT)
+    parser.add_argument("--produits", nargs="+", default=["all"],
+                        help='Noms des produits ou "all"')
+    parser.add_argument("--horizon", type=int, default=HORIZON_JOURS)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processus de fit (défaut : CPU moins les workers de rendu)")
+    parser.add_argument("--workers-rendu", type=int, default=WORKERS_RENDU,
+                        help="Processus de rendu des graphiques")
+    parser.add_argument("--workers-io", type=int, default=WORKERS_IO,
+                        help="Threads d'écriture des fichiers")
+    parser.add_argument("--en-cours", type=int, default=None,
+                        help="Produits traités en même temps (défaut : 2 par worker de fit)")
+    parser.add_argument("--reprises", type=int, default=REPRISES,
+                        help="Nouvelles tentatives d'une étape en échec")
+    parser.add_argument("--preset", choices=PRESETS, default="ecran",
+                        help="Résolution des graphiques")
+    parser.add_argument("--sans-graphiques", action="store_true")
+    parser.add_argument("--intervalles", choices=INTERVALLES, default="prophet")
+    parser.add_argument("--echantillons", type=int, default=ECHANTILLONS_INCERTITUDE,
+                        help="Simulations Prophet par prédiction (--intervalles prophet)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ne pas réutiliser les modèles déjà entraînés")
+    add_chunksize_argument(parser)
+    add_calendar_arguments(parser)
+    add_scenario_arguments(parser)
+    add_instrumentation_arguments(parser)
+
+
+def add_report_arguments(parser):
+    """Options de l'analyse complète d'un produit (analyse_enrichie_complete.py)"""
+    parser.add_argument("--csv", default=CSV_DEFAUT)
+    parser.add_argument("--produit", default="Poulet frais")
+    parser.add_argument("--horizon", type=int, default=HORIZON_JOURS)
+    parser.add_argument("--preset", choices=PRESETS, default="impression",
+                        help="Résolution des graphiques (impression = 300 dpi)")
+    add_calendar_arguments(parser)
+    add_scenario_arguments(parser)
+    add_instrumentation_arguments(parser)
+
+
+def add_refresh_arguments(parser):
+    """Options du rafraîchissement incrémental quotidien (incremental.py)"""
+    parser.add_argument("--csv", default=CSV_DEFAUT)
+    parser.add_argument("--horizon", type=int, default=HORIZON_JOURS)
+    parser.add_argument("--methode", choices=["prophet", "baseline"], default="prophet")
+    parser.add_argument("--seuil-derive", type=float, default=SEUIL_DERIVE,
+                        help="Écart relatif prévu/observé en dessous duquel on prolonge sans réentraîner")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Ignorer l'état enregistré et tout recalculer")
+    parser.add_argument("--validation", choices=VALIDATIONS, default=None,
+                        help="Valider les nouvelles lignes (exclure : écarter celles en erreur)")
+    add_chunksize_argument(parser)
+    add_calendar_arguments(parser)
+    add_instrumentation_arguments(parser)
+
+
+def add_validate_arguments(parser):
+    """Options des contrôles de qualité du ledger (data_validation.py)"""
+    parser.add_argument("--csv", default=CSV_DEFAUT)
+    add_chunksize_argument(parser)
+    parser.add_argument("--seuil-trou", type=int, default=SEUIL_TROU_JOURS,
+                        help="Jours sans mouvement d'un produit signalés comme trou de couverture")
+    parser.add_argument("--strict", action="store_true",
+                        help="Code de sortie 1 si des lignes sont en erreur")
+
+
+def add_serve_arguments(parser):
+    """Options du service HTTP des prévisions (forecast_api.py)"""
+    parser.add_argument("--results-dir", default="../results")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT_DEFAUT)
+    parser.add_argument("--verbose", action="store_true", help="Journaliser chaque requête")
+
+
+def add_generate_arguments(parser):
+    """Options du générateur de ledger synthétique (synthetic_ledger.py)"""
+    parser.add_argument("--produits", type=int, default=18, help="Produits par site")
+    parser.add_argument("--sites", type=int, default=1)
+    parser.add_argument("--debut", default=DEBUT)
+    parser.add_argument("--fin", default=FIN)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="../data/dataset_stock_synthetique.csv")
+
+
+def add_bench_arguments(parser):
+    """Options du benchmark du pipeline (benchmark.py)"""
+    parser.add_argument("--taille", choices=list(TAILLES), default="petit",
+                        help="Ledger synthétique mesuré (voir defaults.TAILLES)")
+    parser.add_argument("--csv", default=None, help="Mesurer un ledger existant à la place")
+    parser.add_argument("--fits", type=int, default=3, help="Produits entraînés avec Prophet (0 : aucun)")
+    parser.add_argument("--graphiques", type=int, default=6, help="Graphiques rendus")
+    parser.add_argument("--horizon", type=int, default=HORIZON_JOURS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memoire", action="store_true",
+                        help="Pics d'allocation par étape (tracemalloc : durées non comparables)")
+    parser.add_argument("--results-dir", default="../results")
+    parser.add_argument("--output", default=None, help="Fichier JSON (défaut : results/_benchmarks)")
+    parser.add_argument("--compare", default=None, help="Benchmark JSON de référence")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Code de sortie 1 si une étape ralentit de plus de 20 %%")
+
+
+def _forecast(args):
+    from batch_forecast import main
+    main(args)
+
+
+def _backtest(args):
+    from backtest import main
+    main(args)
+
+
+def _refresh(args):
+    from incremental import main
+    main(args)
+
+
+def _tune(args):
+    from tuning import main
+    main(args)
+
+
+def _hierarchy(args):
+    from hierarchy import main
+    main(args)
+
+
+def _pipeline(args):
+    from pipeline import main
+    main(args)
+
+
+def _report(args):
+    from analyse_enrichie_complete import run_analysis
+    run_analysis(args.csv, args.produit, horizon=args.horizon, preset=args.preset,
+                 profil=args.profil, trace_memoire=args.trace_memoire,
+                 fenetres=dict(args.fenetre or []), scenario=args.scenario)
+
+
+def _validate(args):
+    from data_validation import main
+    main(args)
+
+
+def _serve(args):
+    from forecast_api import serve
+    serve(args.results_dir, args.host, args.port, args.verbose)
+
+
+def _generate(args):
+    from synthetic_ledger import main
+    main(args)
+
+
+def _bench(args):
+    from benchmark import main
+    main(args)
+
+
+def _runs_list(args):
+    from results_manager import ResultsManager
+    ResultsManager(args.results_dir).print_previous_runs(
+        args.limit, produit=args.produit, depuis=args.depuis, jusqu_a=args.jusqu_a
+    )
+
+
+def _runs_compare(args):
+    import json
+
+    from results_manager import ResultsManager
+    rows = ResultsManager(args.results_dir).compare_runs(
+        metriques=args.metriques, produit=args.produit, depuis=args.depuis,
+        jusqu_a=args.jusqu_a, limit=args.limit
+    )
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+
+
+def _runs_reindex(args):
+    from results_manager import ResultsManager
+    n = ResultsManager(args.results_dir).rebuild_index()
+    print(f"✅ {n} exécution(s) indexée(s)")
+
+
+def _runs_gc(args):
+    from results_manager import ResultsManager
+    ResultsManager(args.results_dir).collect_garbage(
+        keep_last=args.keep_last, max_age_days=args.max_age_days, dry_run=args.dry_run
+    )
+
+
+def add_runs_filters(parser):
+    """Filtres communs des commandes du catalogue d'exécutions"""
+    parser.add_argument("--results-dir", default="../results")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--produit", default=None)
+    parser.add_argument("--depuis", default=None, help="Date minimum (YYYY-MM-DD)")
+    parser.add_argument("--jusqu-a", default=None, help="Date maximum (YYYY-MM-DD)")
+
+
+def build_parser():
+    """Construit le parseur avec ses sous-commandes"""
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Prévisions de stock - Clinique du Mont Vert"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    forecast = commands.add_parser("forecast", help="Prévisions multi-produits")
+    add_forecast_arguments(forecast)
+    forecast.set_defaults(handler=_forecast)
+
+    backtest = commands.add_parser("backtest", help="Backtest rolling-origin")
+    add_backtest_arguments(backtest)
+    backtest.set_defaults(handler=_backtest)
+
+    refresh = commands.add_parser("refresh", help="Ingestion incrémentale et rafraîchissement quotidien")
+    add_refresh_arguments(refresh)
+    refresh.set_defaults(handler=_refresh)
+
+    tune = commands.add_parser("tune", help="Recherche parallèle des paramètres Prophet")
+    add_tune_arguments(tune)
+    tune.set_defaults(handler=_tune)
+
+    hierarchy = commands.add_parser("hierarchy", help="Prévisions produit/famille/total réconciliées")
+    add_hierarchy_arguments(hierarchy)
+    hierarchy.set_defaults(handler=_hierarchy)
+
+    pipeline = commands.add_parser("pipeline", help="Prévisions, graphiques et exports en pipeline asynchrone")
+    add_pipeline_arguments(pipeline)
+    pipeline.set_defaults(handler=_pipeline)
+
+    report = commands.add_parser("report", help="Analyse complète d'un produit avec graphiques")
+    add_report_arguments(report)
+    report.set_defaults(handler=_report)
+
+    validate = commands.add_parser("validate", help="Contrôles de qualité du ledger")
+    add_validate_arguments(validate)
+    validate.set_defaults(handler=_validate)
+
+    serve = commands.add_parser("serve", help="Service HTTP local des prévisions")
+    add_serve_arguments(serve)
+    serve.set_defaults(handler=_serve)
+
+    generate = commands.add_parser("generate", help="Générer un ledger synthétique")
+    add_generate_arguments(generate)
+    generate.set_defaults(handler=_generate)
+
+    bench = commands.add_parser("bench", help="Benchmark des étapes du pipeline")
+    add_bench_arguments(bench)
+    bench.set_defaults(handler=_bench)
+
+    runs = commands.add_parser("runs", help="Exécutions enregistrées")
+    runs_commands = runs.add_subparsers(dest="runs_command", required=True)
+    runs_list = runs_commands.add_parser("list", help="Lister les exécutions précédentes")
+    add_runs_filters(runs_list)
+    runs_list.set_defaults(handler=_runs_list)
+
+    runs_compare = runs_commands.add_parser("compare", help="Métriques de plusieurs exécutions")
+    add_runs_filters(runs_compare)
+    runs_compare.add_argument("--metriques", nargs="+", default=None)
+    runs_compare.set_defaults(handler=_runs_compare)
+
+    runs_reindex = runs_commands.add_parser("reindex", help="Reconstruire l'index des exécutions")
+    runs_reindex.add_argument("--results-dir", default="../results")
+    runs_reindex.set_defaults(handler=_runs_reindex)
+
+    runs_gc = runs_commands.add_parser("gc", help="Supprimer les anciennes exécutions et les blobs orphelins")
+    runs_gc.add_argument("--results-dir", default="../results")
+    runs_gc.add_argument("--keep-last", type=int, default=None)
+    runs_gc.add_argument("--max-age-days", type=int, default=None)
+    runs_gc.add_argument("--dry-run", action="store_true")
+    runs_gc.set_defaults(handler=_runs_gc)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
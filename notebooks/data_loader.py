@@ -0,0 +1,326 @@
+"""
+Data Loader - Chargement du dataset de stock avec cache colonnaire
+Convertit le CSV une seule fois en fichier Feather/Parquet typé (catégories,
+entiers compacts, dates parsées) puis relit ce cache en memory-map
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# Version du format de cache : à incrémenter si le typage change
+CACHE_VERSION = 1
+
+COLONNES_DATES = ['date', 'date_expiration']
+
+COLONNES_CATEGORIELLES = [
+    'nom_produit', 'type_produit', 'type_operation', 'type_sortie',
+    'unite', 'nom_fournisseur'
+]
+
+COLONNES_ENTIERES = [
+    'id_produit', 'id_lot', 'id_arrivage', 'id_fournisseur', 'nb_patients'
+]
+
+COLONNES_DRAPEAUX = [
+    'epidemie_grippe', 'vacances_scolaires', 'jour_ferie', 'covid_impact'
+]
+
+EXTENSIONS = {"feather": ".feather", "parquet": ".parquet"}
+
+# Taille des blocs de la lecture en streaming (lignes)
+CHUNK_LIGNES = 500_000
+
+
+def optimize_dtypes(df):
+    """
+    Convertit les colonnes du ledger vers des types compacts
+
+    Les chaînes deviennent des catégories, les identifiants et drapeaux
+    des entiers de taille minimale. Les quantités restent en float64 pour
+    que les agrégations soient identiques à celles du CSV brut.
+
+    Args:
+        df: DataFrame brut (modifié en place)
+
+    Returns:
+        DataFrame: Le même DataFrame avec les types optimisés
+    """
+    for col in COLONNES_DATES:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col])
+
+    for col in COLONNES_CATEGORIELLES:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col in COLONNES_ENTIERES + COLONNES_DRAPEAUX:
+        # Une colonne avec des NaN ne peut pas être un entier numpy : on la garde
+        if col in df.columns and not df[col].isna().any():
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    return df
+
+
+def read_stock_csv(csv_path):
+    """
+    Lit le CSV de stock directement avec les types optimisés (sans cache)
+
+    Args:
+        csv_path: Chemin du fichier CSV
+
+    Returns:
+        DataFrame: Ledger typé
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {col: 'category' for col in COLONNES_CATEGORIELLES if col in header}
+    dates = [col for col in COLONNES_DATES if col in header]
+
+    df = pd.read_csv(csv_path, dtype=dtypes, parse_dates=dates)
+    return optimize_dtypes(df)
+
+
+class _FileRange:
+    """Vue en lecture seule sur les octets [début, début + taille) d'un fichier"""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.remaining = size
+
+    def read(self, n=-1):
+        if n is None or n < 0 or n > self.remaining:
+            n = self.remaining
+        data = self.f.read(n)
+        self.remaining -= len(data)
+        return data
+
+
+def csv_offsets(csv_path):
+    """
+    Positions (en octets) de la fin de l'en-tête et de la dernière ligne complète
+
+    Une ligne en cours d'écriture (sans retour à la ligne final) est exclue :
+    elle sera lue à l'exécution suivante.
+
+    Returns:
+        tuple: (fin de l'en-tête, fin des données)
+    """
+    with open(csv_path, 'rb') as f:
+        header_end = len(f.readline())
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > header_end:
+            block_start = max(end - 65536, header_end)
+            f.seek(block_start)
+            block = f.read(end - block_start)
+            if b'\n' in block:
+                end = block_start + block.rfind(b'\n') + 1
+                break
+            end = block_start
+    return header_end, max(end, header_end)
+
+
+def iter_stock_chunks(csv_path, chunksize=CHUNK_LIGNES, columns=None, start=None, end=None):
+    """
+    Lit le CSV de stock par blocs, sans jamais charger le fichier entier
+
+    Args:
+        csv_path: Chemin du fichier CSV
+        chunksize: Nombre de lignes par bloc
+        columns: Colonnes à lire (défaut : toutes) ; les colonnes absentes
+            du fichier sont ignorées
+        start: Position (octets) de la première ligne à lire (défaut : après l'en-tête)
+        end: Position de fin (défaut : fin du fichier)
+
+    Yields:
+        DataFrame: Bloc typé (dates parsées, colonnes catégorielles)
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [col for col in header if columns is None or col in columns]
+    dtypes = {col: 'category' for col in COLONNES_CATEGORIELLES if col in usecols}
+    dates = [col for col in COLONNES_DATES if col in usecols]
+    options = dict(usecols=usecols, dtype=dtypes, parse_dates=dates, chunksize=chunksize)
+
+    if start is None and end is None:
+        with pd.read_csv(csv_path, **options) as reader:
+            yield from reader
+        return
+
+    header_end, data_end = csv_offsets(csv_path)
+    start = header_end if start is None else start
+    end = data_end if end is None else end
+    if end <= start:
+        return
+
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        with pd.read_csv(_FileRange(f, end - start), header=None, names=list(header),
+                         encoding='utf-8', **options) as reader:
+            yield from reader
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Calcule le SHA-256 d'un fichier par blocs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(csv_path, cache_dir, cache_format):
+    """Retourne (fichier de cache, fichier de métadonnées)"""
+    csv_path = Path(csv_path)
+    cache_dir = Path(cache_dir) if cache_dir else csv_path.parent / ".cache"
+    cache_file = cache_dir / (csv_path.stem + EXTENSIONS[cache_format])
+    return cache_file, cache_file.with_name(cache_file.name + ".meta.json")
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _cache_is_valid(csv_path, cache_file, meta_file, verify_hash):
+    """
+    Vérifie que le cache correspond toujours au CSV source
+
+    La taille et le mtime suffisent dans le cas courant. S'ils ont changé
+    (copie, checkout git...), on compare le hash du contenu avant de
+    décider de reconstruire le cache.
+    """
+    if not cache_file.exists() or not meta_file.exists():
+        return False
+
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    if meta.get("version") != CACHE_VERSION:
+        return False
+
+    signature = _source_signature(csv_path)
+    if signature["size"] == meta.get("size") and signature["mtime_ns"] == meta.get("mtime_ns"):
+        return True
+
+    if verify_hash and signature["size"] == meta.get("size"):
+        if file_hash(csv_path) == meta.get("sha256"):
+            # Contenu identique : on met à jour la signature pour la prochaine fois
+            meta.update(signature)
+            with open(meta_file, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+            return True
+
+    return False
+
+
+def _write_cache(df, cache_file, cache_format):
+    """Écrit le cache de façon atomique (fichier temporaire puis rename)"""
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    if cache_format == "feather":
+        # Non compressé pour permettre la lecture zero-copy en memory-map
+        feather.write_feather(df, tmp_file, compression='uncompressed')
+    else:
+        df.to_parquet(tmp_file, engine='pyarrow', index=False)
+    os.replace(tmp_file, cache_file)
+
+
+def _read_cache(cache_file, cache_format):
+    if cache_format == "feather":
+        table = feather.read_table(cache_file, memory_map=True)
+    else:
+        table = pq.read_table(cache_file, memory_map=True)
+    return table.to_pandas()
+
+
+def load_stock_data(csv_path, cache_dir=None, cache_format="feather",
+                    verify_hash=True, verbose=True):
+    """
+    Charge le ledger de stock en passant par un cache colonnaire
+
+    Au premier appel le CSV est parsé et typé puis écrit en Feather/Parquet.
+    Les appels suivants relisent ce fichier en memory-map, tant que le CSV
+    source n'a pas changé (mtime, taille ou hash).
+
+    Args:
+        csv_path: Chemin du fichier CSV source
+        cache_dir: Dossier du cache (par défaut : data/.cache à côté du CSV)
+        cache_format: "feather" (memory-map, défaut) ou "parquet" (plus compact)
+        verify_hash: Comparer le hash du contenu si le mtime a changé
+        verbose: Afficher les messages de progression
+
+    Returns:
+        DataFrame: Ledger avec dates parsées et colonnes catégorielles
+    """
+    if cache_format not in EXTENSIONS:
+        raise ValueError(f"Format de cache inconnu : {cache_format} (feather ou parquet)")
+
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"Le fichier {csv_path} n'existe pas")
+
+    if not PYARROW_AVAILABLE:
+        if verbose:
+            print("⚠️  pyarrow non disponible : lecture directe du CSV (pip install pyarrow)")
+        return read_stock_csv(csv_path)
+
+    cache_file, meta_file = _cache_paths(csv_path, cache_dir, cache_format)
+
+    if _cache_is_valid(csv_path, cache_file, meta_file, verify_hash):
+        if verbose:
+            print(f"⚡ Cache chargé : {cache_file.name}")
+        return _read_cache(cache_file, cache_format)
+
+    if verbose:
+        print(f"📊 Conversion de {csv_path.name} vers le cache {cache_format}...")
+
+    df = read_stock_csv(csv_path)
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    _write_cache(df, cache_file, cache_format)
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": str(csv_path.resolve()),
+        "format": cache_format,
+        "sha256": file_hash(csv_path),
+        "rows": len(df),
+        **_source_signature(csv_path),
+    }
+    with open(meta_file, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    if verbose:
+        print(f"✅ Cache créé : {cache_file}")
+
+    return df
+
+
+def clear_cache(csv_path, cache_dir=None):
+    """Supprime les fichiers de cache associés à un CSV"""
+    for cache_format in EXTENSIONS:
+        for path in _cache_paths(csv_path, cache_dir, cache_format):
+            if path.exists():
+                path.unlink()
+
+
+# Exemple d'utilisation
+if __name__ == "__main__":
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "../data/dataset_stock_hopital_REALISTE.csv"
+
+    df = load_stock_data(source)
+    print(f"📏 Dimensions : {df.shape[0]:,} lignes × {df.shape[1]} colonnes")
+    print(f"💾 Taille mémoire : {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+    print(df.dtypes)
@@ -0,0 +1,453 @@
+"""
+Data Validation - Contrôles de qualité du ledger en une passe vectorisée
+Tous les contrôles portent sur les colonnes entières (aucune boucle sur les
+lignes) : valeurs manquantes, quantités et stocks négatifs, unité
+incohérente d'un produit, lots en double ou d'un autre produit, sorties
+dépassant la quantité reçue sur le lot, températures hors chaîne du froid,
+mouvements après expiration, jours sans données. Chaque anomalie garde
+l'indice de sa ligne dans le CSV (0 = première ligne de données).
+
+Le validateur garde entre deux blocs ce qu'il faut pour continuer (unités de
+référence, soldes des lots, derniers jours couverts) : il valide un CSV lu
+en streaming ou seulement les lignes ajoutées depuis l'exécution précédente
+(voir incremental.refresh).
+
+Usage:
+    validator = validate_ledger(df)
+    validator.write(results_mgr.get_run_path())
+
+    validator = DataValidator()
+    for chunk in iter_stock_chunks(csv, columns=DataValidator.columns()):
+        erreurs = validator.add(chunk)      # lignes à écarter des prévisions
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from defaults import SEUIL_TROU_JOURS
+from lot_ledger import EPSILON
+
+
+# Contrôles : gravité et description. Les lignes en "erreur" peuvent être
+# écartées des prévisions ; les "avertissements" sont seulement signalés.
+CONTROLES = {
+    "valeur_manquante": ("erreur", "Date, produit ou quantité manquant"),
+    "quantite_negative": ("erreur", "Quantité négative"),
+    "stock_negatif": ("erreur", "stock_theorique négatif"),
+    "unite_incoherente": ("erreur", "Unité différente de l'unité de référence du produit"),
+    "lot_autre_produit": ("erreur", "Mouvement sur un lot reçu pour un autre produit"),
+    "sortie_depasse_solde": ("erreur", "Sorties cumulées supérieures à la quantité reçue sur le lot"),
+    "temperature_chaine_froid": ("erreur", "Température de stockage hors de la chaîne du froid"),
+    "lot_duplique": ("avertissement", "Nouvelle entrée sur un lot déjà reçu"),
+    "sortie_lot_inconnu": ("avertissement", "Sortie sur un lot sans entrée"),
+    "apres_expiration": ("avertissement", "Mouvement après la date d'expiration du lot"),
+    "trou_couverture": ("avertissement", "Produit sans aucun mouvement pendant plusieurs jours"),
+    "jour_manquant": ("avertissement", "Jours sans aucune ligne dans le ledger"),
+}
+
+COLONNES_REQUISES = ['date', 'nom_produit', 'quantite']
+
+# Plage de la chaîne du froid (°C) des lignes avec une température de
+# stockage ; remplaçable produit par produit (ex: surgelés)
+PLAGE_CHAINE_FROID = (0.0, 8.0)
+
+# Indices de lignes listés par contrôle dans le rapport JSON (tous sont
+# dans le CSV des anomalies)
+MAX_INDICES = 20
+
+RAPPORT_FILENAME = "validation.json"
+ANOMALIES_FILENAME = "anomalies.csv"
+
+
+def _days(values):
+    """Dates en nombre de jours depuis l'epoch"""
+    return np.asarray(values, dtype='datetime64[D]').astype(np.int64)
+
+
+class DataValidator:
+    """
+    Validation du ledger bloc par bloc
+
+    Les lignes d'un bloc sont supposées postérieures (ou du même jour) à
+    celles des blocs précédents, comme dans un ledger complété chaque jour.
+    """
+
+    def __init__(self, plages=None, seuil_trou=SEUIL_TROU_JOURS):
+        """
+        Args:
+            plages: {produit: (min, max)} remplaçant PLAGE_CHAINE_FROID
+            seuil_trou: Jours sans mouvement signalés (trou_couverture)
+        """
+        self.plages = plages or {}
+        self.seuil_trou = seuil_trou
+        self.nb_lignes = 0
+        self.premiere_ligne = 0
+        self.unites = {}
+        self.lots = pd.DataFrame({'produit': pd.Series(dtype=object),
+                                  'quantite': pd.Series(dtype=np.float64),
+                                  'sortie': pd.Series(dtype=np.float64)})
+        self.derniers_jours = {}
+        self.dernier_jour = None
+        self._anomalies = []
+
+    @staticmethod
+    def columns():
+        """Colonnes du CSV nécessaires aux contrôles"""
+        return ['date', 'nom_produit', 'type_operation', 'quantite', 'unite', 'id_lot',
+                'date_expiration', 'stock_theorique', 'temperature_stockage']
+
+    def add(self, chunk):
+        """
+        Contrôle un bloc du ledger
+
+        Returns:
+            ndarray: Masque des lignes du bloc en erreur
+        """
+        n = len(chunk)
+        indices = np.arange(self.nb_lignes, self.nb_lignes + n)
+        self.nb_lignes += n
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+
+        produits = chunk['nom_produit'].astype(str).to_numpy()
+        dates = chunk['date'].to_numpy()
+        quantite = chunk['quantite'].to_numpy(dtype=np.float64)
+        valeurs = {}
+
+        cols = [col for col in COLONNES_REQUISES if col in chunk.columns]
+        valeurs["valeur_manquante"] = (chunk[cols].isna().any(axis=1).to_numpy(), None)
+        valeurs["quantite_negative"] = (quantite < 0, quantite)
+        if 'stock_theorique' in chunk.columns:
+            stock = chunk['stock_theorique'].to_numpy(dtype=np.float64)
+            valeurs["stock_negatif"] = (stock < 0, stock)
+        if 'date_expiration' in chunk.columns:
+            expiration = chunk['date_expiration'].to_numpy()
+            connue = ~pd.isna(expiration) & ~pd.isna(dates)
+            retard = np.full(n, np.nan)
+            retard[connue] = _days(dates[connue]) - _days(expiration[connue])
+            valeurs["apres_expiration"] = (retard > 0, retard)
+        if 'unite' in chunk.columns:
+            valeurs["unite_incoherente"] = (self._check_units(produits, chunk['unite']), None)
+        if 'temperature_stockage' in chunk.columns:
+            temperature = chunk['temperature_stockage'].to_numpy(dtype=np.float64)
+            valeurs["temperature_chaine_froid"] = (self._check_temperature(produits, temperature),
+                                                   temperature)
+        if 'id_lot' in chunk.columns and 'type_operation' in chunk.columns:
+            valeurs.update(self._check_lots(chunk, produits, dates, quantite))
+        valeurs.update(self._check_coverage(produits, dates))
+
+        erreurs = np.zeros(n, dtype=bool)
+        for controle, (mask, valeur) in valeurs.items():
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                continue
+            if CONTROLES[controle][0] == "erreur":
+                erreurs[rows] = True
+            self._anomalies.append(pd.DataFrame({
+                'indice': indices[rows],
+                'controle': controle,
+                'produit': produits[rows],
+                'date': pd.DatetimeIndex(dates[rows]).date,
+                'valeur': valeur[rows] if valeur is not None else np.nan,
+            }))
+        return erreurs
+
+    def _check_units(self, produits, unites):
+        """Unité différente de celle du produit (majoritaire à sa première apparition)"""
+        unites = unites.astype(str).to_numpy()
+        pairs = pd.DataFrame({'produit': produits, 'unite': unites})
+        majoritaires = pairs.value_counts().reset_index().drop_duplicates('produit')
+        for produit, unite in zip(majoritaires['produit'], majoritaires['unite']):
+            self.unites.setdefault(produit, unite)
+        reference = pd.Series(self.unites).reindex(produits).to_numpy()
+        return unites != reference
+
+    def _check_temperature(self, produits, temperature):
+        """Température enregistrée hors de la plage du produit"""
+        low = np.full(len(produits), PLAGE_CHAINE_FROID[0])
+        high = np.full(len(produits), PLAGE_CHAINE_FROID[1])
+        if self.plages:
+            plages = pd.DataFrame(self.plages, index=['min', 'max']).T.reindex(produits)
+            low = np.where(plages['min'].isna(), low, plages['min'])
+            high = np.where(plages['max'].isna(), high, plages['max'])
+        return ~np.isnan(temperature) & ((temperature < low) | (temperature > high))
+
+    def _check_lots(self, chunk, produits, dates, quantite):
+        """
+        Entrées en double, lots d'un autre produit et solde de chaque lot
+
+        Les entrées du bloc sont enregistrées avant ses sorties ; plusieurs
+        entrées sur un même lot sont cumulées (comme dans LotLedger).
+        """
+        n = len(chunk)
+        operation = chunk['type_operation'].astype(str).to_numpy()
+        lots = chunk['id_lot'].to_numpy()
+        entree = np.flatnonzero((operation == 'ENTREE') & ~pd.isna(lots))
+        sortie = np.flatnonzero(operation == 'SORTIE')
+
+        duplique = np.zeros(n, dtype=bool)
+        duplique[entree] = (pd.Index(lots[entree]).duplicated()
+                            | pd.Index(lots[entree]).isin(self.lots.index))
+        recus = (pd.DataFrame({'id_lot': lots[entree], 'produit': produits[entree],
+                               'quantite': quantite[entree]})
+                 .groupby('id_lot', sort=False).agg(produit=('produit', 'first'),
+                                                    quantite=('quantite', 'sum')))
+        deja = recus.index.isin(self.lots.index)
+        self.lots.loc[recus.index[deja], 'quantite'] += recus.loc[deja, 'quantite']
+        nouveaux = recus[~deja].assign(sortie=0.0)
+        self.lots = pd.concat([self.lots, nouveaux]) if len(self.lots) else nouveaux
+
+        # Mouvements sur un lot reçu pour un autre produit
+        autre = np.zeros(n, dtype=bool)
+        mouvements = np.concatenate([entree, sortie])
+        lot_produit = self.lots['produit'].reindex(lots[mouvements]).to_numpy()
+        autre[mouvements] = ~pd.isna(lot_produit) & (lot_produit != produits[mouvements])
+
+        # Sorties : cumul chronologique par lot, ajouté aux sorties des blocs précédents
+        connu = pd.Index(lots[sortie]).isin(self.lots.index)
+        inconnu = np.zeros(n, dtype=bool)
+        inconnu[sortie[~connu]] = True
+        rows = sortie[connu]
+        ordre = np.lexsort((rows, _days(dates[rows]), lots[rows]))
+        rows = rows[ordre]
+        mouvements = pd.DataFrame({'id_lot': lots[rows], 'quantite': quantite[rows]})
+        precedent = self.lots['sortie'].reindex(mouvements['id_lot']).to_numpy()
+        cumul = mouvements.groupby('id_lot', sort=False)['quantite'].cumsum().to_numpy() + precedent
+        recu = self.lots['quantite'].reindex(mouvements['id_lot']).to_numpy()
+        depasse = np.zeros(n, dtype=bool)
+        depasse[rows] = cumul > recu + EPSILON
+        ecart = np.full(n, np.nan)
+        ecart[rows] = cumul - recu
+        totaux = mouvements.groupby('id_lot', sort=False)['quantite'].sum()
+        self.lots.loc[totaux.index, 'sortie'] += totaux
+
+        return {
+            "lot_duplique": (duplique, None),
+            "lot_autre_produit": (autre, None),
+            "sortie_depasse_solde": (depasse, ecart),
+            "sortie_lot_inconnu": (inconnu, None),
+        }
+
+    def _check_coverage(self, produits, dates):
+        """
+        Trous dans la couverture quotidienne : par produit (plus de
+        seuil_trou jours sans mouvement) et pour tout le ledger (jours sans
+        aucune ligne). L'anomalie porte sur la première ligne après le trou.
+        """
+        n = len(produits)
+        jours = _days(dates)
+        valid = ~pd.isna(dates)
+
+        # Ledger : jours distincts, écart au jour distinct précédent
+        uniques, first = np.unique(jours[valid], return_index=True)
+        rows = np.flatnonzero(valid)[first]
+        precedents = np.concatenate([[self.dernier_jour if self.dernier_jour is not None
+                                      else uniques[0] if len(uniques) else 0], uniques[:-1]])
+        manquants = uniques - precedents - 1
+        jour_manquant = np.zeros(n, dtype=bool)
+        nb_manquants = np.full(n, np.nan)
+        jour_manquant[rows[manquants > 0]] = True
+        nb_manquants[rows] = manquants
+        if len(uniques):
+            self.dernier_jour = int(max(uniques[-1], self.dernier_jour or uniques[-1]))
+
+        # Produits : couples (produit, jour) distincts, écart au jour précédent du produit
+        codes, noms = pd.factorize(produits)
+        cles = codes[valid].astype(np.int64) * (1 << 32) + (jours[valid] - jours[valid].min()
+                                                             if valid.any() else 0)
+        _, first = np.unique(cles, return_index=True)
+        rows = np.flatnonzero(valid)[first]
+        code_rows, jour_rows = codes[rows], jours[rows]
+        depuis = pd.Series(self.derniers_jours, dtype=np.float64).reindex(noms).to_numpy()
+        nouveau_produit = np.r_[True, code_rows[1:] != code_rows[:-1]]
+        precedents = np.where(nouveau_produit, depuis[code_rows],
+                              np.r_[np.nan, jour_rows[:-1]])
+        ecarts = jour_rows - precedents - 1
+        trou = np.zeros(n, dtype=bool)
+        jours_sans = np.full(n, np.nan)
+        trou[rows[ecarts > self.seuil_trou]] = True
+        jours_sans[rows] = ecarts
+        derniers = pd.Series(jour_rows).groupby(code_rows).max()
+        for code, jour in derniers.items():
+            nom = noms[code]
+            self.derniers_jours[nom] = int(max(jour, self.derniers_jours.get(nom, jour)))
+
+        return {"jour_manquant": (jour_manquant, nb_manquants),
+                "trou_couverture": (trou, jours_sans)}
+
+    def anomalies(self):
+        """
+        Anomalies des blocs contrôlés depuis la création (ou le chargement)
+
+        Returns:
+            DataFrame: indice, controle, gravite, produit, date, valeur
+        """
+        if not self._anomalies:
+            return pd.DataFrame(columns=['indice', 'controle', 'gravite', 'produit', 'date',
+                                         'valeur'])
+        result = pd.concat(self._anomalies, ignore_index=True).sort_values(['indice', 'controle'],
+                                                                           ignore_index=True)
+        result.insert(2, 'gravite', result['controle'].map(lambda c: CONTROLES[c][0]))
+        return result
+
+    def report(self, max_indices=MAX_INDICES):
+        """
+        Rapport structuré : lignes contrôlées, et pour chaque contrôle le
+        nombre de lignes, les produits concernés et les premiers indices
+
+        Returns:
+            dict
+        """
+        anomalies = self.anomalies()
+        controles = {}
+        for controle, (gravite, description) in CONTROLES.items():
+            rows = anomalies[anomalies['controle'] == controle]
+            controles[controle] = {
+                "gravite": gravite,
+                "description": description,
+                "lignes": len(rows),
+                "produits": {str(p): int(c) for p, c in rows['produit'].value_counts().items()},
+                "indices": rows['indice'].head(max_indices).astype(int).tolist(),
+            }
+        erreurs = anomalies.loc[anomalies['gravite'] == "erreur", 'indice'].nunique()
+        return {
+            "lignes_controlees": self.nb_lignes - self.premiere_ligne,
+            "premiere_ligne": self.premiere_ligne,
+            "lignes_en_erreur": int(erreurs),
+            "lignes_en_avertissement": int(anomalies['indice'].nunique() - erreurs),
+            "controles": controles,
+        }
+
+    def counts(self):
+        """Nombre de lignes par contrôle (contrôles sans anomalie exclus)"""
+        anomalies = self.anomalies()
+        return {str(c): int(n) for c, n in anomalies['controle'].value_counts().items()}
+
+    def print_summary(self):
+        report = self.report()
+        print(f"🔍 {report['lignes_controlees']:,} ligne(s) contrôlée(s) : "
+              f"{report['lignes_en_erreur']:,} en erreur, "
+              f"{report['lignes_en_avertissement']:,} en avertissement")
+        for controle, entry in report["controles"].items():
+            if entry["lignes"]:
+                icone = "❌" if entry["gravite"] == "erreur" else "⚠️ "
+                print(f"   {icone} {controle:26s} {entry['lignes']:8,}  {entry['description']}")
+
+    def write(self, output_dir):
+        """
+        Écrit le rapport JSON et le CSV des anomalies (une ligne par ligne
+        du ledger et par contrôle)
+
+        Returns:
+            tuple: (chemin du rapport, chemin des anomalies)
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        report_path = output_dir / RAPPORT_FILENAME
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        anomalies_path = output_dir / ANOMALIES_FILENAME
+        self.anomalies().to_csv(anomalies_path, index=False)
+        return report_path, anomalies_path
+
+    def save(self, path):
+        """Enregistre l'état nécessaire aux blocs suivants (sans les anomalies)"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        pd.to_pickle({
+            "plages": self.plages,
+            "seuil_trou": self.seuil_trou,
+            "nb_lignes": self.nb_lignes,
+            "unites": self.unites,
+            "lots": self.lots,
+            "derniers_jours": self.derniers_jours,
+            "dernier_jour": self.dernier_jour,
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Recharge un état enregistré par save : le rapport ne couvre que les nouveaux blocs"""
+        state = pd.read_pickle(path)
+        validator = cls(state["plages"], state["seuil_trou"])
+        validator.nb_lignes = validator.premiere_ligne = state["nb_lignes"]
+        validator.unites = state["unites"]
+        validator.lots = state["lots"]
+        validator.derniers_jours = state["derniers_jours"]
+        validator.dernier_jour = state["dernier_jour"]
+        return validator
+
+    def __repr__(self):
+        return (f"DataValidator({self.nb_lignes:,} lignes, {len(self.lots):,} lots, "
+                f"{len(self.unites)} produits)")
+
+
+def validate_ledger(df, **kwargs):
+    """
+    Contrôle un ledger chargé en une passe
+
+    Args:
+        df: Ledger complet (indices = position des lignes)
+        **kwargs: plages, seuil_trou (voir DataValidator)
+
+    Returns:
+        DataValidator: anomalies(), report(), write()
+    """
+    validator = DataValidator(**kwargs)
+    validator.add(df)
+    return validator
+
+
+def main(args):
+    """Validation du ledger en ligne de commande (voir cli.add_validate_arguments)"""
+    import time
+
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+    except ImportError:
+        results_mgr = None
+
+    start = time.perf_counter()
+    validator = DataValidator(seuil_trou=args.seuil_trou)
+    if args.chunksize:
+        from data_loader import iter_stock_chunks
+
+        for chunk in iter_stock_chunks(args.csv, args.chunksize, columns=DataValidator.columns()):
+            validator.add(chunk)
+    else:
+        from data_loader import load_stock_data
+
+        validator.add(load_stock_data(args.csv))
+    duree = time.perf_counter() - start
+
+    validator.print_summary()
+    output_dir = results_mgr.get_run_path() if results_mgr is not None else Path(".")
+    for path in validator.write(output_dir):
+        print(f"✅ {path}")
+
+    report = validator.report()
+    if results_mgr is not None:
+        results_mgr.create_summary_file("Validation du ledger", {
+            "Lignes contrôlées": report["lignes_controlees"],
+            "Lignes en erreur": report["lignes_en_erreur"],
+            "Lignes en avertissement": report["lignes_en_avertissement"],
+            "Durée": f"{duree:.1f}s",
+            "controles": validator.counts(),
+        })
+    if args.strict and report["lignes_en_erreur"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_validate_arguments
+
+    parser = argparse.ArgumentParser(description="Contrôles de qualité du ledger")
+    add_validate_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,118 @@
+"""
+Defaults - Constantes partagées par cli.py et les modules d'analyse
+Module sans dépendance : le CLI y lit les choix et valeurs par défaut de
+ses options sans importer pandas, Prophet ni matplotlib, et chaque module
+les importe d'ici plutôt que d'en garder sa propre copie.
+"""
+
+# --- Prévision (forecasting.py) ---
+
+HORIZON_JOURS = 28
+
+# Régresseurs Prophet : nom -> (prior_scale, standardize)
+REGRESSEURS_PROPHET = {
+    'temperature': (0.5, True),
+    'taux_occupation': (1.0, True),
+    'nb_patients': (0.5, True),
+    'epidemie_grippe': (0.5, False),
+}
+
+# Colonne drapeau -> nom du holiday Prophet
+HOLIDAYS_COLONNES = {
+    'jour_ferie': 'jour_ferie',
+    'vacances_scolaires': 'vacances_scolaires',
+    'covid_impact': 'covid_19',
+}
+
+# Calcul des intervalles de prédiction (quantite_min/max)
+#   prophet : simulations de tendance de Prophet (uncertainty_samples tirages)
+#   residus : quantiles des erreurs hors échantillon (année d'évaluation ou backtest)
+#   aucun   : prévision ponctuelle seule (tableaux de bord)
+INTERVALLES = ("prophet", "residus", "aucun")
+ECHANTILLONS_INCERTITUDE = 1000   # Valeur par défaut de Prophet
+
+# --- Graphiques (plot_report.py) ---
+
+PRESETS = {
+    "miniature": {"dpi": 50, "format": "png"},
+    "ecran": {"dpi": 100, "format": "png"},
+    "svg": {"dpi": 100, "format": "svg"},
+    "impression": {"dpi": 300, "format": "png"},
+}
+
+# --- Instrumentation (instrumentation.py) ---
+
+# Étapes instrumentées, dans l'ordre du pipeline
+ETAPES = ("chargement", "filtrage", "agregation", "holidays", "projection", "fit",
+          "predict", "graphiques", "export")
+
+# Valeur de profil/trace_memoire désignant toutes les étapes
+TOUTES = "toutes"
+
+# --- Backtest (backtest.py) ---
+
+INITIAL_JOURS = 730   # Historique minimum avant le premier cutoff
+PERIODE_JOURS = 28    # Écart entre deux cutoffs
+
+# --- Recherche des paramètres (tuning.py) ---
+
+# Protocole d'évaluation : derniers cutoffs, espacés de PERIODE_TUNING jours
+NB_CUTOFFS = 4
+PERIODE_TUNING = 91
+
+# Nombre de candidats tirés en recherche aléatoire
+NB_CANDIDATS = 16
+
+# Critères minimisables ; WAPE (somme des erreurs / somme consommée) par
+# défaut : le MAPE explose sur les jours sans consommation
+CRITERES = ("WAPE", "MAPE", "MAE", "RMSE")
+
+# --- Prévisions hiérarchiques (hierarchy.py) ---
+
+NIVEAUX = ("total", "site", "famille", "produit")
+
+RECONCILIATIONS = ("bottom_up", "top_down", "mint")
+
+# Covariance des erreurs de MinT : variances des résidus (wls_var), nombre
+# de produits agrégés (wls_struct) ou covariance complète rétrécie vers la
+# diagonale (shrink, Schäfer & Strimmer 2005)
+COVARIANCES = ("wls_var", "wls_struct", "shrink")
+
+# --- Pipeline asynchrone (pipeline.py) ---
+
+WORKERS_RENDU = 2
+WORKERS_IO = 4
+
+# Reprises d'une étape en échec
+REPRISES = 2
+
+# --- Rafraîchissement incrémental (incremental.py) ---
+
+# Écart relatif entre quantités consommées et prévues sur les nouveaux jours
+# en dessous duquel le modèle n'est pas réentraîné
+SEUIL_DERIVE = 0.25
+
+# Validation des nouvelles lignes : signaler les anomalies, ou aussi écarter
+# des agrégats les lignes en erreur
+VALIDATIONS = ("signaler", "exclure")
+
+# --- Qualité du ledger (data_validation.py) ---
+
+# Jours consécutifs sans mouvement au-delà desquels un produit est signalé
+SEUIL_TROU_JOURS = 14
+
+# --- Service HTTP (forecast_api.py) ---
+
+PORT_DEFAUT = 8765
+
+# --- Ledger synthétique (synthetic_ledger.py) et benchmark (benchmark.py) ---
+
+DEBUT = "2020-01-01"
+FIN = "2024-12-31"
+
+# Tailles de ledger prédéfinies (produits par site, sites, période)
+TAILLES = {
+    "petit": {"produits": 18, "sites": 1, "debut": "2022-01-01"},
+    "moyen": {"produits": 100, "sites": 2, "debut": "2020-01-01"},
+    "grand": {"produits": 300, "sites": 4, "debut": "2020-01-01"},
+}
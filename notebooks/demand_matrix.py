@@ -0,0 +1,413 @@
+"""
+Demand Matrix - Matrice de consommation quotidienne (date × produit)
+Construit en une seule passe sur le ledger les séries quotidiennes de tous
+les produits, avec les régresseurs et les trous déjà comblés. Le mode
+streaming (DemandAccumulator) agrège le CSV bloc par bloc sans jamais
+charger le ledger complet.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Régresseurs agrégés par moyenne (trous comblés par la moyenne du produit)
+REGRESSEURS_MOYENNE = ['temperature', 'taux_occupation', 'nb_patients']
+
+# Régresseurs binaires agrégés par max (trous comblés par 0)
+REGRESSEURS_MAX = ['epidemie_grippe', 'vacances_scolaires', 'jour_ferie', 'covid_impact']
+
+
+def _bincount_mean(keys, values, size):
+    """Moyenne par clé en ignorant les NaN (NaN si aucune valeur)"""
+    valid = ~np.isnan(values)
+    sums = np.bincount(keys[valid], weights=values[valid], minlength=size)
+    counts = np.bincount(keys[valid], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _bincount_max(keys, values, size):
+    """Max par clé en ignorant les NaN (NaN si aucune valeur)"""
+    valid = ~np.isnan(values)
+    result = np.full(size, -np.inf)
+    np.maximum.at(result, keys[valid], values[valid])
+    result[np.isneginf(result)] = np.nan
+    return result
+
+
+class DemandMatrix:
+    """
+    Séries quotidiennes de tous les produits sous forme de matrices NumPy
+
+    Chaque matrice a la forme (nb_jours × nb_produits) et est stockée en
+    ordre colonne (Fortran) : la série d'un produit est donc un bloc
+    contigu, et les DataFrames par produit sont des vues sans copie.
+
+    Pour chaque produit, seule la plage [première sortie, dernière sortie]
+    est significative, comme dans l'agrégation de l'étape 3 du script.
+    """
+
+    def __init__(self, dates, products, quantite, regresseurs, debut, fin, nb_sorties):
+        """
+        Args:
+            dates: DatetimeIndex quotidien commun à tous les produits
+            products: Liste des noms de produits (ordre des colonnes)
+            quantite: Matrice des quantités consommées
+            regresseurs: Dictionnaire {nom_colonne: matrice}
+            debut: Indice de la première date de chaque produit
+            fin: Indice (exclu) de la dernière date de chaque produit
+            nb_sorties: Nombre de lignes de sortie par produit
+        """
+        self.dates = dates
+        self.products = list(products)
+        self.quantite = quantite
+        self.regresseurs = regresseurs
+        self.debut = debut
+        self.fin = fin
+        self.nb_sorties = nb_sorties
+        self._index = {name: j for j, name in enumerate(self.products)}
+
+    @classmethod
+    def from_ledger(cls, df, type_sortie='CONSOMMATION'):
+        """
+        Construit la matrice en une seule passe sur le ledger
+
+        Args:
+            df: Ledger complet (colonnes date, nom_produit, type_sortie, quantite...)
+            type_sortie: Type de sortie à agréger
+
+        Returns:
+            DemandMatrix: Matrices de tous les produits
+        """
+        sorties = df[df['type_sortie'] == type_sortie]
+        if sorties.empty:
+            raise ValueError(f"Aucune ligne avec type_sortie == '{type_sortie}'")
+
+        prod_codes, products = pd.factorize(sorties['nom_produit'], sort=True)
+        dates = sorties['date'].values.astype('datetime64[D]')
+        date_min = dates.min()
+        day_codes = (dates - date_min).astype(np.int64)
+
+        n_days = int(day_codes.max()) + 1
+        n_products = len(products)
+        size = n_days * n_products
+
+        # Clé produit-majeure : la matrice (produits × jours) transposée
+        # donne directement une vue (jours × produits) en ordre Fortran
+        keys = prod_codes.astype(np.int64) * n_days + day_codes
+
+        quantite = sorties['quantite'].to_numpy(dtype=np.float64)
+        moyennes, maximums = {}, {}
+        for col in REGRESSEURS_MOYENNE:
+            if col in sorties.columns:
+                values = sorties[col].to_numpy(dtype=np.float64)
+                moyennes[col] = _bincount_mean(keys, values, size)
+        for col in REGRESSEURS_MAX:
+            if col in sorties.columns:
+                values = sorties[col].to_numpy(dtype=np.float64)
+                maximums[col] = _bincount_max(keys, values, size)
+
+        return cls._from_flat(
+            date_min, n_days, products,
+            row_counts=np.bincount(keys, minlength=size),
+            quantite=np.bincount(keys, weights=quantite, minlength=size),
+            moyennes=moyennes, maximums=maximums,
+            nb_sorties=np.bincount(prod_codes, minlength=n_products),
+        )
+
+    @classmethod
+    def _from_flat(cls, date_min, n_days, products, row_counts, quantite,
+                   moyennes, maximums, nb_sorties):
+        """
+        Assemble les matrices à partir des agrégats à plat (clé produit-majeure)
+
+        Args:
+            date_min: Première date (datetime64[D])
+            n_days: Nombre de jours de la grille
+            products: Noms des produits (ordre des colonnes)
+            row_counts: Nombre de lignes par (produit, jour)
+            quantite: Somme des quantités par (produit, jour)
+            moyennes: {régresseur: moyenne par (produit, jour), NaN si absente}
+            maximums: {régresseur: max par (produit, jour), NaN si absent}
+            nb_sorties: Nombre de lignes de sortie par produit
+        """
+        n_products = len(products)
+
+        def to_matrix(flat):
+            return flat.reshape(n_products, n_days).T
+
+        has_data = to_matrix(row_counts) > 0
+        q_matrix = to_matrix(quantite)
+
+        # Plage significative par produit : première → dernière date observée
+        debut = has_data.argmax(axis=0)
+        fin = n_days - has_data[::-1].argmax(axis=0)
+        in_span = (np.arange(n_days)[:, None] >= debut) & (np.arange(n_days)[:, None] < fin)
+
+        regresseurs = {}
+        for col in REGRESSEURS_MOYENNE:
+            if col not in moyennes:
+                continue
+            matrix = to_matrix(moyennes[col])
+            # Même remplissage que fillna(mean) : moyenne des jours observés
+            col_mean = np.nanmean(np.where(in_span, matrix, np.nan), axis=0)
+            regresseurs[col] = np.where(np.isnan(matrix) & in_span, col_mean, matrix)
+
+        for col in REGRESSEURS_MAX:
+            if col not in maximums:
+                continue
+            matrix = to_matrix(maximums[col])
+            regresseurs[col] = np.where(np.isnan(matrix) & in_span, 0.0, matrix)
+
+        dates_index = pd.date_range(start=pd.Timestamp(date_min), periods=n_days, freq='D')
+
+        return cls(dates_index, [str(p) for p in products], q_matrix, regresseurs,
+                   debut, fin, nb_sorties)
+
+    def product_index(self, name):
+        """Retourne l'indice de colonne d'un produit"""
+        if name not in self._index:
+            raise KeyError(f"Produit inconnu dans la matrice : {name}")
+        return self._index[name]
+
+    def daily_frame(self, name):
+        """
+        Série quotidienne d'un produit au format de l'étape 3
+        (colonnes date, quantite et régresseurs)
+
+        Les colonnes sont des vues sur les matrices : aucune copie.
+        """
+        j = self.product_index(name)
+        span = slice(self.debut[j], self.fin[j])
+
+        columns = {'date': self.dates[span], 'quantite': self.quantite[span, j]}
+        for col, matrix in self.regresseurs.items():
+            columns[col] = matrix[span, j]
+        return pd.DataFrame(columns, copy=False)
+
+    def prophet_frame(self, name):
+        """Série quotidienne d'un produit avec les colonnes ds/y de Prophet"""
+        return self.daily_frame(name).rename(columns={'date': 'ds', 'quantite': 'y'})
+
+    def __len__(self):
+        return len(self.products)
+
+    def __repr__(self):
+        return (f"DemandMatrix({len(self.dates)} jours × {len(self.products)} produits, "
+                f"régresseurs={list(self.regresseurs)})")
+
+
+def build_demand_matrix(df, type_sortie='CONSOMMATION'):
+    """Raccourci pour DemandMatrix.from_ledger"""
+    return DemandMatrix.from_ledger(df, type_sortie=type_sortie)
+
+
+def load_demand_matrix(csv_path, chunksize=None, type_sortie='CONSOMMATION'):
+    """
+    Charge la matrice depuis un CSV : en streaming par blocs si chunksize est
+    donné, sinon via le cache colonnaire de data_loader
+    """
+    if chunksize:
+        return build_demand_matrix_streaming(csv_path, chunksize, type_sortie)
+
+    from data_loader import load_stock_data
+    return build_demand_matrix(load_stock_data(csv_path), type_sortie=type_sortie)
+
+
+class DemandAccumulator:
+    """
+    Agrégation incrémentale du ledger par (produit, jour)
+
+    Chaque bloc est réduit en agrégats partiels : nombre de lignes, somme
+    des quantités, somme et effectif des régresseurs moyennés, max des
+    drapeaux. Les partiels se combinent par somme/max, donc le résultat ne
+    dépend pas du découpage. La mémoire est bornée par le nombre de couples
+    (produit, jour) distincts, quelle que soit la taille du fichier.
+    """
+
+    # Clé entière d'un couple (produit, jour) : code produit × 2^32 + jour
+    # (jours depuis 1970, décalés pour rester positifs)
+    DECALAGE_JOURS = 1 << 31
+
+    def __init__(self, type_sortie='CONSOMMATION'):
+        self.type_sortie = type_sortie
+        self.nb_lignes = 0
+        self.modifies = set()
+        self._codes = {}
+        self._aggregat = None
+        self._partiels = []
+        self._taille_partiels = 0
+
+    @staticmethod
+    def columns():
+        """Colonnes du CSV nécessaires à l'agrégation"""
+        return ['date', 'nom_produit', 'type_sortie', 'quantite',
+                *REGRESSEURS_MOYENNE, *REGRESSEURS_MAX]
+
+    def _product_codes(self, noms):
+        """Codes stables des produits (attribués dans l'ordre d'apparition)"""
+        noms = noms.astype('category')
+        mapping = np.array([self._codes.setdefault(str(nom), len(self._codes))
+                            for nom in noms.cat.categories], dtype=np.int64)
+        return mapping[noms.cat.codes.to_numpy()]
+
+    def add(self, chunk):
+        """
+        Ajoute un bloc du ledger (colonnes date, nom_produit, type_sortie, quantite...)
+
+        Returns:
+            DemandAccumulator: self (chaînable)
+        """
+        self.nb_lignes += len(chunk)
+        sorties = chunk[chunk['type_sortie'] == self.type_sortie]
+        if sorties.empty:
+            return self
+
+        self.modifies.update(map(str, sorties['nom_produit'].unique()))
+        jours = sorties['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        partiel = {
+            'cle': (self._product_codes(sorties['nom_produit']) << 32) + jours + self.DECALAGE_JOURS,
+            'lignes': np.ones(len(sorties)),
+            'quantite': sorties['quantite'].to_numpy(dtype=np.float64),
+        }
+        for col in REGRESSEURS_MOYENNE:
+            if col in sorties.columns:
+                values = sorties[col].to_numpy(dtype=np.float64)
+                partiel[f'{col}__somme'] = values
+                partiel[f'{col}__n'] = (~np.isnan(values)).astype(np.float64)
+        for col in REGRESSEURS_MAX:
+            if col in sorties.columns:
+                partiel[col] = sorties[col].to_numpy(dtype=np.float64)
+
+        partiel = self._reduce(pd.DataFrame(partiel))
+        self._partiels.append(partiel)
+        self._taille_partiels += len(partiel)
+
+        # Compaction amortie : dès que les partiels dépassent l'agrégat
+        aggregat = 0 if self._aggregat is None else len(self._aggregat)
+        if self._taille_partiels > max(aggregat, 1):
+            self._compact()
+        return self
+
+    @staticmethod
+    def _reduce(frame):
+        """Combine les lignes de même clé (produit, jour)"""
+        agg = {col: ('max' if col in REGRESSEURS_MAX else 'sum')
+               for col in frame.columns if col != 'cle'}
+        return frame.groupby('cle', sort=False).agg(agg).reset_index()
+
+    def _compact(self):
+        frames = [self._aggregat] if self._aggregat is not None else []
+        if self._partiels:
+            self._aggregat = self._reduce(pd.concat(frames + self._partiels, ignore_index=True))
+        self._partiels = []
+        self._taille_partiels = 0
+
+    def save(self, path):
+        """Enregistre l'état de l'agrégation (reprise par load puis add)"""
+        self._compact()
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        pd.to_pickle({
+            "type_sortie": self.type_sortie,
+            "nb_lignes": self.nb_lignes,
+            "codes": self._codes,
+            "aggregat": self._aggregat,
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Recharge un état enregistré par save (les produits modifiés repartent à vide)"""
+        state = pd.read_pickle(path)
+        accumulator = cls(state["type_sortie"])
+        accumulator.nb_lignes = state["nb_lignes"]
+        accumulator._codes = state["codes"]
+        accumulator._aggregat = state["aggregat"]
+        return accumulator
+
+    def to_matrix(self):
+        """
+        Construit la DemandMatrix à partir des agrégats accumulés
+
+        Returns:
+            DemandMatrix: Identique à build_demand_matrix sur le ledger complet
+        """
+        self._compact()
+        aggregat = self._aggregat
+        if aggregat is None or aggregat.empty:
+            raise ValueError(f"Aucune ligne avec type_sortie == '{self.type_sortie}'")
+
+        # Colonnes triées par nom de produit, comme pd.factorize(sort=True)
+        products = sorted(self._codes)
+        rang = np.empty(len(products), dtype=np.int64)
+        rang[[self._codes[p] for p in products]] = np.arange(len(products))
+
+        cle = aggregat['cle'].to_numpy()
+        prod_codes = rang[cle >> 32]
+        jours = (cle & 0xFFFFFFFF) - self.DECALAGE_JOURS
+        date_min = jours.min()
+        day_codes = jours - date_min
+
+        n_days = int(day_codes.max()) + 1
+        n_products = len(products)
+        size = n_days * n_products
+        keys = prod_codes * n_days + day_codes
+
+        def to_flat(values, fill):
+            flat = np.full(size, fill, dtype=np.float64)
+            flat[keys] = values
+            return flat
+
+        moyennes, maximums = {}, {}
+        for col in REGRESSEURS_MOYENNE:
+            if f'{col}__somme' in aggregat.columns:
+                n = aggregat[f'{col}__n'].to_numpy()
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    mean = np.where(n > 0, aggregat[f'{col}__somme'].to_numpy() / n, np.nan)
+                moyennes[col] = to_flat(mean, np.nan)
+        for col in REGRESSEURS_MAX:
+            if col in aggregat.columns:
+                maximums[col] = to_flat(aggregat[col].to_numpy(), np.nan)
+
+        lignes = aggregat['lignes'].to_numpy()
+        return DemandMatrix._from_flat(
+            np.datetime64(int(date_min), 'D'), n_days, products,
+            row_counts=to_flat(lignes, 0),
+            quantite=to_flat(aggregat['quantite'].to_numpy(), 0.0),
+            moyennes=moyennes, maximums=maximums,
+            nb_sorties=np.bincount(prod_codes, weights=lignes, minlength=n_products).astype(np.int64),
+        )
+
+
+def build_demand_matrix_streaming(csv_path, chunksize=None, type_sortie='CONSOMMATION',
+                                  verbose=True):
+    """
+    Construit la DemandMatrix en lisant le CSV par blocs
+
+    Seules les colonnes utiles sont lues et le ledger complet n'est jamais
+    matérialisé : la mémoire reste bornée quelle que soit la taille du fichier.
+
+    Args:
+        csv_path: Chemin du fichier CSV
+        chunksize: Lignes par bloc (défaut : data_loader.CHUNK_LIGNES)
+        type_sortie: Type de sortie à agréger
+        verbose: Afficher la progression
+
+    Returns:
+        DemandMatrix: Même résultat que build_demand_matrix(load_stock_data(csv_path))
+    """
+    from data_loader import CHUNK_LIGNES, iter_stock_chunks
+
+    accumulator = DemandAccumulator(type_sortie)
+    for chunk in iter_stock_chunks(csv_path, chunksize or CHUNK_LIGNES,
+                                   columns=accumulator.columns()):
+        accumulator.add(chunk)
+
+    demand = accumulator.to_matrix()
+    if verbose:
+        print(f"✅ Streaming : {accumulator.nb_lignes:,} lignes agrégées en {demand}")
+    return demand
@@ -18,39 +18,22 @@ Nous allons créer 3 types de holidays :
 """
 
 CELL_CODE_STEP6_1 = """
-# Créer le DataFrame des jours fériés
+# Calendrier des holidays commun à tous les produits
+from holiday_calendar import HolidayCalendar
+
 print("📅 CONFIGURATION DES HOLIDAYS")
 print("="*70)
 
-# 1. Jours fériés français
-holidays_jf = daily[daily['jour_ferie'] == 1][['date']].drop_duplicates()
-holidays_jf.columns = ['ds']
-holidays_jf['holiday'] = 'jour_ferie'
-holidays_jf['lower_window'] = 0
-holidays_jf['upper_window'] = 0
-
-print(f"\\n✅ Jours fériés : {len(holidays_jf)} jours")
-
-# 2. Vacances scolaires
-holidays_vac = daily[daily['vacances_scolaires'] == 1][['date']].drop_duplicates()
-holidays_vac.columns = ['ds']
-holidays_vac['holiday'] = 'vacances_scolaires'
-holidays_vac['lower_window'] = 0
-holidays_vac['upper_window'] = 0
-
-print(f"✅ Vacances scolaires : {len(holidays_vac)} jours")
-
-# 3. Périodes COVID (événement majeur)
-holidays_covid = daily[daily['covid_impact'] == 1][['date']].drop_duplicates()
-holidays_covid.columns = ['ds']
-holidays_covid['holiday'] = 'covid_19'
-holidays_covid['lower_window'] = 0
-holidays_covid['upper_window'] = 0
-
-print(f"✅ Périodes COVID : {len(holidays_covid)} jours")
+# Construit sur tout le ledger (drapeaux du site) : un jour férié sans
+# sortie du produit analysé reste un jour férié.
+# Fenêtres multi-jours : HolidayCalendar.from_daily(df, fenetres={'jour_ferie': (-1, 1)})
+calendar = HolidayCalendar.from_daily(df, date_col='date')
+holidays = calendar.holidays
 
-# Combiner tous les holidays
-holidays = pd.concat([holidays_jf, holidays_vac, holidays_covid])
+jours = calendar.counts()
+print(f"\\n✅ Jours fériés : {jours.get('jour_ferie', 0)} jours")
+print(f"✅ Vacances scolaires : {jours.get('vacances_scolaires', 0)} jours")
+print(f"✅ Périodes COVID : {jours.get('covid_19', 0)} jours")
 
 print(f"\\n📊 Total holidays configurés : {len(holidays)} jours")
 print(f"\\nTypes de holidays :")
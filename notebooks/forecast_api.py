@@ -0,0 +1,267 @@
+"""
+Forecast API - Service HTTP local des prévisions, commandes et métriques
+Les écrans de commande (cuisine, pharmacie) interrogent ce service au lieu
+de parcourir les dossiers de résultats. Les réponses sont préparées une
+fois en mémoire à partir des dernières exécutions terminées, servies avec
+un ETag, et rechargées dès qu'une nouvelle exécution est indexée.
+
+Usage:
+    python cli.py serve --port 8765
+
+    GET /produits                           Produits disponibles
+    GET /produits/<produit>/previsions      Dernières prévisions du produit
+    GET /produits/<produit>/commande        Politique de commande recommandée
+    GET /produits/<produit>/metriques       Métriques de la dernière exécution
+    GET /runs?limit=10                      Dernières exécutions
+    GET /sante                              État du cache
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+from defaults import PORT_DEFAUT
+from results_manager import ResultsManager
+
+
+# Nombre d'exécutions terminées parcourues pour construire le cache
+RUNS_PARCOURUS = 100
+
+# Fichiers de résumé contenant une ligne de métriques par produit
+RESUMES_MULTI_PRODUITS = ("summary_batch.json", "summary_incremental.json", "summary_pipeline.json")
+
+
+def _json_bytes(payload):
+    return json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class Resource:
+    """Réponse préparée : corps JSON et ETag (hash du contenu)"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, payload):
+        self.body = _json_bytes(payload)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+
+class ResultsCache:
+    """
+    Cache mémoire des dernières prévisions de chaque produit
+
+    Pour chaque produit, la ressource vient de l'exécution terminée la plus
+    récente qui la contient (un rapport produit, un batch ou un
+    rafraîchissement incrémental). Le cache est reconstruit quand l'index
+    des exécutions change : seules les exécutions terminées y figurent,
+    donc un dossier en cours d'écriture n'est jamais lu.
+    """
+
+    def __init__(self, results_dir="../results", max_runs=RUNS_PARCOURUS):
+        self.results_mgr = ResultsManager(results_dir)
+        self.max_runs = max_runs
+        self._lock = threading.Lock()
+        self._signature = None
+        self._snapshot = {}
+
+    def _index_signature(self):
+        try:
+            stat = self.results_mgr.index_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def snapshot(self):
+        """
+        Ressources courantes (rechargées si l'index a changé)
+
+        Returns:
+            dict: chemin -> Resource
+        """
+        signature = self._index_signature()
+        if signature != self._signature or not self._snapshot:
+            with self._lock:
+                # Un autre thread a peut-être déjà rechargé
+                if signature != self._signature or not self._snapshot:
+                    self._snapshot = self._load()
+                    self._signature = signature
+        return self._snapshot
+
+    def _load(self):
+        """Construit toutes les réponses à partir des exécutions terminées"""
+        start = time.perf_counter()
+        runs = [e for e in self.results_mgr.find_runs() if e.get("statut") == "termine"]
+        runs = runs[:self.max_runs]
+
+        previsions, commandes, metriques = {}, {}, {}
+        for entry in runs:
+            run_dir = self.results_mgr.base_results_dir / entry["run_id"]
+            try:
+                self._load_run(run_dir, entry, previsions, commandes, metriques)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️  {entry['run_id']} ignoré : {type(e).__name__}: {e}")
+
+        produits = sorted(set(previsions) | set(commandes) | set(metriques))
+        resources = {
+            "/produits": Resource([
+                {"produit": p,
+                 "previsions": previsions.get(p, {}).get("run_id"),
+                 "commande": commandes.get(p, {}).get("run_id"),
+                 "metriques": metriques.get(p, {}).get("run_id")}
+                for p in produits
+            ]),
+            "/runs": Resource(runs),
+            "/sante": Resource({
+                "statut": "ok",
+                "charge_le": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "runs": len(runs),
+                "produits": len(produits),
+                "duree_chargement_s": round(time.perf_counter() - start, 3),
+            }),
+        }
+        for kind, table in (("previsions", previsions), ("commande", commandes),
+                            ("metriques", metriques)):
+            for produit, payload in table.items():
+                resources[f"/produits/{produit}/{kind}"] = Resource(payload)
+        return resources
+
+    @staticmethod
+    def _load_run(run_dir, entry, previsions, commandes, metriques):
+        """Ajoute les ressources d'une exécution pour les produits pas encore vus"""
+        run_id = entry["run_id"]
+        produits_run = set()
+
+        for path in sorted(run_dir.glob("predictions_*.csv")):
+            df = pd.read_csv(path)
+            if 'produit' not in df.columns:
+                # Seuls les exports mono-produit anciens (predictions_<produit>_...)
+                # n'ont pas de colonne produit ; les autres tables sont ignorées
+                produit = entry.get("produit") or ""
+                prefixe = f"predictions_{produit.replace(' ', '_')}_"
+                if not produit or not path.name.startswith(prefixe):
+                    continue
+                df['produit'] = produit
+            for produit, rows in df.groupby('produit', sort=False):
+                produits_run.add(produit)
+                if produit not in previsions:
+                    previsions[produit] = {
+                        "produit": produit, "run_id": run_id, "fichier": path.name,
+                        "previsions": json.loads(rows.drop(columns='produit')
+                                                 .to_json(orient='records', force_ascii=False)),
+                    }
+
+        path = run_dir / "politiques_commande.csv"
+        if path.exists():
+            df = pd.read_csv(path)
+            for row in json.loads(df.to_json(orient='records', force_ascii=False)):
+                if row["produit"] not in commandes:
+                    commandes[row["produit"]] = {"produit": row["produit"], "run_id": run_id,
+                                                 "politique": row}
+
+        for name in RESUMES_MULTI_PRODUITS:
+            path = run_dir / name
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    summary = json.load(f)
+                for row in summary.get("produits", []):
+                    if row.get("produit") not in metriques:
+                        metriques[row["produit"]] = {"produit": row["produit"], "run_id": run_id,
+                                                     "metriques": row}
+
+        # Métriques de l'index : seulement pour un rapport mono-produit (le
+        # "produit" d'un batch est un libellé, ex: "Batch (18 produits)")
+        produit = entry.get("produit")
+        if produit in produits_run and produit not in metriques and entry.get("metriques"):
+            metriques[produit] = {"produit": produit, "run_id": run_id,
+                                  "metriques": entry["metriques"]}
+
+
+def make_handler(cache, verbose=False):
+    """Classe de handler HTTP liée à un ResultsCache"""
+
+    class ForecastHandler(BaseHTTPRequestHandler):
+        server_version = "MontVertForecast/1.0"
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            path = unquote(url.path).rstrip('/') or '/'
+            resources = cache.snapshot()
+
+            if path == "/runs":
+                limit = parse_qs(url.query).get("limit", [None])[0]
+                resource = resources["/runs"]
+                if limit is not None and limit.isdigit():
+                    resource = Resource(json.loads(resource.body)[:int(limit)])
+            else:
+                resource = resources.get(path)
+
+            if resource is None:
+                self._send(HTTPStatus.NOT_FOUND, _json_bytes({"erreur": f"Introuvable : {path}"}))
+                return
+
+            if self.headers.get("If-None-Match") == resource.etag:
+                self._send(HTTPStatus.NOT_MODIFIED, b'', resource.etag)
+                return
+            self._send(HTTPStatus.OK, resource.body, resource.etag)
+
+        def _send(self, status, body, etag=None):
+            self.send_response(status)
+            if etag is not None:
+                self.send_header("ETag", etag)
+            # Les clients revalident à chaque appel : 304 tant que rien n'a changé
+            self.send_header("Cache-Control", "no-cache")
+            if status != HTTPStatus.NOT_MODIFIED:
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return ForecastHandler
+
+
+def serve(results_dir="../results", host="127.0.0.1", port=PORT_DEFAUT, verbose=False):
+    """
+    Démarre le service (bloquant, arrêt par Ctrl+C)
+
+    Args:
+        results_dir: Dossier de résultats du ResultsManager
+        host: Adresse d'écoute (locale par défaut)
+        port: Port d'écoute
+        verbose: Journaliser chaque requête
+    """
+    cache = ResultsCache(results_dir)
+    resources = cache.snapshot()
+    server = ThreadingHTTPServer((host, port), make_handler(cache, verbose))
+    server.daemon_threads = True
+
+    print(f"🌐 http://{host}:{server.server_port} "
+          f"({len(resources)} ressources, résultats : {Path(results_dir)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Arrêt du service")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_serve_arguments
+
+    parser = argparse.ArgumentParser(description="Service HTTP des prévisions")
+    add_serve_arguments(parser)
+    args = parser.parse_args()
+    serve(args.results_dir, args.host, args.port, args.verbose)
@@ -0,0 +1,515 @@
+"""
+Forecasting - Prévision Prophet d'un produit
+Regroupe les étapes 4 à 12 du script enrichi sous forme de fonctions
+réutilisables (script, notebooks, mode batch multi-produits)
+"""
+
+import importlib.util
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from defaults import ECHANTILLONS_INCERTITUDE, HORIZON_JOURS, INTERVALLES, REGRESSEURS_PROPHET
+from model_store import make_model_key, make_structure_key
+
+# Prophet (et cmdstanpy) coûtent plusieurs secondes à l'import : on vérifie
+# seulement sa présence ici, il est importé au premier modèle créé
+PROPHET_AVAILABLE = importlib.util.find_spec("prophet") is not None
+
+
+CHANGEPOINTS_MANUELS = [
+    '2020-03-15',  # COVID-19 Vague 1
+    '2020-11-01',  # COVID-19 Vague 2
+    '2021-05-01',  # Déconfinement
+    '2022-01-01',  # Nouvelle Direction
+    '2023-09-01'   # Extension Hôpital
+]
+
+INTERVAL_WIDTH = 0.85
+
+# Erreurs minimum par jour d'horizon pour un quantile propre à ce jour
+# (sinon quantiles de toutes les erreurs du produit)
+MIN_ERREURS_HORIZON = 10
+
+# Configuration Prophet commune au modèle d'évaluation et au modèle final
+PROPHET_CONFIG = {
+    'holidays_prior_scale': 10.0,
+    'yearly_seasonality': 20,
+    'weekly_seasonality': 5,
+    'daily_seasonality': False,
+    'seasonality_mode': 'multiplicative',
+    'seasonality_prior_scale': 10.0,
+    'changepoint_prior_scale': 0.5,
+    'changepoint_range': 0.9,
+    'interval_width': INTERVAL_WIDTH,
+    'growth': 'linear',
+}
+
+
+def init_worker(calendar=None, projection=None):
+    """
+    Réduit les logs de cmdstanpy/prophet (initializer des pools de processus)
+
+    Args:
+        calendar: HolidayCalendar partagé par toutes les tâches du worker
+            (envoyé une fois par processus au lieu d'une fois par tâche)
+        projection: RegressorProjection partagée de la même façon
+    """
+    # cmdstanpy remet son logger en DEBUG à chaque fit : on le désactive
+    logging.getLogger('cmdstanpy').disabled = True
+    logging.getLogger('prophet').setLevel(logging.WARNING)
+    if calendar is not None:
+        from holiday_calendar import share_calendar
+        share_calendar(calendar)
+    if projection is not None:
+        from regressor_projection import share_projection
+        share_projection(projection)
+
+
+def build_holidays(daily, date_col='date'):
+    """
+    Construit le DataFrame des holidays Prophet à partir des drapeaux d'une
+    série (voir holiday_calendar pour le calendrier commun à tous les produits)
+
+    Args:
+        daily: Série quotidienne contenant jour_ferie, vacances_scolaires...
+        date_col: Nom de la colonne de dates ('date' ou 'ds')
+
+    Returns:
+        DataFrame: Colonnes ds, holiday, lower_window, upper_window
+    """
+    from holiday_calendar import HolidayCalendar
+
+    return HolidayCalendar.from_daily(daily, date_col=date_col).holidays
+
+
+def split_train_test(prophet_df, test_days=365):
+    """Sépare les derniers `test_days` jours pour l'évaluation"""
+    split_date = prophet_df['ds'].max() - pd.Timedelta(days=test_days)
+    train = prophet_df[prophet_df['ds'] <= split_date].copy()
+    test = prophet_df[prophet_df['ds'] > split_date].copy()
+    return train, test
+
+
+def compute_metrics(y_true, y_pred):
+    """
+    Calcule MAE, MAPE et RMSE
+
+    Returns:
+        dict: {"MAE": ..., "MAPE": ..., "RMSE": ...}
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    errors = y_true - y_pred
+    return {
+        "MAE": float(np.mean(np.abs(errors))),
+        "MAPE": float(np.mean(np.abs(errors / (y_true + 0.01))) * 100),
+        "RMSE": float(np.sqrt(np.mean(errors ** 2))),
+    }
+
+
+def regressors_in(prophet_df):
+    """Liste des régresseurs Prophet disponibles dans la série"""
+    return [col for col in REGRESSEURS_PROPHET if col in prophet_df.columns]
+
+
+def future_regressors(future, prophet_df, projection=None):
+    """
+    Complète les régresseurs des dates futures
+
+    Valeurs projetées du site (climatologie, profil hebdomadaire, voir
+    regressor_projection) : celles de `projection`, sinon celles partagées
+    avec le worker, sinon une projection de la série elle-même.
+    """
+    if not regressors_in(prophet_df):
+        return future
+    from regressor_projection import resolve_projection
+
+    horizon = max((future['ds'].max() - prophet_df['ds'].max()).days, 1)
+    return resolve_projection(projection, prophet_df, horizon).complete(future, prophet_df)
+
+
+def changepoints_within(changepoints, history):
+    """Garde les changepoints inclus dans la période d'entraînement (exigé par Prophet)"""
+    debut, fin = history['ds'].min(), history['ds'].max()
+    return [cp for cp in changepoints if debut <= pd.Timestamp(cp) <= fin]
+
+
+def make_prophet_model(holidays, changepoints, regressors=(), **overrides):
+    """
+    Crée un modèle Prophet avec la configuration du projet
+
+    Utilisée pour le modèle d'évaluation comme pour le modèle final, afin
+    que les deux restent identiques.
+
+    Args:
+        holidays: DataFrame des holidays (voir build_holidays)
+        changepoints: Changepoints manuels (déjà restreints à l'historique)
+        regressors: Noms des régresseurs à ajouter (voir REGRESSEURS_PROPHET)
+        **overrides: Paramètres Prophet remplaçant PROPHET_CONFIG ;
+            regressors_prior_scale remplace le prior_scale de tous les régresseurs
+
+    Returns:
+        Prophet: Modèle non entraîné
+    """
+    if not PROPHET_AVAILABLE:
+        raise ImportError("Prophet non disponible. Installation : pip install prophet")
+    from prophet import Prophet
+
+    config = {**PROPHET_CONFIG, **overrides}
+    regressors_prior_scale = config.pop('regressors_prior_scale', None)
+    model = Prophet(holidays=holidays, changepoints=changepoints, **config)
+
+    for col in regressors:
+        prior_scale, standardize = REGRESSEURS_PROPHET[col]
+        if regressors_prior_scale is not None:
+            prior_scale = regressors_prior_scale
+        model.add_regressor(col, prior_scale=prior_scale, standardize=standardize)
+    return model
+
+
+def warm_start_params(source, target, df):
+    """
+    Paramètres Stan d'un modèle entraîné, utilisables comme `init` d'un autre
+
+    Prophet normalise y par son maximum et le temps sur la durée de
+    l'historique : la pente, l'ordonnée et les deltas sont donc remis à
+    l'échelle du nouvel historique. Les deltas sont associés par date de
+    changepoint ; un changepoint absent du modèle source démarre à 0.
+
+    Args:
+        source: Modèle Prophet déjà entraîné
+        target: Modèle Prophet à entraîner (même structure, voir fit_or_load)
+        df: Données d'entraînement du modèle cible
+
+    Returns:
+        dict: Valeurs initiales k, m, sigma_obs, delta, beta
+    """
+    y_ratio = source.y_scale / max(float(np.abs(df['y']).max()), 1e-12)
+    t_ratio = (df['ds'].max() - df['ds'].min()) / source.t_scale
+    if getattr(source, 'scaling', 'absmax') != 'absmax':
+        y_ratio = 1.0
+
+    delta = source.params['delta'][0]
+    if target.changepoints is not None and source.changepoints is not None:
+        by_date = dict(zip(pd.to_datetime(source.changepoints), delta))
+        # Sans changepoint, Stan garde un delta factice de taille 1
+        delta = np.array([by_date.get(cp, 0.0) for cp in pd.to_datetime(target.changepoints)]
+                         or [0.0])
+
+    return {
+        'k': float(source.params['k'][0][0]) * t_ratio * y_ratio,
+        'm': float(source.params['m'][0][0]) * y_ratio,
+        'sigma_obs': float(source.params['sigma_obs'][0][0]) * y_ratio,
+        'delta': np.asarray(delta) * t_ratio * y_ratio,
+        'beta': source.params['beta'][0],
+    }
+
+
+def fit_prophet(model, df, init_from=None):
+    """
+    Entraîne un modèle, éventuellement à partir des paramètres d'un autre
+
+    Le warm-start fait converger L-BFGS en une fraction des itérations
+    quand les deux historiques sont proches (évaluation -> final).
+
+    Args:
+        model: Modèle Prophet non entraîné
+        df: Données d'entraînement (ds, y, régresseurs)
+        init_from: Modèle entraîné de même structure servant de point de
+            départ (optionnel)
+
+    Returns:
+        float: Durée de l'entraînement en secondes
+    """
+    start = time.perf_counter()
+    if init_from is None:
+        model.fit(df)
+    else:
+        model.fit(df, init=warm_start_params(init_from, model, df))
+    return time.perf_counter() - start
+
+
+def fit_or_load(df, holidays, changepoints, regressors, store=None, init_from=None,
+                meta=None, **overrides):
+    """
+    Crée et entraîne un modèle, ou le recharge depuis le cache de modèles
+
+    La clé du cache couvre la série d'entraînement, les holidays, les
+    changepoints, les régresseurs et la configuration Prophet : si rien
+    n'a changé depuis la dernière exécution, aucun entraînement n'a lieu.
+    Le warm-start n'a lieu que si init_from a la même clé de structure
+    (tout sauf les données, voir make_structure_key) ; le modèle renvoyé
+    porte la sienne dans `structure_key`.
+
+    Args:
+        df: Données d'entraînement (ds, y, régresseurs)
+        holidays: DataFrame des holidays
+        changepoints: Changepoints manuels (restreints ici à l'historique)
+        regressors: Noms des régresseurs
+        store: ModelStore (optionnel)
+        init_from: Modèle entraîné pour le warm-start (optionnel, ignoré si
+            sa structure_key diffère)
+        meta: Métadonnées enregistrées avec le modèle
+        **overrides: Paramètres Prophet remplaçant PROPHET_CONFIG
+
+    Returns:
+        tuple: (modèle entraîné, durée d'entraînement en s, trouvé en cache)
+    """
+    changepoints = changepoints_within(changepoints, df)
+    regressors_config = {col: REGRESSEURS_PROPHET[col] for col in regressors}
+    config = {**PROPHET_CONFIG, **overrides}
+    structure = make_structure_key(holidays, changepoints, regressors_config, config)
+
+    key = None
+    if store is not None:
+        key = make_model_key(df, holidays, changepoints, regressors_config, config)
+        cached = store.get(key)
+        if cached is not None:
+            cached[0].structure_key = structure
+            return cached[0], 0.0, True
+
+    if getattr(init_from, 'structure_key', None) != structure:
+        # Pas de modèle source, ou structure différente : entraînement à froid
+        init_from = None
+    model = make_prophet_model(holidays, changepoints, regressors, **overrides)
+    try:
+        duree = fit_prophet(model, df, init_from=init_from)
+    except (RuntimeError, ValueError) as e:
+        if init_from is None:
+            raise
+        # Échec de cmdstanpy avec ces valeurs initiales : nouveau modèle à froid
+        logging.warning("Warm-start impossible (%s: %s) : entraînement à froid",
+                        type(e).__name__, e)
+        model = make_prophet_model(holidays, changepoints, regressors, **overrides)
+        duree = fit_prophet(model, df)
+    model.structure_key = structure
+
+    if store is not None:
+        store.put(key, model, {**(meta or {}), "fit_s": round(duree, 3)})
+    return model, duree, False
+
+
+def predict(model, future, echantillons=ECHANTILLONS_INCERTITUDE):
+    """
+    Prédiction Prophet avec un nombre de simulations d'incertitude choisi
+
+    Le nombre de tirages ne joue que sur predict : il est appliqué au
+    modèle le temps de l'appel, sans toucher à la clé du cache de modèles.
+
+    Args:
+        model: Modèle Prophet entraîné
+        future: DataFrame futur (ds, régresseurs)
+        echantillons: Tirages pour yhat_lower/yhat_upper (0 : prévision
+            ponctuelle, sans ces colonnes)
+    """
+    initial = model.uncertainty_samples
+    model.uncertainty_samples = echantillons
+    try:
+        return model.predict(future)
+    finally:
+        model.uncertainty_samples = initial
+
+
+def forecast_errors(predictions, observed, origin, produit):
+    """
+    Erreurs hors échantillon au format du backtest (y - yhat)
+
+    Args:
+        predictions: Sortie de predict (ds, yhat)
+        observed: Valeurs observées (ds, y) aux mêmes dates
+        origin: Dernière date d'entraînement
+        produit: Nom du produit
+
+    Returns:
+        DataFrame: produit, horizon_jour, erreur
+    """
+    return pd.DataFrame({
+        'produit': produit,
+        'horizon_jour': (predictions['ds'] - origin).dt.days.to_numpy(),
+        'erreur': observed['y'].to_numpy() - predictions['yhat'].to_numpy(),
+    })
+
+
+def residual_quantiles(errors, horizon=HORIZON_JOURS, interval_width=INTERVAL_WIDTH,
+                       min_erreurs=MIN_ERREURS_HORIZON):
+    """
+    Quantiles des erreurs par produit et par jour d'horizon (calcul vectorisé)
+
+    Un jour d'horizon avec moins de `min_erreurs` erreurs (année
+    d'évaluation : une seule par jour ; backtest : une par cutoff) prend
+    les quantiles de toutes les erreurs du produit.
+
+    Args:
+        errors: DataFrame produit, horizon_jour, erreur (y - yhat), ex. la
+            table de backtest.run_backtest ou forecast_errors
+        horizon: Jours d'horizon couverts
+        interval_width: Couverture de l'intervalle
+
+    Returns:
+        DataFrame: produit, horizon_jour, erreur_basse, erreur_haute
+    """
+    tail = (1 - interval_width) / 2
+    errors = errors.dropna(subset=['erreur'])
+    produits = errors['produit'].unique()
+    grid = pd.MultiIndex.from_product([produits, np.arange(1, horizon + 1)],
+                                      names=['produit', 'horizon_jour'])
+
+    par_jour = errors.groupby(['produit', 'horizon_jour'])['erreur']
+    quantiles = par_jour.quantile([tail, 1 - tail]).unstack().reindex(grid)
+    counts = par_jour.size().reindex(grid, fill_value=0).to_numpy()
+
+    pooled = errors.groupby('produit')['erreur'].quantile([tail, 1 - tail]).unstack()
+    pooled = pooled.reindex(grid.get_level_values('produit')).to_numpy()
+
+    values = np.where((counts >= min_erreurs)[:, None], quantiles.to_numpy(), pooled)
+    return pd.DataFrame({
+        'produit': grid.get_level_values('produit'),
+        'horizon_jour': grid.get_level_values('horizon_jour'),
+        'erreur_basse': values[:, 0],
+        'erreur_haute': values[:, 1],
+    })
+
+
+def residual_intervals(predictions, quantiles, interval_width=INTERVAL_WIDTH):
+    """
+    Intervalles quantite_min/max de toutes les prédictions exportées à
+    partir des quantiles d'erreurs (une jointure, tous produits et jours
+    d'horizon à la fois)
+
+    Args:
+        predictions: Export (date, quantite_prevue, produit, ...)
+        quantiles: Résultat de residual_quantiles
+        interval_width: Couverture des quantiles (colonne confiance)
+
+    Returns:
+        DataFrame: predictions avec quantite_min/max tronquées à 0 (NaN pour
+        un produit sans erreurs)
+    """
+    predictions = predictions.sort_values(['produit', 'date'], ignore_index=True)
+    horizon_jour = predictions.groupby('produit').cumcount().to_numpy() + 1
+    bounds = pd.DataFrame({'produit': predictions['produit'], 'horizon_jour': horizon_jour})
+    bounds = bounds.merge(quantiles, on=['produit', 'horizon_jour'], how='left')
+
+    prevue = predictions['quantite_prevue'].to_numpy()
+    predictions['quantite_min'] = np.maximum(prevue + bounds['erreur_basse'].to_numpy(), 0.0)
+    predictions['quantite_max'] = np.maximum(prevue + bounds['erreur_haute'].to_numpy(), 0.0)
+    predictions['confiance'] = np.where(predictions['quantite_min'].notna(),
+                                        f"{interval_width:.0%}", None)
+    return predictions
+
+
+def export_predictions(predictions_futures, produit):
+    """
+    Met les prédictions au format CSV exporté (quantite_prevue/min/max)
+
+    Sans yhat_lower/yhat_upper (prédiction sans simulations d'incertitude),
+    quantite_min/max restent vides : voir residual_intervals.
+    """
+    export_df = predictions_futures[['ds', 'yhat']].copy()
+    export_df.columns = ['date', 'quantite_prevue']
+    ponctuelle = 'yhat_lower' not in predictions_futures
+    export_df['quantite_min'] = np.nan if ponctuelle else predictions_futures['yhat_lower']
+    export_df['quantite_max'] = np.nan if ponctuelle else predictions_futures['yhat_upper']
+    export_df['date'] = export_df['date'].dt.date
+    export_df['produit'] = produit
+    export_df['confiance'] = None if ponctuelle else f"{INTERVAL_WIDTH:.0%}"
+    return export_df
+
+
+def forecast_product(prophet_df, produit, changepoints=None, horizon=HORIZON_JOURS,
+                     test_days=365, warm_start=True, store=None, instr=None, config=None,
+                     calendar=None, projection=None, intervalles="prophet",
+                     echantillons=ECHANTILLONS_INCERTITUDE, erreurs=None):
+    """
+    Évalue puis entraîne Prophet sur un produit et prédit `horizon` jours
+
+    Args:
+        prophet_df: Série quotidienne du produit (colonnes ds, y, régresseurs)
+        produit: Nom du produit
+        changepoints: Changepoints manuels (par défaut ceux du calendrier)
+        horizon: Nombre de jours à prédire
+        test_days: Taille de la période de test
+        warm_start: Initialiser le modèle final avec le modèle d'évaluation
+        store: ModelStore pour réutiliser les modèles déjà entraînés (optionnel)
+        instr: Instrumentation recevant les étapes holidays, fit et predict
+            (défaut : une instrumentation propre au produit)
+        config: Paramètres Prophet remplaçant PROPHET_CONFIG (ex: configuration
+            retenue par tuning.py)
+        calendar: HolidayCalendar commun aux produits (défaut : celui
+            partagé avec le worker, sinon celui de la série)
+        projection: RegressorProjection du site, éventuellement avec un
+            scénario (défaut : celle partagée avec le worker, sinon celle
+            de la série)
+        intervalles: Calcul de quantite_min/max (voir INTERVALLES)
+        echantillons: Simulations de Prophet en mode "prophet" (moins de
+            tirages : predict plus rapide, bornes plus bruitées)
+        erreurs: Erreurs du backtest du produit (produit, horizon_jour,
+            erreur) pour le mode "residus" (défaut : celles de l'année
+            d'évaluation)
+
+    Returns:
+        dict: produit, metrics, durees, etapes, predictions (DataFrame
+        exporté), erreurs (année d'évaluation), forecast, model
+    """
+    if not PROPHET_AVAILABLE:
+        raise ImportError("Prophet non disponible. Installation : pip install prophet")
+    if intervalles not in INTERVALLES:
+        raise ValueError(f"Intervalles inconnus : {intervalles} ({', '.join(INTERVALLES)})")
+
+    from holiday_calendar import resolve_calendar
+    from instrumentation import Instrumentation
+
+    instr = Instrumentation() if instr is None else instr
+    config = config or {}
+    with instr.stage("holidays"):
+        calendar = resolve_calendar(calendar, prophet_df)
+        holidays = calendar.holidays
+    changepoints = calendar.changepoints if changepoints is None else changepoints
+    regressors = regressors_in(prophet_df)
+
+    # Évaluation sur la dernière année
+    train, test = split_train_test(prophet_df, test_days)
+    with instr.stage("fit", lignes=len(train)):
+        model, duree_eval, cache_eval = fit_or_load(
+            train, holidays, changepoints, regressors, store=store,
+            meta={"produit": produit, "role": "evaluation"}, **config
+        )
+    with instr.stage("predict", lignes=len(test)):
+        # Seul yhat sert à l'évaluation : pas de simulations d'incertitude
+        predictions_test = predict(model, test, echantillons=0)
+    metrics = compute_metrics(test['y'].values, predictions_test['yhat'].values)
+    errors_test = forecast_errors(predictions_test, test, train['ds'].max(), produit)
+
+    # Réentraînement sur toutes les données, à partir du modèle d'évaluation
+    with instr.stage("fit", lignes=len(prophet_df)):
+        model_final, duree_final, cache_final = fit_or_load(
+            prophet_df, holidays, changepoints, regressors, store=store,
+            init_from=model if warm_start else None,
+            meta={"produit": produit, "role": "final"}, **config
+        )
+
+    with instr.stage("predict", lignes=horizon):
+        future = model_final.make_future_dataframe(periods=horizon)
+        future = future_regressors(future, prophet_df, projection)
+        forecast = predict(model_final, future,
+                           echantillons=echantillons if intervalles == "prophet" else 0)
+    predictions_futures = forecast[forecast['ds'] > prophet_df['ds'].max()]
+    predictions = export_predictions(predictions_futures, produit)
+    if intervalles == "residus":
+        quantiles = residual_quantiles(errors_test if erreurs is None else erreurs, horizon)
+        predictions = residual_intervals(predictions, quantiles)
+
+    return {
+        "produit": produit,
+        "metrics": metrics,
+        "durees": {"fit_evaluation_s": duree_eval, "fit_final_s": duree_final},
+        "cache": {"evaluation": cache_eval, "final": cache_final},
+        "etapes": instr.as_dict(),
+        "predictions": predictions,
+        "erreurs": errors_test,
+        "forecast": forecast,
+        "model": model_final,
+    }
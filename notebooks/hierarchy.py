@@ -0,0 +1,596 @@
+"""
+Hierarchy - Prévisions hiérarchiques réconciliées (produit, famille, total)
+Les produits sont regroupés par famille (type_produit), éventuellement par
+site, jusqu'au total. Chaque nœud de la hiérarchie est prévu (baselines
+NumPy sur toute la matrice, ou Prophet sur les seuls niveaux agrégés), puis
+les prévisions sont réconciliées pour que les budgets par famille et les
+commandes par produit concordent :
+
+- bottom_up : somme des prévisions produit
+- top_down : prévision d'un niveau agrégé répartie selon les parts
+  historiques des produits (un seul modèle par famille suffit pour les
+  produits trop peu consommés pour être modélisés un à un)
+- mint : combinaison de tous les niveaux pondérée par la variance des
+  erreurs (trace minimale, Wickramasuriya et al. 2019)
+
+Toutes les réconciliations sont des produits matriciels sur tout le
+catalogue : ỹ = S P ŷ, avec S la matrice de sommation (nœuds × produits).
+
+Usage:
+    hierarchy = Hierarchy.from_demand(demand, product_families(csv))
+    nodes = hierarchy.aggregate(demand)
+    base = base_forecasts(nodes, horizon=28)
+    reconciled = reconcile(hierarchy, base, methode="mint")
+"""
+
+import numpy as np
+import pandas as pd
+
+from baselines import forecast_residuals, history_matrix, residual_bounds
+from defaults import COVARIANCES, NIVEAUX, RECONCILIATIONS
+from demand_matrix import REGRESSEURS_MAX, DemandMatrix
+from forecasting import HORIZON_JOURS, INTERVAL_WIDTH
+
+
+# Parts des produits dans leur parent (top_down) : dernière année
+JOURS_PROPORTIONS = 364
+
+# Nom des nœuds : "Site 1 / Aliment", "Site 1 / Poulet frais"
+SEPARATEUR = " / "
+TOTAL = "Total"
+FAMILLE_INCONNUE = "Autre"
+
+# Variance plancher (produits sans aucune consommation)
+VARIANCE_MIN = 1e-6
+
+
+def site_demand_matrix(df, type_sortie='CONSOMMATION'):
+    """
+    DemandMatrix avec une colonne par couple (site, produit), nommée
+    "site / produit" (la matrice usuelle cumule les sites)
+
+    Args:
+        df: Ledger complet avec une colonne site
+        type_sortie: Type de sortie à agréger
+    """
+    from demand_matrix import build_demand_matrix
+
+    if 'site' not in df.columns:
+        raise KeyError("Colonne site absente du ledger : hiérarchie par site impossible")
+    par_site = df.assign(nom_produit=df['site'].astype(str) + SEPARATEUR
+                         + df['nom_produit'].astype(str))
+    return build_demand_matrix(par_site, type_sortie=type_sortie)
+
+
+def ledger_families(df):
+    """
+    Famille (type_produit) de chaque produit d'un ledger chargé
+
+    Returns:
+        dict: {produit: famille}
+    """
+    pairs = df[['nom_produit', 'type_produit']].drop_duplicates()
+    return dict(zip(pairs['nom_produit'].astype(str), pairs['type_produit'].astype(str)))
+
+
+class Hierarchy:
+    """
+    Matrice de sommation S (nœuds × produits) de la hiérarchie
+
+    Les nœuds sont ordonnés par niveau : total, sites, familles, puis les
+    produits (le niveau le plus fin, colonnes de la DemandMatrix). Par site,
+    les familles sont celles de chaque site.
+    """
+
+    def __init__(self, produits, familles, sites=None):
+        """
+        Args:
+            produits: Séries du niveau le plus fin (noms des colonnes)
+            familles: Famille de chaque série (même ordre)
+            sites: Site de chaque série (même ordre), None pour un seul site
+        """
+        self.produits = list(produits)
+        n = len(self.produits)
+        familles = np.asarray(familles, dtype=object)
+        groupes = [("total", np.full(n, TOTAL, dtype=object))]
+        if sites is not None:
+            sites = np.asarray(sites, dtype=object)
+            groupes.append(("site", sites))
+            familles = sites + SEPARATEUR + familles
+        groupes.append(("famille", familles))
+
+        blocs, noeuds, niveaux = [], [], []
+        for niveau, keys in groupes:
+            codes, uniques = pd.factorize(keys, sort=True)
+            bloc = np.zeros((len(uniques), n))
+            bloc[codes, np.arange(n)] = 1.0
+            blocs.append(bloc)
+            noeuds += [str(u) for u in uniques]
+            niveaux += [niveau] * len(uniques)
+        blocs.append(np.eye(n))
+        noeuds += self.produits
+        niveaux += ["produit"] * n
+
+        doublons = pd.Index(noeuds)[pd.Index(noeuds).duplicated()]
+        if len(doublons):
+            raise ValueError(f"Noms de nœuds en double : {', '.join(doublons)}")
+
+        self.S = np.vstack(blocs)
+        self.noeuds = noeuds
+        self.niveaux = np.array(niveaux)
+        self.bottom = np.flatnonzero(self.niveaux == "produit")
+
+    @classmethod
+    def from_demand(cls, demand, familles, par_site=False):
+        """
+        Hiérarchie des colonnes d'une DemandMatrix
+
+        Args:
+            demand: DemandMatrix (par site : voir site_demand_matrix)
+            familles: {produit: famille}, produit sans le site
+            par_site: Colonnes nommées "site / produit"
+        """
+        if par_site:
+            sites, produits = zip(*(name.split(SEPARATEUR, 1) for name in demand.products))
+        else:
+            sites, produits = None, demand.products
+        noms = [familles.get(p) for p in produits]
+        noms = [FAMILLE_INCONNUE if f in (None, "nan") else f for f in noms]
+        return cls(demand.products, noms, sites)
+
+    def levels(self):
+        """Niveaux présents, du plus agrégé au plus fin"""
+        return [niveau for niveau in NIVEAUX if niveau in self.niveaux]
+
+    def parents(self, niveau):
+        """Indice du nœud parent de chaque produit au niveau donné"""
+        if niveau not in self.niveaux:
+            raise ValueError(f"Niveau absent de la hiérarchie : {niveau} ({', '.join(self.levels())})")
+        rows = np.flatnonzero(self.niveaux == niveau)
+        return rows[self.S[rows].argmax(axis=0)]
+
+    def aggregate(self, demand):
+        """
+        DemandMatrix de tous les nœuds (une colonne par nœud)
+
+        Quantités sommées sur les produits, régresseurs moyennés (drapeaux :
+        maximum) sur les produits présents chaque jour : chaque nœud se
+        prévoit comme un produit (baselines, run_batch).
+        """
+        cols = [demand.product_index(p) for p in self.produits]
+        St = self.S.T
+        n_days = len(demand.dates)
+        jours = np.arange(n_days)[:, None]
+        in_span = ((jours >= np.asarray(demand.debut)[cols])
+                   & (jours < np.asarray(demand.fin)[cols])).astype(np.float64)
+        presence = in_span @ St > 0
+
+        quantite = np.where(presence, np.asarray(demand.quantite)[:, cols] @ St, 0.0)
+        regresseurs = {}
+        for col, matrix in demand.regresseurs.items():
+            values = np.asarray(matrix)[:, cols]
+            valid = in_span * ~np.isnan(values)
+            sums = np.where(valid > 0, values, 0.0) @ St
+            if col in REGRESSEURS_MAX:
+                aggregated = (sums > 0).astype(np.float64)
+            else:
+                counts = valid @ St
+                aggregated = sums / np.maximum(counts, 1)
+                aggregated[counts == 0] = np.nan
+            regresseurs[col] = np.asfortranarray(np.where(presence, aggregated, np.nan))
+
+        return DemandMatrix(demand.dates, self.noeuds, np.asfortranarray(quantite), regresseurs,
+                            debut=presence.argmax(axis=0),
+                            fin=n_days - presence[::-1].argmax(axis=0),
+                            nb_sorties=np.asarray(demand.nb_sorties)[cols] @ St.astype(np.int64))
+
+    def proportions(self, nodes, niveau="total", jours=JOURS_PROPORTIONS):
+        """
+        Part de chaque produit dans son parent sur les derniers jours
+
+        Args:
+            nodes: DemandMatrix des nœuds (voir aggregate)
+            niveau: Niveau du parent
+            jours: Jours d'historique pris en compte
+        """
+        recent = np.asarray(nodes.quantite)[-jours:].sum(axis=0)
+        parents = self.parents(niveau)
+        totaux = recent[parents]
+        # Parent sans consommation récente : parts égales entre ses produits
+        egales = 1.0 / (self.S[parents].sum(axis=1))
+        return np.where(totaux > 0, recent[self.bottom] / np.where(totaux > 0, totaux, 1), egales)
+
+    def __len__(self):
+        return len(self.noeuds)
+
+    def __repr__(self):
+        counts = ", ".join(f"{niveau}={int((self.niveaux == niveau).sum())}"
+                           for niveau in self.levels())
+        return f"Hierarchy({len(self.noeuds)} nœuds : {counts})"
+
+
+def base_forecasts(nodes, horizon=HORIZON_JOURS, method="auto", interval_width=INTERVAL_WIDTH):
+    """
+    Prévisions baseline de tous les nœuds en une passe
+
+    Returns:
+        dict: prevision, min, max (horizon × nœuds), residus (jours × nœuds),
+        variance et methode par nœud
+    """
+    forecast, residuals, methods = forecast_residuals(history_matrix(nodes), method, horizon)
+    lower, upper = residual_bounds(residuals, forecast, interval_width)
+    return {
+        "prevision": forecast, "min": lower, "max": upper, "residus": residuals,
+        "variance": np.nan_to_num(np.nanvar(residuals, axis=0)),
+        "methode": methods.astype(object),
+    }
+
+
+def replace_with_prophet(base, nodes, noeuds, horizon=HORIZON_JOURS, **batch_options):
+    """
+    Remplace les prévisions de certains nœuds par celles de Prophet
+
+    La variance de ces nœuds devient le carré du RMSE de l'évaluation sur la
+    dernière année (erreur hors échantillon).
+
+    Args:
+        base: Résultat de base_forecasts
+        nodes: DemandMatrix des nœuds
+        noeuds: Nœuds prévus avec Prophet
+        **batch_options: n_workers, store, calendar, projection, instr
+            (voir batch_forecast.run_batch)
+
+    Returns:
+        DataFrame: Métriques Prophet par nœud
+    """
+    from batch_forecast import run_batch
+
+    predictions, metrics = run_batch(nodes, noeuds, horizon=horizon, **batch_options)
+    ok = metrics[metrics['statut'] == 'ok']
+    for noeud, rows in predictions.groupby('produit', sort=False):
+        j = nodes.product_index(noeud)
+        base["prevision"][:, j] = np.maximum(rows['quantite_prevue'].to_numpy()[:horizon], 0.0)
+        base["min"][:, j] = np.maximum(rows['quantite_min'].to_numpy()[:horizon], 0.0)
+        base["max"][:, j] = np.maximum(rows['quantite_max'].to_numpy()[:horizon], 0.0)
+        base["methode"][j] = "prophet"
+    for noeud, rmse in zip(ok['produit'], ok['RMSE']):
+        base["variance"][nodes.product_index(noeud)] = rmse ** 2
+    return metrics
+
+
+def shrunk_correlation(residuals):
+    """
+    Corrélation des résidus rétrécie vers l'identité (Schäfer & Strimmer)
+
+    Seuls les jours où tous les nœuds ont un résidu sont utilisés.
+
+    Returns:
+        tuple: (corrélation, intensité du rétrécissement λ)
+    """
+    complete = residuals[~np.isnan(residuals).any(axis=1)]
+    n, p = complete.shape
+    if n < 3:
+        return np.eye(p), 1.0
+    centered = complete - complete.mean(axis=0)
+    std = centered.std(axis=0)
+    X = centered / np.where(std > 0, std, 1.0)
+    W_mean = X.T @ X / n
+    # Variance de chaque corrélation empirique, en une passe matricielle
+    var_r = n / (n - 1) ** 3 * ((X ** 2).T @ (X ** 2) - n * W_mean ** 2)
+    corr = n / (n - 1) * W_mean
+    off = ~np.eye(p, dtype=bool)
+    denominateur = (corr[off] ** 2).sum()
+    lam = float(np.clip(var_r[off].sum() / denominateur, 0.0, 1.0)) if denominateur > 0 else 1.0
+    shrunk = (1 - lam) * corr
+    np.fill_diagonal(shrunk, 1.0)
+    return shrunk, lam
+
+
+def error_covariance(hierarchy, base, covariance="shrink"):
+    """
+    Covariance W des erreurs de prévision des nœuds (MinT)
+
+    Returns:
+        tuple: (W, λ ou None)
+    """
+    if covariance not in COVARIANCES:
+        raise ValueError(f"Covariance inconnue : {covariance} ({', '.join(COVARIANCES)})")
+    if covariance == "wls_struct":
+        return np.diag(hierarchy.S.sum(axis=1)), None
+    variance = np.maximum(base["variance"], VARIANCE_MIN)
+    if covariance == "wls_var":
+        return np.diag(variance), None
+    corr, lam = shrunk_correlation(base["residus"])
+    std = np.sqrt(variance)
+    return corr * np.outer(std, std), lam
+
+
+def reconciliation_matrix(hierarchy, methode="mint", W=None, proportions=None, depuis="total"):
+    """
+    Matrice P (produits × nœuds) : prévisions produit réconciliées = P ŷ
+
+    Args:
+        hierarchy: Hierarchy
+        methode: bottom_up, top_down ou mint
+        W: Covariance des erreurs (mint, voir error_covariance)
+        proportions: Part de chaque produit dans son parent (top_down)
+        depuis: Niveau réparti entre les produits (top_down)
+    """
+    n_bottom, n_nodes = len(hierarchy.bottom), len(hierarchy)
+    if methode == "bottom_up":
+        P = np.zeros((n_bottom, n_nodes))
+        P[np.arange(n_bottom), hierarchy.bottom] = 1.0
+    elif methode == "top_down":
+        P = np.zeros((n_bottom, n_nodes))
+        P[np.arange(n_bottom), hierarchy.parents(depuis)] = proportions
+    elif methode == "mint":
+        S = hierarchy.S
+        # P = (S' W⁻¹ S)⁻¹ S' W⁻¹, sans inverser W explicitement
+        Wi_S = np.linalg.solve(W, S)
+        P = np.linalg.solve(S.T @ Wi_S, Wi_S.T)
+    else:
+        raise ValueError(f"Réconciliation inconnue : {methode} ({', '.join(RECONCILIATIONS)})")
+    return P
+
+
+def reconcile(hierarchy, base, methode="mint", covariance="shrink", nodes=None, depuis="total"):
+    """
+    Prévisions cohérentes de tous les nœuds
+
+    Les prévisions produit négatives (mint) sont tronquées à 0 avant d'être
+    ré-agrégées : la somme reste exacte à tous les niveaux. Les intervalles
+    gardent l'écart de chaque nœud à sa prévision de base.
+
+    Args:
+        hierarchy: Hierarchy
+        base: Prévisions de base de tous les nœuds (voir base_forecasts)
+        methode: bottom_up, top_down ou mint
+        covariance: Covariance des erreurs de mint (voir COVARIANCES)
+        nodes: DemandMatrix des nœuds (top_down : parts historiques)
+        depuis: Niveau réparti entre les produits (top_down)
+
+    Returns:
+        dict: prevision, min, max (horizon × nœuds), lambda (shrink)
+    """
+    W, lam, proportions = None, None, None
+    if methode == "mint":
+        W, lam = error_covariance(hierarchy, base, covariance)
+    elif methode == "top_down":
+        if nodes is None:
+            raise ValueError("top_down : DemandMatrix des nœuds requise (parts historiques)")
+        proportions = hierarchy.proportions(nodes, depuis)
+
+    P = reconciliation_matrix(hierarchy, methode, W, proportions, depuis)
+    bottom = np.maximum(base["prevision"] @ P.T, 0.0)
+    forecast = bottom @ hierarchy.S.T
+    return {
+        "prevision": forecast,
+        "min": np.maximum(forecast - (base["prevision"] - base["min"]), 0.0),
+        "max": forecast + (base["max"] - base["prevision"]),
+        "lambda": lam,
+    }
+
+
+def incoherence(hierarchy, forecast):
+    """
+    Écart relatif entre chaque niveau et la somme des prévisions produit
+
+    Returns:
+        dict: {niveau: écart en %}
+    """
+    bottom_up = forecast[:, hierarchy.bottom] @ hierarchy.S.T
+    ecarts = np.abs(forecast - bottom_up).sum(axis=0)
+    volumes = np.abs(forecast).sum(axis=0)
+    return {niveau: round(float(100 * ecarts[hierarchy.niveaux == niveau].sum()
+                                / max(volumes[hierarchy.niveaux == niveau].sum(), 1e-9)), 2)
+            for niveau in hierarchy.levels() if niveau != "produit"}
+
+
+def evaluate(hierarchy, nodes, horizon=HORIZON_JOURS, method="auto", covariance="shrink",
+             depuis="total"):
+    """
+    Compare les réconciliations sur les `horizon` derniers jours (baselines)
+
+    Returns:
+        DataFrame: WAPE (%) par niveau (lignes) et par méthode (colonnes,
+        base = prévisions non réconciliées)
+    """
+    Y = history_matrix(nodes)
+    train, test = Y[:-horizon], np.nan_to_num(Y[-horizon:])
+    forecast, residuals, methods = forecast_residuals(train, method, horizon)
+    base = {"prevision": forecast, "min": forecast, "max": forecast, "residus": residuals,
+            "variance": np.nan_to_num(np.nanvar(residuals, axis=0)), "methode": methods}
+    # Parts historiques (top_down) calculées sans la période évaluée
+    history = DemandMatrix(nodes.dates[:-horizon], nodes.products,
+                           np.asarray(nodes.quantite)[:-horizon], {}, nodes.debut,
+                           np.minimum(nodes.fin, len(nodes.dates) - horizon), nodes.nb_sorties)
+
+    previsions = {"base": forecast}
+    for methode in RECONCILIATIONS:
+        previsions[methode] = reconcile(hierarchy, base, methode, covariance,
+                                        nodes=history, depuis=depuis)["prevision"]
+
+    wape = {}
+    for methode, prevision in previsions.items():
+        erreurs = np.abs(test - prevision).sum(axis=0)
+        volumes = np.abs(test).sum(axis=0)
+        wape[methode] = {niveau: 100 * erreurs[hierarchy.niveaux == niveau].sum()
+                         / max(volumes[hierarchy.niveaux == niveau].sum(), 1e-9)
+                         for niveau in hierarchy.levels()}
+    return pd.DataFrame(wape).round(2)
+
+
+def to_frame(hierarchy, nodes, base, reconciled, interval_width=INTERVAL_WIDTH):
+    """
+    Prévisions de tous les nœuds au format d'export
+
+    Returns:
+        DataFrame: date, niveau, noeud, quantite_base, quantite_prevue,
+        quantite_min, quantite_max, confiance, methode
+    """
+    horizon, n_nodes = reconciled["prevision"].shape
+    dates = pd.date_range(nodes.dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    return pd.DataFrame({
+        'date': np.tile(dates.date, n_nodes),
+        'niveau': np.repeat(hierarchy.niveaux, horizon),
+        'noeud': np.repeat(hierarchy.noeuds, horizon),
+        'quantite_base': base["prevision"].T.ravel(),
+        'quantite_prevue': reconciled["prevision"].T.ravel(),
+        'quantite_min': reconciled["min"].T.ravel(),
+        'quantite_max': reconciled["max"].T.ravel(),
+        'confiance': f"{interval_width:.0%}",
+        'methode': np.repeat(base["methode"], horizon),
+    })
+
+
+def main(args):
+    """Prévisions hiérarchiques en ligne de commande (voir cli.add_hierarchy_arguments)"""
+    import json
+    import time
+    from datetime import datetime
+    from pathlib import Path
+
+    from instrumentation import Instrumentation
+
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+    except ImportError:
+        results_mgr = None
+
+    def output(filename):
+        return results_mgr.output_path(filename) if results_mgr is not None else Path(filename)
+
+    if args.depuis == "site" and not args.par_site:
+        raise SystemExit("❌ --depuis site nécessite --par-site")
+
+    instr = Instrumentation(args.profil, args.trace_memoire,
+                            output_dir=results_mgr.get_run_path() if results_mgr is not None else None)
+    start = time.perf_counter()
+
+    if args.par_site or not args.chunksize:
+        from data_loader import load_stock_data
+        from demand_matrix import build_demand_matrix
+
+        with instr.stage("chargement") as m:
+            df = load_stock_data(args.csv)
+            m["lignes"] = len(df)
+        with instr.stage("agregation", lignes=len(df)):
+            familles = ledger_families(df)
+            demand = site_demand_matrix(df) if args.par_site else build_demand_matrix(df)
+        del df
+    else:
+        from demand_matrix import build_demand_matrix_streaming
+        from tuning import product_families
+
+        with instr.stage("agregation") as m:
+            demand = build_demand_matrix_streaming(args.csv, args.chunksize)
+            familles = product_families(args.csv)
+            m["lignes"] = int(demand.nb_sorties.sum())
+
+    with instr.stage("agregation"):
+        hierarchy = Hierarchy.from_demand(demand, familles, par_site=args.par_site)
+        nodes = hierarchy.aggregate(demand)
+    print(f"🌳 {hierarchy}")
+
+    with instr.stage("predict", lignes=len(hierarchy)):
+        base = base_forecasts(nodes, horizon=args.horizon)
+
+    prophet_metrics = None
+    if args.prophet_niveaux:
+        from forecasting import PROPHET_AVAILABLE
+        from holiday_calendar import calendar_for
+        from regressor_projection import projection_for
+
+        if not PROPHET_AVAILABLE:
+            print("⚠️  Prophet non disponible : baselines pour tous les niveaux")
+        else:
+            store = None
+            if results_mgr is not None and not args.no_cache:
+                from model_store import ModelStore
+                store = ModelStore.from_results_manager(results_mgr)
+            with instr.stage("holidays"):
+                calendar = calendar_for(demand, fenetres=dict(args.fenetre or []))
+            with instr.stage("projection"):
+                projection = projection_for(demand, args.horizon)
+            noeuds = [n for n, niveau in zip(hierarchy.noeuds, hierarchy.niveaux)
+                      if niveau in args.prophet_niveaux]
+            print(f"🔮 Prophet sur {len(noeuds)} nœud(s) : {', '.join(args.prophet_niveaux)}")
+            prophet_metrics = replace_with_prophet(
+                base, nodes, noeuds, horizon=args.horizon, n_workers=args.workers, store=store,
+                instr=instr, calendar=calendar, projection=projection
+            )
+
+    ecarts_base = incoherence(hierarchy, base["prevision"])
+    reconciled = reconcile(hierarchy, base, args.reconciliation, args.covariance,
+                           nodes=nodes, depuis=args.depuis)
+    duree = time.perf_counter() - start
+
+    print(f"\n🧮 Réconciliation {args.reconciliation}"
+          + (f" ({args.covariance}, λ = {reconciled['lambda']:.2f})"
+             if reconciled['lambda'] is not None else ""))
+    for niveau, ecart in ecarts_base.items():
+        print(f"   {niveau:10s} écart des prévisions de base à la somme des produits : {ecart:6.2f}%")
+
+    evaluation = None
+    if args.evaluer:
+        evaluation = evaluate(hierarchy, nodes, horizon=args.horizon, covariance=args.covariance,
+                              depuis=args.depuis)
+        print(f"\n📏 WAPE (%) sur les {args.horizon} derniers jours (baselines)")
+        print(evaluation.to_string())
+
+    predictions_df = to_frame(hierarchy, nodes, base, reconciled)
+    filename_csv = output(f'hierarchie_predictions_{args.horizon}j.csv')
+    with instr.stage("export", lignes=len(predictions_df)):
+        predictions_df.to_csv(filename_csv, index=False)
+    print(f"\n✅ {filename_csv}")
+
+    totaux = (predictions_df.groupby(['niveau', 'noeud'], sort=False)['quantite_prevue'].sum()
+              .round(1))
+    etapes = instr.as_dict()
+    summary = {
+        "date_analyse": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "horizon": f"{args.horizon} jours",
+        "par_site": args.par_site,
+        "reconciliation": args.reconciliation,
+        "covariance": args.covariance if args.reconciliation == "mint" else None,
+        "lambda_shrink": (round(reconciled["lambda"], 3) if reconciled["lambda"] is not None
+                          else None),
+        "depuis": args.depuis if args.reconciliation == "top_down" else None,
+        "prophet_niveaux": args.prophet_niveaux or [],
+        "noeuds": {niveau: int((hierarchy.niveaux == niveau).sum()) for niveau in hierarchy.levels()},
+        "ecart_base_pct": ecarts_base,
+        "totaux": {niveau: totaux[niveau].to_dict() for niveau in hierarchy.levels()
+                   if niveau != "produit"},
+        "duree_totale_s": round(duree, 2),
+        "etapes": etapes,
+    }
+    if evaluation is not None:
+        summary["evaluation_wape"] = evaluation.to_dict()
+    if prophet_metrics is not None:
+        summary["prophet"] = json.loads(prophet_metrics.round(2).to_json(orient='records',
+                                                                          force_ascii=False))
+    filename_json = output('summary_hierarchie.json')
+    with open(filename_json, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False, default=str)
+    print(f"✅ {filename_json}")
+
+    if results_mgr is not None:
+        results_mgr.create_summary_file(f"Hiérarchie ({len(hierarchy.bottom)} séries)", {
+            "Réconciliation": args.reconciliation,
+            "Nœuds": len(hierarchy),
+            "Modèles Prophet": len(prophet_metrics) if prophet_metrics is not None else 0,
+            "Écart de base (familles)": f"{ecarts_base.get('famille', 0.0):.2f}%",
+            "Durée": f"{duree:.1f}s",
+            "etapes": etapes,
+        })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_hierarchy_arguments
+
+    parser = argparse.ArgumentParser(description="Prévisions hiérarchiques réconciliées")
+    add_hierarchy_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,182 @@
+"""
+Holiday Calendar - Holidays et changepoints Prophet communs à tous les produits
+Les drapeaux jour_ferie, vacances_scolaires et covid_impact sont ceux du
+site : ils ne dépendent pas du produit. Le calendrier est donc construit une
+seule fois sur tous les produits (un jour férié sans sortie d'un produit
+reste un jour férié pour ce produit), mis en cache avec la matrice, puis
+partagé par tous les fits et envoyé une seule fois à chaque worker.
+
+Usage:
+    calendar = calendar_for(demand, fenetres={'jour_ferie': (-1, 1)})
+    model = make_prophet_model(calendar.holidays, calendar.changepoints_for(train), regs)
+
+    with ProcessPoolExecutor(initializer=init_worker, initargs=(calendar,)) as pool:
+        ...  # dans les workers : shared_calendar()
+"""
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from defaults import HOLIDAYS_COLONNES
+from forecasting import CHANGEPOINTS_MANUELS, changepoints_within
+
+
+# Fenêtres par holiday : (lower_window, upper_window) en jours autour de la date.
+# (-1, 1) ajoute un effet propre à la veille et au lendemain.
+FENETRES = {name: (0, 0) for name in HOLIDAYS_COLONNES.values()}
+
+COLONNES_HOLIDAYS = ['ds', 'holiday', 'lower_window', 'upper_window']
+
+# Calendriers déjà construits, par matrice puis par options
+_CACHE = weakref.WeakKeyDictionary()
+
+# Calendrier partagé avec les tâches d'un worker (voir share_calendar)
+_SHARED = None
+
+
+class HolidayCalendar:
+    """
+    Holidays Prophet (une ligne par jour et par holiday) et changepoints manuels
+
+    Le DataFrame des holidays est construit à la création du calendrier puis
+    réutilisé par tous les modèles : il ne doit pas être modifié.
+    """
+
+    def __init__(self, dates, flags, changepoints=None, fenetres=None):
+        """
+        Args:
+            dates: Dates du calendrier
+            flags: {holiday: tableau booléen aligné sur dates}
+            changepoints: Changepoints manuels (défaut : CHANGEPOINTS_MANUELS)
+            fenetres: {holiday: (lower_window, upper_window)} remplaçant FENETRES
+        """
+        self.dates = pd.DatetimeIndex(dates)
+        self.flags = {name: np.asarray(flag, dtype=bool) for name, flag in flags.items()}
+        self.changepoints = list(CHANGEPOINTS_MANUELS if changepoints is None else changepoints)
+        self.fenetres = {**FENETRES, **(fenetres or {})}
+        for name, (lower, upper) in self.fenetres.items():
+            if lower > 0 or upper < 0:
+                raise ValueError(f"Fenêtre invalide pour {name} : ({lower}, {upper}) "
+                                 "(lower_window <= 0 <= upper_window)")
+        self.holidays = self._build_holidays()
+
+    @classmethod
+    def from_demand(cls, demand, **kwargs):
+        """
+        Calendrier du site : un jour est marqué si un produit au moins l'est
+        (parmi les sorties retenues dans la matrice)
+
+        Args:
+            demand: DemandMatrix (matrices date × produit des drapeaux)
+            **kwargs: changepoints, fenetres
+        """
+        flags = {name: (demand.regresseurs[col] == 1).any(axis=1)
+                 for col, name in HOLIDAYS_COLONNES.items() if col in demand.regresseurs}
+        return cls(demand.dates, flags, **kwargs)
+
+    @classmethod
+    def from_daily(cls, daily, date_col='date', **kwargs):
+        """
+        Calendrier d'une série quotidienne ou d'un ledger (plusieurs lignes
+        par date possibles)
+
+        Args:
+            daily: DataFrame contenant jour_ferie, vacances_scolaires...
+            date_col: Nom de la colonne de dates ('date' ou 'ds')
+            **kwargs: changepoints, fenetres
+        """
+        cols = [col for col in HOLIDAYS_COLONNES if col in daily.columns]
+        marked = (daily[cols] == 1).groupby(daily[date_col].to_numpy()).any()
+        return cls(marked.index, {HOLIDAYS_COLONNES[col]: marked[col].to_numpy() for col in cols},
+                   **kwargs)
+
+    @classmethod
+    def from_frames(cls, frames, **kwargs):
+        """
+        Calendrier commun à plusieurs séries Prophet
+
+        Args:
+            frames: {produit: série Prophet (ds, y, drapeaux)}
+            **kwargs: changepoints, fenetres
+        """
+        cols = [col for col in HOLIDAYS_COLONNES
+                if all(col in df.columns for df in frames.values())]
+        stacked = pd.concat([df[['ds', *cols]] for df in frames.values()], ignore_index=True)
+        return cls.from_daily(stacked, date_col='ds', **kwargs)
+
+    def _build_holidays(self):
+        """DataFrame des holidays Prophet (ds, holiday, lower_window, upper_window)"""
+        frames = []
+        for name, flag in self.flags.items():
+            lower, upper = self.fenetres.get(name, (0, 0))
+            frames.append(pd.DataFrame({'ds': self.dates[flag], 'holiday': name,
+                                        'lower_window': lower, 'upper_window': upper}))
+        if not frames:
+            return pd.DataFrame(columns=COLONNES_HOLIDAYS)
+        return pd.concat(frames, ignore_index=True)
+
+    def counts(self):
+        """Nombre de jours marqués par holiday"""
+        return {name: int(flag.sum()) for name, flag in self.flags.items()}
+
+    def changepoints_for(self, history):
+        """Changepoints inclus dans la période d'entraînement"""
+        return changepoints_within(self.changepoints, history)
+
+    def options(self):
+        """Fenêtres et changepoints, pour les clés de cache et les résumés"""
+        return {
+            "fenetres": {name: list(window) for name, window in sorted(self.fenetres.items())},
+            "changepoints": [str(pd.Timestamp(cp).date()) for cp in self.changepoints],
+        }
+
+    def __repr__(self):
+        jours = ", ".join(f"{name}={n}" for name, n in self.counts().items())
+        return f"HolidayCalendar({len(self.dates)} jours, {jours})"
+
+
+def calendar_for(demand, fenetres=None, changepoints=None):
+    """
+    Calendrier d'une DemandMatrix, construit une seule fois par matrice et
+    par options
+
+    Args:
+        demand: DemandMatrix
+        fenetres: {holiday: (lower_window, upper_window)} remplaçant FENETRES
+        changepoints: Changepoints manuels (défaut : CHANGEPOINTS_MANUELS)
+
+    Returns:
+        HolidayCalendar
+    """
+    options = (tuple(sorted((fenetres or {}).items())),
+               None if changepoints is None else tuple(changepoints))
+    calendars = _CACHE.setdefault(demand, {})
+    if options not in calendars:
+        calendars[options] = HolidayCalendar.from_demand(demand, fenetres=fenetres,
+                                                         changepoints=changepoints)
+    return calendars[options]
+
+
+def share_calendar(calendar):
+    """Rend le calendrier disponible aux tâches du processus (initializer des pools)"""
+    global _SHARED
+    _SHARED = calendar
+
+
+def shared_calendar():
+    """Calendrier partagé avec le processus (None si aucun)"""
+    return _SHARED
+
+
+def resolve_calendar(calendar, prophet_df):
+    """
+    Calendrier donné, sinon celui partagé avec le worker, sinon celui de la
+    série elle-même (analyse d'un produit isolé)
+    """
+    if calendar is not None:
+        return calendar
+    if _SHARED is not None:
+        return _SHARED
+    return HolidayCalendar.from_daily(prophet_df, date_col='ds')
@@ -0,0 +1,517 @@
+"""
+Incremental - Ingestion quotidienne et rafraîchissement des prévisions
+Seules les lignes ajoutées au CSV depuis la dernière exécution sont lues et
+repliées dans les agrégats (produit, jour) enregistrés. Seuls les produits
+concernés sont reprévus : si les nouveaux jours restent proches de la
+prévision précédente, le modèle enregistré prolonge simplement ses
+prédictions ; sinon il est réentraîné en warm-start. La reconstruction
+complète n'a lieu qu'au premier passage ou quand la configuration change.
+Les nouvelles lignes peuvent être validées au passage (data_validation.py),
+et celles en erreur écartées des agrégats.
+
+Usage:
+    python cli.py refresh --csv ../data/dataset_stock_hopital_ENRICHI.csv
+    python cli.py refresh --methode baseline
+    python cli.py refresh --validation exclure
+    python cli.py refresh --rebuild
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from defaults import HOLIDAYS_COLONNES, SEUIL_DERIVE
+from forecasting import (
+    CHANGEPOINTS_MANUELS, HORIZON_JOURS, PROPHET_AVAILABLE, PROPHET_CONFIG, REGRESSEURS_PROPHET,
+    export_predictions, fit_or_load, future_regressors, init_worker, regressors_in,
+)
+from holiday_calendar import FENETRES, calendar_for, shared_calendar
+from instrumentation import Instrumentation
+from regressor_projection import projection_for
+
+
+# Version de l'état : à incrémenter si son contenu change (reconstruction)
+STATE_VERSION = 2
+
+# Réentraînement forcé quand le dernier fit couvre des données plus anciennes
+REFIT_MAX_JOURS = 7
+
+# Octets avant la position de reprise comparés pour détecter un CSV réécrit
+TAILLE_EMPREINTE = 4096
+
+STATE_FILENAME = "state.json"
+AGGREGAT_FILENAME = "aggregat.pkl"
+PREDICTIONS_FILENAME = "predictions.csv"
+VALIDATION_FILENAME = "validation.pkl"
+
+
+def config_key(csv_path, methode, horizon, type_sortie='CONSOMMATION', fenetres=None,
+               validation=None):
+    """
+    Hash de tout ce qui invalide l'état incrémental : source, méthode,
+    horizon, configuration des modèles (fenêtres des holidays comprises) et
+    validation (les lignes écartées changent les agrégats)
+    """
+    payload = {
+        "version": STATE_VERSION,
+        "csv": str(Path(csv_path).resolve()),
+        "methode": methode,
+        "horizon": horizon,
+        "type_sortie": type_sortie,
+        "prophet": PROPHET_CONFIG,
+        "regresseurs": REGRESSEURS_PROPHET,
+        "changepoints": CHANGEPOINTS_MANUELS,
+        "holidays": HOLIDAYS_COLONNES,
+        "fenetres": {**FENETRES, **(fenetres or {})},
+        "validation": validation,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _fingerprint(csv_path, offset):
+    """Hash des derniers octets lus (détecte un fichier réécrit plutôt que complété)"""
+    with open(csv_path, 'rb') as f:
+        f.seek(max(offset - TAILLE_EMPREINTE, 0))
+        return hashlib.sha256(f.read(min(offset, TAILLE_EMPREINTE))).hexdigest()
+
+
+def _generation(filename, position):
+    """
+    Nom du fichier d'agrégats ou de validation d'une position de reprise :
+    chaque exécution écrit les siens sans toucher à ceux de l'état validé
+    """
+    stem, suffix = os.path.splitext(filename)
+    return f"{stem}.{position['offset']}-{position['empreinte'][:12]}{suffix}"
+
+
+def _prune_generations(state_dir, fichiers):
+    """Supprime les agrégats et validations non référencés par l'état validé"""
+    for filename in (AGGREGAT_FILENAME, VALIDATION_FILENAME):
+        stem, suffix = os.path.splitext(filename)
+        for path in Path(state_dir).glob(f"{stem}.*{suffix}"):
+            if path.name not in fichiers.values():
+                path.unlink(missing_ok=True)
+
+
+def _load_state(state_dir, key, csv_path):
+    """
+    Charge l'état précédent s'il est réutilisable
+
+    Returns:
+        dict ou None: None si absent, autre configuration ou CSV réécrit
+    """
+    state_file = Path(state_dir) / STATE_FILENAME
+    if not state_file.exists():
+        return None
+    with open(state_file, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+
+    if state.get("config") != key:
+        print("🔄 Configuration modifiée : reconstruction complète")
+        return None
+    if not all((Path(state_dir) / name).exists() for name in state["fichiers"].values() if name):
+        print("🔄 Agrégats de l'état introuvables : reconstruction complète")
+        return None
+    if os.path.getsize(csv_path) < state["offset"] or \
+            _fingerprint(csv_path, state["offset"]) != state["empreinte"]:
+        print("🔄 CSV réécrit (pas seulement complété) : reconstruction complète")
+        return None
+    return state
+
+
+def ingest(csv_path, state_dir, key, type_sortie='CONSOMMATION', rebuild=False,
+           chunksize=None, validation=None, verbose=True):
+    """
+    Replie les nouvelles lignes du CSV dans les agrégats enregistrés
+
+    Les agrégats et l'état du validateur sont écrits dans des fichiers
+    propres à la nouvelle position, que seul state.json (écrit par refresh)
+    rend effectifs : une exécution interrompue reprend aux agrégats et à la
+    position précédents sans compter deux fois les mêmes lignes.
+
+    Args:
+        csv_path: Ledger CSV (complété chaque jour)
+        state_dir: Dossier de l'état incrémental
+        key: Clé de configuration (voir config_key)
+        type_sortie: Type de sortie agrégé
+        rebuild: Ignorer l'état et tout relire
+        chunksize: Lignes par bloc (défaut : data_loader.CHUNK_LIGNES)
+        validation: None, "signaler" ou "exclure" (voir defaults.VALIDATIONS)
+        verbose: Afficher la progression
+
+    Returns:
+        tuple: (DemandAccumulator, état précédent ou None si reconstruction,
+        nouvelle position de reprise {offset, empreinte, fichiers},
+        DataValidator des nouvelles lignes ou None)
+    """
+    from data_loader import CHUNK_LIGNES, csv_offsets, iter_stock_chunks
+    from demand_matrix import DemandAccumulator
+
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+
+    state = None if rebuild else _load_state(state_dir, key, csv_path)
+    if state is None:
+        accumulator = DemandAccumulator(type_sortie)
+        start = None
+    else:
+        accumulator = DemandAccumulator.load(state_dir / state["fichiers"]["aggregat"])
+        start = state["offset"]
+
+    columns = DemandAccumulator.columns()
+    validator = None
+    if validation is not None:
+        from data_validation import DataValidator
+
+        validator = (DataValidator() if state is None
+                     else DataValidator.load(state_dir / state["fichiers"]["validation"]))
+        columns = list(dict.fromkeys(columns + DataValidator.columns()))
+
+    _, end = csv_offsets(csv_path)
+    nb_lignes = accumulator.nb_lignes
+    for chunk in iter_stock_chunks(csv_path, chunksize or CHUNK_LIGNES,
+                                   columns=columns, start=start, end=end):
+        if validator is not None:
+            erreurs = validator.add(chunk)
+            if validation == "exclure":
+                chunk = chunk[~erreurs]
+        accumulator.add(chunk)
+
+    if verbose:
+        mode = "reconstruction" if state is None else "incrémental"
+        print(f"📥 {accumulator.nb_lignes - nb_lignes:,} nouvelle(s) ligne(s) ({mode}), "
+              f"{len(accumulator.modifies)} produit(s) concerné(s)")
+
+    position = {"offset": end, "empreinte": _fingerprint(csv_path, end)}
+    position["fichiers"] = {"aggregat": _generation(AGGREGAT_FILENAME, position),
+                            "validation": None}
+    accumulator.save(state_dir / position["fichiers"]["aggregat"])
+    if validator is not None:
+        position["fichiers"]["validation"] = _generation(VALIDATION_FILENAME, position)
+        validator.save(state_dir / position["fichiers"]["validation"])
+    return accumulator, state, position, validator
+
+
+def drift(previous, history, depuis):
+    """
+    Écart relatif entre consommation observée et prévue sur les nouveaux jours
+
+    Args:
+        previous: Prédictions précédentes du produit (date, quantite_prevue...)
+        history: Série quotidienne du produit (ds, y)
+        depuis: Dernière date couverte par le fit précédent
+
+    Returns:
+        float ou None: None si les nouveaux jours ne sont pas tous couverts
+    """
+    nouveaux = history[history['ds'] > pd.Timestamp(depuis)]
+    if previous is None or nouveaux.empty:
+        return None
+    prevu = previous.set_index(pd.to_datetime(previous['date']))['quantite_prevue']
+    prevu = prevu.reindex(nouveaux['ds'])
+    if prevu.isna().any():
+        return None
+    total_prevu = float(prevu.sum())
+    return abs(float(nouveaux['y'].sum()) - total_prevu) / max(total_prevu, 1.0)
+
+
+def product_model_key(key, produit):
+    """Clé du dernier modèle d'un produit dans le ModelStore"""
+    return hashlib.sha256(json.dumps(["incremental", key, produit]).encode()).hexdigest()
+
+
+def _refresh_task(produit, prophet_df, previous, product_state, key, store, horizon,
+                  seuil_derive, profiling=None, calendar=None, projection=None):
+    """
+    Rafraîchit la prévision d'un produit (exécutée dans un worker ; le
+    calendrier des holidays et la projection des régresseurs sont ceux
+    partagés avec le worker par défaut)
+
+    Returns:
+        dict: produit, statut (prolonge, warm_start, complet, erreur),
+        derive, predictions, dernier_fit, etapes, duree_s
+    """
+    start = time.perf_counter()
+    instr = Instrumentation.for_worker(profiling, produit)
+    last_date = prophet_df['ds'].max()
+    try:
+        cached = store.get(product_model_key(key, produit)) if store is not None else None
+        model = None
+        if cached is not None:
+            # La clé de structure ne survit pas à la sérialisation du modèle
+            model, meta = cached
+            model.structure_key = meta.get("structure")
+
+        derive, statut = None, "complet"
+        if model is not None and product_state is not None:
+            dernier_fit = pd.Timestamp(product_state["dernier_fit"])
+            derive = drift(previous, prophet_df, product_state["donnees_jusqu_a"])
+            trop_ancien = (last_date - dernier_fit).days > REFIT_MAX_JOURS
+            statut = ("prolonge" if derive is not None and derive <= seuil_derive
+                      and not trop_ancien else "warm_start")
+
+        if statut == "prolonge":
+            # Le modèle enregistré prédit les jours suivants sans réentraînement
+            dernier_fit = product_state["dernier_fit"]
+        else:
+            calendar = shared_calendar() if calendar is None else calendar
+            with instr.stage("fit", lignes=len(prophet_df)):
+                model, _, _ = fit_or_load(prophet_df, calendar.holidays, calendar.changepoints,
+                                          regressors_in(prophet_df),
+                                          init_from=model if statut == "warm_start" else None)
+            if store is not None:
+                store.put(product_model_key(key, produit), model,
+                          {"produit": produit, "role": "incremental",
+                           "structure": model.structure_key})
+            dernier_fit = str(last_date.date())
+
+        with instr.stage("predict", lignes=horizon):
+            future = pd.DataFrame({'ds': pd.date_range(last_date + pd.Timedelta(days=1),
+                                                       periods=horizon, freq='D')})
+            forecast = model.predict(future_regressors(future, prophet_df, projection))
+        return {
+            "produit": produit,
+            "statut": statut,
+            "derive": derive,
+            "predictions": export_predictions(forecast, produit),
+            "dernier_fit": dernier_fit,
+            "etapes": instr.as_dict(),
+            "duree_s": time.perf_counter() - start,
+        }
+    except Exception as e:
+        return {
+            "produit": produit,
+            "statut": "erreur",
+            "erreur": f"{type(e).__name__}: {e}",
+            "etapes": instr.as_dict(),
+            "duree_s": time.perf_counter() - start,
+        }
+
+
+def refresh(csv_path, state_dir, methode="prophet", horizon=HORIZON_JOURS,
+            seuil_derive=SEUIL_DERIVE, n_workers=None, rebuild=False, store=None,
+            chunksize=None, instr=None, fenetres=None, validation=None, verbose=True):
+    """
+    Exécution quotidienne : ingestion incrémentale puis rafraîchissement des
+    seuls produits concernés
+
+    Args:
+        csv_path: Ledger CSV
+        state_dir: Dossier de l'état (ex: ResultsManager.get_store_dir("incremental"))
+        methode: "prophet" ou "baseline"
+        horizon: Nombre de jours à prédire
+        seuil_derive: Dérive maximum pour prolonger sans réentraîner
+        n_workers: Nombre de processus pour les fits Prophet
+        rebuild: Forcer la reconstruction complète
+        store: ModelStore des derniers modèles de chaque produit
+        chunksize: Lignes par bloc de lecture
+        instr: Instrumentation des étapes (les étapes fit et predict des
+            workers y sont cumulées)
+        fenetres: {holiday: (lower_window, upper_window)} (voir holiday_calendar)
+        validation: Valider les nouvelles lignes : "signaler", ou "exclure"
+            pour écarter aussi les lignes en erreur des agrégats
+        verbose: Afficher la progression
+
+    Returns:
+        tuple: (prédictions de tout le catalogue, rapport par produit
+        rafraîchi, DataValidator des nouvelles lignes ou None)
+    """
+    if methode == "prophet" and not PROPHET_AVAILABLE:
+        print("⚠️  Prophet non disponible : prévisions baseline NumPy (pip install prophet)")
+        methode = "baseline"
+
+    instr = Instrumentation() if instr is None else instr
+    state_dir = Path(state_dir)
+    key = config_key(csv_path, methode, horizon, fenetres=fenetres, validation=validation)
+    with instr.stage("chargement"):
+        accumulator, state, position, validator = ingest(
+            csv_path, state_dir, key, rebuild=rebuild, chunksize=chunksize,
+            validation=validation, verbose=verbose
+        )
+    if validator is not None and verbose:
+        validator.print_summary()
+
+    previous_predictions = None
+    if state is not None and (state_dir / PREDICTIONS_FILENAME).exists():
+        previous_predictions = pd.read_csv(state_dir / PREDICTIONS_FILENAME)
+    produits_state = state["produits"] if state is not None else {}
+
+    with instr.stage("agregation", lignes=accumulator.nb_lignes):
+        demand = accumulator.to_matrix()
+    produits = sorted(accumulator.modifies) if state is not None else list(demand.products)
+
+    results = []
+    if produits and methode == "baseline":
+        # Vectorisé sur tout le catalogue : aucun état de modèle à conserver
+        from baselines import forecast_baselines
+
+        with instr.stage("predict", lignes=len(produits)):
+            predictions = forecast_baselines(demand, produits, horizon=horizon)
+        for produit, pred in predictions.groupby('produit', sort=False):
+            results.append({"produit": produit, "statut": "baseline", "derive": None,
+                            "predictions": pred, "dernier_fit": str(demand.dates[-1].date()),
+                            "duree_s": 0.0})
+    elif produits:
+        def previous_of(produit):
+            if previous_predictions is None:
+                return None
+            return previous_predictions[previous_predictions['produit'] == produit]
+
+        with instr.stage("holidays"):
+            calendar = calendar_for(demand, fenetres=fenetres)
+        with instr.stage("projection"):
+            projection = projection_for(demand, horizon)
+        tasks = [(p, demand.prophet_frame(p), previous_of(p), produits_state.get(p), key,
+                  store, horizon, seuil_derive, instr.worker_options()) for p in produits]
+        n_workers = min(n_workers or os.cpu_count() or 1, len(tasks))
+        if n_workers <= 1:
+            init_worker()
+            results = [_refresh_task(*task, calendar=calendar, projection=projection)
+                       for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker,
+                                     initargs=(calendar, projection)) as pool:
+                results = list(pool.map(_refresh_task, *zip(*tasks)))
+        for r in results:
+            instr.merge(r["etapes"])
+
+    # Prédictions du catalogue : celles des produits non concernés sont conservées
+    ok = [r for r in results if r["statut"] != "erreur"]
+    frames = [r["predictions"] for r in ok]
+    if previous_predictions is not None:
+        rafraichis = {r["produit"] for r in ok}
+        frames.insert(0, previous_predictions[~previous_predictions['produit'].isin(rafraichis)])
+    predictions_df = (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame())
+    if len(predictions_df):
+        predictions_df['date'] = pd.to_datetime(predictions_df['date']).dt.date
+        predictions_df = predictions_df.sort_values(['produit', 'date'], ignore_index=True)
+
+    for r in ok:
+        j = demand.product_index(r["produit"])
+        produits_state[r["produit"]] = {
+            "dernier_fit": r["dernier_fit"],
+            "donnees_jusqu_a": str(demand.dates[demand.fin[j] - 1].date()),
+        }
+
+    # L'état n'est validé qu'après les prévisions : position de reprise et
+    # fichiers d'agrégats changent ensemble dans le même os.replace, une
+    # exécution interrompue reprend donc à la position précédente
+    with instr.stage("export", lignes=len(predictions_df)):
+        predictions_df.to_csv(state_dir / PREDICTIONS_FILENAME, index=False)
+    new_state = {
+        "version": STATE_VERSION,
+        "config": key,
+        "csv": str(Path(csv_path).resolve()),
+        "date_execution": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        **position,
+        "produits": produits_state,
+    }
+    tmp_file = state_dir / (STATE_FILENAME + ".tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(new_state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, state_dir / STATE_FILENAME)
+    _prune_generations(state_dir, position["fichiers"])
+
+    report_df = pd.DataFrame([
+        {"produit": r["produit"], "statut": r["statut"], "derive": r.get("derive"),
+         "erreur": r.get("erreur"), "duree_s": round(r["duree_s"], 2)}
+        for r in results
+    ], columns=["produit", "statut", "derive", "erreur", "duree_s"])
+
+    if verbose:
+        for statut, n in report_df['statut'].value_counts().items():
+            print(f"   {statut:12s} {n} produit(s)")
+    return predictions_df, report_df, validator
+
+
+def main(args):
+    """
+    Rafraîchissement quotidien en ligne de commande (voir cli.add_refresh_arguments)
+    """
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+    except ImportError:
+        results_mgr = None
+
+    state_dir = (results_mgr.get_store_dir("incremental") if results_mgr is not None
+                 else Path("../results/_incremental"))
+    store = None
+    if results_mgr is not None and args.methode == "prophet":
+        from model_store import ModelStore
+        store = ModelStore.from_results_manager(results_mgr)
+
+    from instrumentation import stage_regressions
+
+    instr = Instrumentation(args.profil, args.trace_memoire,
+                            output_dir=results_mgr.get_run_path() if results_mgr is not None else None)
+
+    start = time.perf_counter()
+    predictions_df, report_df, validator = refresh(
+        args.csv, state_dir, methode=args.methode, horizon=args.horizon,
+        seuil_derive=args.seuil_derive, n_workers=args.workers, rebuild=args.rebuild,
+        store=store, chunksize=args.chunksize, instr=instr, fenetres=dict(args.fenetre or []),
+        validation=args.validation,
+    )
+    duree = time.perf_counter() - start
+    print(f"\n⏱️  {len(report_df)} produit(s) rafraîchi(s) en {duree:.1f}s")
+
+    def output(filename):
+        return results_mgr.output_path(filename) if results_mgr is not None else Path(filename)
+
+    filename_csv = output(f'predictions_incremental_{args.horizon}j.csv')
+    with instr.stage("export", lignes=len(predictions_df)):
+        predictions_df.to_csv(filename_csv, index=False)
+    print(f"✅ {filename_csv}")
+    if validator is not None:
+        # Rapport des seules lignes ajoutées depuis l'exécution précédente
+        for path in validator.write(results_mgr.get_run_path() if results_mgr is not None
+                                    else Path(".")):
+            print(f"✅ {path}")
+
+    label = f"Incrémental ({len(report_df)} produits)"
+    etapes = instr.as_dict()
+    instr.print_summary()
+    summary = {
+        "date_analyse": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "horizon": f"{args.horizon} jours",
+        "duree_totale_s": round(duree, 2),
+        "etapes": etapes,
+        "produits": json.loads(report_df.round(4).to_json(orient='records', force_ascii=False)),
+    }
+    if validator is not None:
+        summary["validation"] = {"mode": args.validation, **validator.counts()}
+    if results_mgr is not None:
+        summary["alertes_etapes"] = stage_regressions(results_mgr, label, etapes)
+    filename_json = output('summary_incremental.json')
+    with open(filename_json, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"✅ {filename_json}")
+
+    if results_mgr is not None:
+        statuts = report_df['statut'].value_counts()
+        results_mgr.create_summary_file(label, {
+            "Produits rafraîchis": len(report_df),
+            "Prolongés sans fit": int(statuts.get("prolonge", 0)),
+            "Réentraînés": int(statuts.get("warm_start", 0) + statuts.get("complet", 0)),
+            "Lignes en erreur": (validator.report()["lignes_en_erreur"] if validator is not None
+                                 else "non validées"),
+            "Durée": f"{duree:.1f}s",
+            "etapes": etapes,
+        })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_refresh_arguments
+
+    parser = argparse.ArgumentParser(description="Ingestion incrémentale et rafraîchissement")
+    add_refresh_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,293 @@
+"""
+Instrumentation - Durée, temps CPU et mémoire de chaque étape du pipeline
+Chaque étape (chargement, filtrage, agrégation, holidays, projection, fit,
+predict, graphiques, export) est mesurée par un bloc `with instr.stage(...)`. Les
+mesures sont enregistrées dans le résumé JSON de l'exécution et dans son
+README, et comparées aux exécutions précédentes pour signaler les étapes
+qui ralentissent.
+
+Usage:
+    instr = Instrumentation(profil="fit", output_dir=run_dir)
+    with instr.stage("chargement") as m:
+        df = load_stock_data(csv)
+        m["lignes"] = len(df)
+    summary["etapes"] = instr.as_dict()
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None   # Windows : pas de module resource
+
+from defaults import ETAPES, TOUTES
+
+
+# Ralentissement signalé par rapport à la médiane des exécutions précédentes
+SEUIL_ALERTE = 1.5
+
+# Nombre d'exécutions précédentes prises pour référence
+HISTORIQUE_ALERTE = 5
+
+# Étapes plus courtes : trop bruitées pour déclencher une alerte
+DUREE_MIN_ALERTE = 0.5
+
+# Lignes affichées dans les rapports cProfile et tracemalloc
+LIGNES_RAPPORT = 30
+
+
+def cpu_time():
+    """
+    Temps CPU du processus et de ses sous-processus terminés (le fit
+    Prophet s'exécute dans un sous-processus cmdstan)
+    """
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _reset_peak_rss():
+    """
+    Remet à zéro le pic RSS du processus (Linux : /proc/self/clear_refs)
+
+    Returns:
+        bool: False si le pic ne peut pas être remis à zéro (le RSS maximum
+        mesuré est alors celui du processus depuis son démarrage)
+    """
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """
+    Pic RSS du processus en Mo (depuis la dernière remise à zéro)
+
+    Returns:
+        float ou None: None si le pic n'est pas mesurable (ni /proc ni
+        module resource, ex: Windows)
+    """
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    return maxrss / 1024 ** 2 if sys.platform == "darwin" else maxrss / 1024
+
+
+def format_rss(rss_mb):
+    """Pic RSS affiché dans les tableaux ("-" s'il n'est pas mesuré)"""
+    return f"{rss_mb:7.0f} MB" if rss_mb is not None else f"{'-':>7s} MB"
+
+
+class Instrumentation:
+    """
+    Mesures des étapes d'une exécution
+
+    Une étape appelée plusieurs fois (fit du modèle d'évaluation puis du
+    modèle final) cumule ses durées ; le pic mémoire est le maximum.
+    """
+
+    def __init__(self, profil=None, trace_memoire=None, output_dir=None, verbose=False):
+        """
+        Args:
+            profil: Étape profilée avec cProfile, ou TOUTES (rapports
+                profil_<etape>.prof et .txt)
+            trace_memoire: Étape suivie avec tracemalloc, ou TOUTES (pic
+                d'allocation et rapport memoire_<etape>.txt ; ralentit l'étape)
+            output_dir: Dossier des rapports (défaut : répertoire courant)
+            verbose: Afficher la mesure à la fin de chaque étape
+        """
+        self.profil = profil
+        self.trace_memoire = trace_memoire
+        self.output_dir = Path(output_dir) if output_dir is not None else Path(".")
+        self.verbose = verbose
+        self.etapes = {}
+        self.rapports = []
+        self._profilers = {}
+
+    @contextmanager
+    def stage(self, name, lignes=None):
+        """
+        Mesure une étape : temps réel, temps CPU, pic RSS et lignes traitées
+
+        Le dictionnaire renvoyé permet de renseigner les lignes une fois
+        l'étape exécutée (m["lignes"] = len(df)).
+        """
+        mesure = {"lignes": lignes}
+        profiler = None
+        if self.profil in (name, TOUTES):
+            # Un profileur par étape : les appels successifs sont cumulés
+            profiler = self._profilers.setdefault(name, cProfile.Profile())
+        tracing = self.trace_memoire in (name, TOUTES) and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        _reset_peak_rss()
+        wall, cpu = time.perf_counter(), cpu_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield mesure
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            mesure["duree_s"] = time.perf_counter() - wall
+            mesure["cpu_s"] = cpu_time() - cpu
+            mesure["rss_max_mb"] = peak_rss_mb()
+            if profiler is not None:
+                self._write_profile(name, profiler)
+            if tracing:
+                mesure["pic_alloc_mb"] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+                self._write_memory(name, tracemalloc.take_snapshot())
+                tracemalloc.stop()
+            self.record(name, mesure)
+            if self.verbose:
+                print(f"   ⏱️  {name:20s} {mesure['duree_s']:7.2f}s  "
+                      f"{format_rss(mesure['rss_max_mb'])}")
+
+    def record(self, name, mesure):
+        """Ajoute une mesure (y compris une mesure faite dans un worker)"""
+        etape = self.etapes.setdefault(name, {"appels": 0, "duree_s": 0.0, "cpu_s": 0.0,
+                                              "rss_max_mb": None, "lignes": None})
+        etape["appels"] += mesure.get("appels", 1)
+        etape["duree_s"] += mesure["duree_s"]
+        etape["cpu_s"] += mesure["cpu_s"]
+        if mesure.get("rss_max_mb") is not None:
+            etape["rss_max_mb"] = max(etape["rss_max_mb"] or 0.0, mesure["rss_max_mb"])
+        if mesure.get("lignes") is not None:
+            etape["lignes"] = (etape["lignes"] or 0) + mesure["lignes"]
+        if mesure.get("pic_alloc_mb") is not None:
+            etape["pic_alloc_mb"] = max(etape.get("pic_alloc_mb", 0.0), mesure["pic_alloc_mb"])
+
+    def worker_options(self):
+        """
+        Options de profilage à transmettre aux workers d'un pool
+
+        Returns:
+            tuple ou None: (profil, trace_memoire, dossier des rapports)
+        """
+        if not (self.profil or self.trace_memoire):
+            return None
+        return (self.profil, self.trace_memoire, str(self.output_dir / "profils"))
+
+    @classmethod
+    def for_worker(cls, options, produit):
+        """
+        Instrumentation d'une tâche exécutée dans un worker : les rapports
+        du produit sont écrits dans <dossier>/<produit>/
+
+        Args:
+            options: Résultat de worker_options() (ou None)
+            produit: Produit traité par la tâche
+        """
+        if options is None:
+            return cls()
+        profil, trace_memoire, profile_dir = options
+        output_dir = Path(profile_dir) / produit.replace(" ", "_")
+        output_dir.mkdir(parents=True, exist_ok=True)
+        return cls(profil, trace_memoire, output_dir)
+
+    def merge(self, etapes):
+        """Cumule les étapes renvoyées par un worker (voir as_dict)"""
+        for name, mesure in etapes.items():
+            self.record(name, mesure)
+
+    def as_dict(self):
+        """
+        Mesures arrondies, dans l'ordre de ETAPES puis d'exécution
+
+        Returns:
+            dict: {etape: {appels, duree_s, cpu_s, rss_max_mb, lignes}}
+            (rss_max_mb et lignes absents s'ils ne sont pas mesurés)
+        """
+        ordre = sorted(self.etapes, key=lambda e: ETAPES.index(e) if e in ETAPES else len(ETAPES))
+        result = {}
+        for name in ordre:
+            etape = self.etapes[name]
+            result[name] = {key: (round(value, 3) if isinstance(value, float) else value)
+                            for key, value in etape.items() if value is not None}
+        return result
+
+    def print_summary(self):
+        """Tableau des étapes (part de chacune dans la durée totale)"""
+        etapes = self.as_dict()
+        total = sum(e["duree_s"] for e in etapes.values()) or 1.0
+        print("\n⏱️  Durées par étape")
+        for name, etape in etapes.items():
+            print(f"   {name:12s} {etape['duree_s']:8.2f}s  {etape['duree_s'] / total:6.1%}  "
+                  f"CPU {etape['cpu_s']:8.2f}s  {format_rss(etape.get('rss_max_mb'))}")
+
+    def _write_profile(self, name, profiler):
+        path = self.output_dir / f"profil_{name}.prof"
+        profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(LIGNES_RAPPORT)
+        path.with_suffix(".txt").write_text(text.getvalue(), encoding='utf-8')
+        if path.name not in self.rapports:
+            self.rapports.append(path.name)
+        print(f"🔬 Profil de l'étape {name} : {path}")
+
+    def _write_memory(self, name, snapshot):
+        path = self.output_dir / f"memoire_{name}.txt"
+        lines = [f"Allocations de l'étape {name} (tracemalloc, par ligne)\n"]
+        for stat in snapshot.statistics("lineno")[:LIGNES_RAPPORT]:
+            lines.append(f"{stat.size / 1024 ** 2:10.2f} MB  {stat.count:8d} blocs  "
+                         f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}\n")
+        path.write_text("".join(lines), encoding='utf-8')
+        if path.name not in self.rapports:
+            self.rapports.append(path.name)
+        print(f"🔬 Allocations de l'étape {name} : {path}")
+
+
+def stage_regressions(results_mgr, produit, etapes, seuil=SEUIL_ALERTE,
+                      historique=HISTORIQUE_ALERTE, verbose=True):
+    """
+    Compare les durées des étapes à celles des exécutions précédentes du
+    même produit (métriques "etapes.<etape>.duree_s" de l'index)
+
+    Args:
+        results_mgr: ResultsManager (index des exécutions)
+        produit: Produit (ou libellé) des exécutions comparables
+        etapes: Mesures de l'exécution courante (Instrumentation.as_dict)
+        seuil: Ratio à la médiane au-delà duquel une étape est signalée
+        historique: Nombre d'exécutions précédentes prises pour référence
+
+    Returns:
+        List[dict]: etape, duree_s, reference_s, ratio
+    """
+    runs = results_mgr.find_runs(produit=produit, limit=historique)
+    alertes = []
+    for name, etape in etapes.items():
+        previous = [r["metriques"][f"etapes.{name}.duree_s"] for r in runs
+                    if f"etapes.{name}.duree_s" in r.get("metriques", {})]
+        if not previous:
+            continue
+        reference = statistics.median(previous)
+        if etape["duree_s"] < DUREE_MIN_ALERTE or reference <= 0:
+            continue
+        ratio = etape["duree_s"] / reference
+        if ratio > seuil:
+            alertes.append({"etape": name, "duree_s": etape["duree_s"],
+                            "reference_s": round(reference, 3), "ratio": round(ratio, 2)})
+            if verbose:
+                print(f"⚠️  Étape {name} plus lente : {etape['duree_s']:.1f}s contre "
+                      f"{reference:.1f}s (médiane des {len(previous)} dernières exécutions)")
+    return alertes
@@ -0,0 +1,259 @@
+"""
+Lot Ledger - Stock réel par lot (FIFO) et suivi des péremptions
+Rejoue les ENTREE/SORTIE du ledger contre id_lot / date_expiration pour
+obtenir le stock disponible par lot à n'importe quelle date, les quantités
+périmées non consommées et les violations FIFO, sans reparcourir le ledger
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Tolérance sur les soldes (arrondis à 2 décimales dans le CSV)
+EPSILON = 1e-6
+
+
+def _days(values):
+    """Convertit des dates en nombre de jours (int64) depuis l'epoch"""
+    return np.asarray(values, dtype='datetime64[D]').astype(np.int64)
+
+
+class LotLedger:
+    """
+    Ledger par lot sous forme de tableaux NumPy
+
+    Les lots (lignes ENTREE) sont triés par (produit, date d'entrée, id_lot).
+    Les sorties sont triées par (lot, date) avec leur cumul par lot : le
+    solde d'un lot à une date donnée s'obtient par une recherche
+    dichotomique (np.searchsorted), sans reparcourir les mouvements.
+    """
+
+    def __init__(self, lots, sorties, orphelines):
+        """
+        Args:
+            lots: DataFrame des lots (un lot par ligne, voir from_ledger)
+            sorties: DataFrame des sorties rattachées à un lot connu
+            orphelines: Nombre de sorties dont le lot n'a pas d'entrée
+        """
+        self.lots = lots
+        self.sorties = sorties
+        self.orphelines = orphelines
+
+        # Index de recherche : clé composite (lot, jour) triée
+        self._lot_code = sorties['lot_code'].to_numpy(np.int64)
+        self._jour = _days(sorties['date'])
+        self._keys = self._lot_code * 1_000_000 + self._jour
+        self._cumul = sorties['cumul_sortie'].to_numpy(np.float64)
+
+        self._entree = _days(lots['date_entree'])
+        self._expiration = _days(lots['date_expiration'])
+        self._quantite = lots['quantite_entree'].to_numpy(np.float64)
+
+    @classmethod
+    def from_ledger(cls, df):
+        """
+        Construit le ledger par lot
+
+        Args:
+            df: Ledger complet (date, nom_produit, type_operation, type_sortie,
+                quantite, id_lot, date_expiration...)
+
+        Returns:
+            LotLedger
+        """
+        entrees = df[df['type_operation'] == 'ENTREE']
+        lots = pd.DataFrame({
+            'id_lot': entrees['id_lot'].to_numpy(),
+            'produit': entrees['nom_produit'].astype(str).to_numpy(),
+            'date_entree': entrees['date'].to_numpy(),
+            'date_expiration': entrees['date_expiration'].to_numpy(),
+            'quantite_entree': entrees['quantite'].to_numpy(np.float64),
+        })
+        for col in ('id_arrivage', 'nom_fournisseur', 'unite'):
+            if col in entrees.columns:
+                lots[col] = entrees[col].to_numpy()
+
+        # Plusieurs entrées sur un même lot : on les cumule sur la première
+        lots = (lots.sort_values(['produit', 'date_entree', 'id_lot'])
+                .groupby('id_lot', sort=False)
+                .agg({**{c: 'first' for c in lots.columns if c != 'id_lot'},
+                      'quantite_entree': 'sum'})
+                .reset_index()
+                .sort_values(['produit', 'date_entree', 'id_lot'], ignore_index=True))
+        lots['lot_code'] = np.arange(len(lots))
+
+        raw = df[df['type_operation'] == 'SORTIE']
+        lot_code = pd.Series(lots['lot_code'].to_numpy(), index=lots['id_lot'].to_numpy())
+        codes = lot_code.reindex(raw['id_lot'].to_numpy()).to_numpy()
+        known = ~np.isnan(codes)
+
+        sorties = pd.DataFrame({
+            'ligne': raw.index.to_numpy()[known],
+            'lot_code': codes[known].astype(np.int64),
+            'date': raw['date'].to_numpy()[known],
+            'type_sortie': raw['type_sortie'].astype(str).to_numpy()[known],
+            'quantite': raw['quantite'].to_numpy(np.float64)[known],
+        }).sort_values(['lot_code', 'date', 'ligne'], ignore_index=True)
+        sorties['cumul_sortie'] = sorties.groupby('lot_code')['quantite'].cumsum()
+
+        return cls(lots, sorties, int((~known).sum()))
+
+    # ------------------------------------------------------------------
+    # Requêtes à une date
+    # ------------------------------------------------------------------
+
+    def _sorties_cumulees(self, date):
+        """Cumul des sorties de chaque lot jusqu'à `date` incluse"""
+        jour = _days([date])[0]
+        codes = np.arange(len(self.lots), dtype=np.int64)
+        pos = np.searchsorted(self._keys, codes * 1_000_000 + jour, side='right') - 1
+        valid = (pos >= 0) & (self._lot_code[np.maximum(pos, 0)] == codes)
+        return np.where(valid, self._cumul[np.maximum(pos, 0)], 0.0)
+
+    def on_hand(self, date, include_empty=False):
+        """
+        Stock restant par lot à une date (en fin de journée)
+
+        Args:
+            date: Date de la requête
+            include_empty: Garder les lots soldés ou pas encore reçus
+
+        Returns:
+            DataFrame: lots avec quantite_restante et perime
+        """
+        jour = _days([date])[0]
+        recu = self._entree <= jour
+        restant = np.where(recu, self._quantite - self._sorties_cumulees(date), 0.0)
+
+        result = self.lots.drop(columns='lot_code').copy()
+        result['quantite_restante'] = np.maximum(restant, 0.0)
+        result['perime'] = self._expiration < jour
+        if not include_empty:
+            result = result[result['quantite_restante'] > EPSILON]
+        return result.reset_index(drop=True)
+
+    def stock_by_product(self, date):
+        """
+        Stock par produit à une date : total, encore valide et périmé
+
+        Returns:
+            DataFrame: produit, stock_total, stock_valide, stock_perime, nb_lots
+        """
+        lots = self.on_hand(date)
+        lots['stock_valide'] = np.where(lots['perime'], 0.0, lots['quantite_restante'])
+        lots['stock_perime'] = np.where(lots['perime'], lots['quantite_restante'], 0.0)
+        return (lots.groupby('produit', sort=True)
+                .agg(stock_total=('quantite_restante', 'sum'),
+                     stock_valide=('stock_valide', 'sum'),
+                     stock_perime=('stock_perime', 'sum'),
+                     nb_lots=('id_lot', 'size'))
+                .reset_index())
+
+    def expired_unconsumed(self, date):
+        """Lots périmés à `date` qui ont encore du stock (ni consommés ni détruits)"""
+        lots = self.on_hand(date)
+        return lots[lots['perime']].reset_index(drop=True)
+
+    def waste_risk(self, date, consommation_jour):
+        """
+        Quantité qui périmera avant d'être consommée (consommation FEFO)
+
+        Pour chaque produit, les lots valides sont triés par date
+        d'expiration. Le k-ième lot est perdu pour la part du stock cumulé
+        S_k qui dépasse la capacité de consommation C_k = conso × jours
+        restants ; la perte totale vaut max_k (S_k - C_k)+.
+
+        Args:
+            date: Date de la requête
+            consommation_jour: Consommation quotidienne prévue
+                (nombre, ou dictionnaire / Series {produit: conso})
+
+        Returns:
+            DataFrame: produit, stock_valide, risque_gaspillage
+        """
+        jour = _days([date])[0]
+        lots = self.on_hand(date)
+        lots = lots[~lots['perime']].sort_values(['produit', 'date_expiration'])
+
+        if np.isscalar(consommation_jour):
+            conso = np.full(len(lots), float(consommation_jour))
+        else:
+            # Seuls les produits dont la consommation est fournie sont évalués
+            consommation_jour = pd.Series(consommation_jour, dtype=float)
+            lots = lots[lots['produit'].isin(consommation_jour.index)]
+            conso = lots['produit'].map(consommation_jour).to_numpy(float)
+
+        if lots.empty:
+            return pd.DataFrame(columns=['produit', 'stock_valide', 'risque_gaspillage'])
+
+        jours_restants = _days(lots['date_expiration']) - jour + 1
+        lots['capacite'] = conso * jours_restants
+        lots['stock_cumule'] = lots.groupby('produit')['quantite_restante'].cumsum()
+        lots['deficit'] = np.maximum(lots['stock_cumule'] - lots['capacite'], 0.0)
+
+        return (lots.groupby('produit', sort=True)
+                .agg(stock_valide=('quantite_restante', 'sum'),
+                     risque_gaspillage=('deficit', 'max'))
+                .reset_index())
+
+    # ------------------------------------------------------------------
+    # Contrôle FIFO
+    # ------------------------------------------------------------------
+
+    def lot_closing_dates(self):
+        """
+        Date à laquelle chaque lot cesse d'être utilisable : solde à zéro ou
+        expiration, selon ce qui arrive en premier (NaT si toujours ouvert)
+        """
+        sorties = self.sorties
+        solde = self._quantite[sorties['lot_code'].to_numpy()] - self._cumul
+        epuise = sorties.loc[solde <= EPSILON].groupby('lot_code')['date'].min()
+
+        fermeture = np.full(len(self.lots), np.iinfo(np.int64).max)
+        fermeture[epuise.index.to_numpy()] = _days(epuise.to_numpy())
+        return np.minimum(fermeture, self._expiration)
+
+    def fifo_violations(self):
+        """
+        Sorties prélevées sur un lot alors qu'un lot plus ancien du même
+        produit avait encore du stock non périmé
+
+        Les lots étant triés par date d'entrée dans chaque produit, il y a
+        violation si le maximum des dates de fermeture des lots entrés
+        strictement avant est postérieur à la date de la sortie (une
+        fermeture le jour même n'est pas comptée : l'ordre intra-journée
+        n'est pas connu).
+
+        Returns:
+            DataFrame: sorties en violation (ligne du ledger, lot, produit)
+        """
+        fermeture = self.lot_closing_dates()
+        produit = self.lots['produit'].to_numpy()
+
+        # Maximum cumulé des fermetures, par produit, dans l'ordre d'entrée
+        cummax = pd.Series(fermeture).groupby(produit).cummax().to_numpy()
+
+        # Dernier lot du même produit entré strictement avant chaque lot
+        rang = self.lots.groupby(['produit', 'date_entree']).cumcount().to_numpy()
+        precedent = np.arange(len(self.lots)) - rang - 1
+        valide = precedent >= 0
+        valide[valide] = produit[precedent[valide]] == produit[valide]
+        fermeture_prec = np.where(valide, cummax[np.maximum(precedent, 0)],
+                                  np.iinfo(np.int64).min)
+
+        codes = self.sorties['lot_code'].to_numpy()
+        violation = fermeture_prec[codes] > self._jour
+
+        result = self.sorties.loc[violation, ['ligne', 'date', 'type_sortie', 'quantite']].copy()
+        result['id_lot'] = self.lots['id_lot'].to_numpy()[codes[violation]]
+        result['produit'] = produit[codes[violation]]
+        return result.reset_index(drop=True)
+
+    def __repr__(self):
+        return (f"LotLedger({len(self.lots):,} lots, {len(self.sorties):,} sorties, "
+                f"{self.orphelines} orphelines)")
+
+
+def build_lot_ledger(df):
+    """Raccourci pour LotLedger.from_ledger"""
+    return LotLedger.from_ledger(df)
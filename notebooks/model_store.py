@@ -0,0 +1,200 @@
+"""
+Model Store - Cache persistant des modèles Prophet entraînés
+Sérialise les modèles (model_to_json) dans le dossier de résultats, indexés
+par un hash des données et de la configuration, avec éviction LRU
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+
+# Version du format : à incrémenter si le contenu d'une entrée change
+STORE_VERSION = 1
+
+MAX_ENTRIES = 500
+MAX_BYTES = 512 * 1024 ** 2
+
+
+def frame_digest(df):
+    """Hash stable du contenu d'un DataFrame (valeurs et noms de colonnes)"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(map(str, df.columns))).encode())
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _structure_payload(holidays, changepoints, regressors, config):
+    """Entrées qui fixent les composantes d'un modèle, hors données"""
+    return {
+        "holidays": frame_digest(holidays),
+        "changepoints": [str(pd.Timestamp(cp).date()) for cp in changepoints],
+        "regressors": {k: list(v) for k, v in regressors.items()},
+        "config": config,
+    }
+
+
+def make_structure_key(holidays, changepoints, regressors, config):
+    """
+    Calcule la clé de structure d'un modèle : make_model_key sans les données
+
+    Deux modèles de même structure ont les mêmes composantes ; l'un peut
+    donc servir de point de départ (warm-start) à l'autre.
+
+    Returns:
+        str: Hash SHA-256 hexadécimal
+    """
+    payload = {"version": STORE_VERSION,
+               **_structure_payload(holidays, changepoints, regressors, config)}
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def make_model_key(prophet_df, holidays, changepoints, regressors, config, **extra):
+    """
+    Calcule la clé d'un modèle
+
+    Args:
+        prophet_df: Série quotidienne d'entraînement
+        holidays: DataFrame des holidays
+        changepoints: Changepoints manuels
+        regressors: Configuration des régresseurs {nom: (prior_scale, standardize)}
+        config: Paramètres Prophet
+        **extra: Autres éléments influençant le modèle (test_days, warm_start...)
+
+    Returns:
+        str: Hash SHA-256 hexadécimal
+    """
+    payload = {
+        "version": STORE_VERSION,
+        "data": frame_digest(prophet_df),
+        **_structure_payload(holidays, changepoints, regressors, config),
+        "extra": extra,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ModelStore:
+    """
+    Cache disque de modèles Prophet entraînés
+
+    Chaque entrée est un fichier JSON autonome (modèle sérialisé + métadonnées)
+    écrit de façon atomique, ce qui permet aux workers du mode batch d'écrire
+    en parallèle. La date de modification sert d'horodatage LRU : elle est
+    rafraîchie à chaque lecture.
+    """
+
+    def __init__(self, store_dir, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        """
+        Args:
+            store_dir: Dossier du cache (ex: ResultsManager.get_store_dir("models"))
+            max_entries: Nombre maximum de modèles conservés
+            max_bytes: Taille totale maximum du cache
+        """
+        self.store_dir = Path(store_dir)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_results_manager(cls, results_mgr, **kwargs):
+        """Crée le store dans le dossier results/_models du ResultsManager"""
+        return cls(results_mgr.get_store_dir("models"), **kwargs)
+
+    def _entry_path(self, key):
+        return self.store_dir / f"{key}.json"
+
+    def __contains__(self, key):
+        return self._entry_path(key).exists()
+
+    def get(self, key):
+        """
+        Charge un modèle depuis le cache
+
+        Returns:
+            tuple: (modèle Prophet, métadonnées) ou None si absent
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if entry.get("version") != STORE_VERSION:
+            return None
+
+        from prophet.serialize import model_from_json
+
+        os.utime(path)  # LRU : marque l'entrée comme récemment utilisée
+        return model_from_json(entry["model"]), entry.get("meta", {})
+
+    def put(self, key, model, meta=None):
+        """
+        Enregistre un modèle entraîné
+
+        Args:
+            key: Clé calculée par make_model_key
+            model: Modèle Prophet entraîné
+            meta: Métadonnées JSON (produit, métriques, durées...)
+        """
+        from prophet.serialize import model_to_json
+
+        entry = {
+            "version": STORE_VERSION,
+            "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "meta": meta or {},
+            "model": model_to_json(model),
+        }
+        path = self._entry_path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def entries(self):
+        """Liste (chemin, taille, dernier accès) triée du plus ancien au plus récent"""
+        entries = []
+        for path in self.store_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self):
+        """
+        Supprime les entrées les moins récemment utilisées au-delà des limites
+
+        Returns:
+            int: Nombre d'entrées supprimées
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            path, size, _ = entries.pop(0)
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Vide le cache"""
+        for path, _, _ in self.entries():
+            path.unlink(missing_ok=True)
+
+    def __repr__(self):
+        entries = self.entries()
+        size = sum(s for _, s, _ in entries) / 1024 ** 2
+        return f"ModelStore({self.store_dir}, {len(entries)} modèles, {size:.1f} MB)"
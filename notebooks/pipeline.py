@@ -0,0 +1,640 @@
+"""
+Pipeline - Orchestrateur asynchrone des étapes de prévision par produit
+Chaque produit suit un petit DAG d'étapes : prévision (fit + predict) sur un
+pool de processus, puis graphiques (pool de rendu séparé) et export CSV
+(threads d'E/S) en parallèle, enfin le résumé JSON du produit. Les étapes
+de produits différents se chevauchent : les cœurs de fit travaillent
+pendant que les PNG sont encodés et que les fichiers sont écrits.
+
+- contre-pression : une file bornée limite les produits en cours (séries,
+  prévisions et graphiques en mémoire) ; si le rendu ou le disque prend
+  du retard, les produits suivants attendent avant d'être entraînés
+- reprises : une étape en échec est relancée (délai doublé à chaque
+  tentative) ; après la dernière, les étapes qui en dépendent sont annulées
+- annulation : Ctrl+C (ou Orchestrator.cancel) arrête l'admission de
+  nouveaux produits et annule les étapes en attente ; les produits déjà
+  terminés gardent leurs fichiers
+
+Usage:
+    python pipeline.py --produits all --workers 6 --workers-rendu 2
+    python cli.py pipeline --produits all --preset ecran --en-cours 8
+"""
+
+import asyncio
+import contextvars
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from defaults import REPRISES, WORKERS_IO, WORKERS_RENDU
+from forecasting import ECHANTILLONS_INCERTITUDE, forecast_product, init_worker
+from instrumentation import Instrumentation
+
+
+# Exécuteurs des étapes
+#   fit   : pool de processus (Prophet, CPU)
+#   rendu : pool de processus séparé (pyplot n'est pas thread-safe)
+#   io    : threads (écriture des fichiers, cache des graphiques)
+EXECUTEURS = ("fit", "rendu", "io")
+
+# Étape du pipeline -> étape instrumentée (instrumentation.ETAPES) ; la
+# prévision renvoie ses propres mesures (agregation, fit, predict…)
+ETAPES_INSTRUMENTATION = {"graphiques": "graphiques", "csv": "export", "json": "export"}
+
+# Délai avant une reprise (REPRISES), doublé à chaque tentative
+DELAI_REPRISE_S = 0.5
+
+# Produits en cours par worker de fit (file bornée : contre-pression)
+EN_COURS_PAR_WORKER = 2
+
+# Mesure de l'étape en cours : cumule le temps passé sur les exécuteurs
+# (les tâches créées par une étape coroutine héritent du même contexte)
+_MESURE_ETAPE = contextvars.ContextVar("mesure_etape", default=None)
+
+
+def _timed(func, *args):
+    """
+    Exécute func dans un exécuteur et renvoie (résultat, durée d'exécution,
+    temps CPU du thread qui l'a exécuté)
+    """
+    start, cpu = time.perf_counter(), time.thread_time()
+    value = func(*args)
+    return value, time.perf_counter() - start, time.thread_time() - cpu
+
+
+def _init_process(initializer, initargs):
+    """
+    Initializer des pools de processus : Ctrl+C n'interrompt que le
+    processus principal, qui annule proprement l'exécution
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+class Stage:
+    """
+    Étape du DAG d'un produit
+
+    Une fonction `func(produit, contexte, entrees)` s'exécute sur
+    l'exécuteur de l'étape (elle doit être sérialisable pour un pool de
+    processus) ; une coroutine `func(orchestrator, produit, contexte,
+    entrees)` s'exécute dans la boucle et répartit elle-même son travail
+    avec orchestrator.submit. `entrees` contient les résultats des
+    dépendances.
+    """
+
+    def __init__(self, name, func, deps=(), executor="io", reprises=REPRISES):
+        """
+        Args:
+            name: Nom de l'étape
+            func: Fonction ou coroutine de l'étape
+            deps: Étapes dont les résultats sont nécessaires
+            executor: fit, rendu ou io (voir EXECUTEURS)
+            reprises: Nouvelles tentatives après un échec
+        """
+        if executor not in EXECUTEURS:
+            raise ValueError(f"Exécuteur inconnu : {executor} ({', '.join(EXECUTEURS)})")
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.executor = executor
+        self.reprises = reprises
+
+    def __repr__(self):
+        deps = f" ← {', '.join(self.deps)}" if self.deps else ""
+        return f"Stage({self.name} [{self.executor}]{deps})"
+
+
+def topological_order(stages):
+    """
+    Noms des étapes dans un ordre compatible avec leurs dépendances
+
+    Raises:
+        ValueError: Dépendance inconnue ou cycle
+    """
+    by_name = {stage.name: stage for stage in stages}
+    ordre, visiting = [], set()
+
+    def visit(name, chemin):
+        if name in ordre:
+            return
+        if name not in by_name:
+            raise ValueError(f"Dépendance inconnue : {name} ({' → '.join(chemin)})")
+        if name in visiting:
+            raise ValueError(f"Cycle entre les étapes : {' → '.join(chemin + [name])}")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep, chemin + [name])
+        visiting.discard(name)
+        ordre.append(name)
+
+    for stage in stages:
+        visit(stage.name, [])
+    return ordre
+
+
+class Orchestrator:
+    """
+    Exécute le DAG d'étapes de chaque produit, les produits se chevauchant
+
+    Les produits sont admis par une file bornée : au plus `en_cours`
+    produits sont traités en même temps, les suivants attendent (le
+    générateur des produits n'est consommé qu'au fil de l'admission).
+    """
+
+    def __init__(self, stages, fit_workers=None, render_workers=WORKERS_RENDU,
+                 io_workers=WORKERS_IO, en_cours=None, initializers=None,
+                 delai_reprise=DELAI_REPRISE_S, verbose=True):
+        """
+        Args:
+            stages: Étapes (Stage) du DAG de chaque produit
+            fit_workers: Processus du pool de fit (défaut : CPU moins les
+                workers de rendu)
+            render_workers: Processus du pool de rendu
+            io_workers: Threads d'E/S
+            en_cours: Produits traités en même temps (défaut :
+                EN_COURS_PAR_WORKER par worker de fit)
+            initializers: {exécuteur: (initializer, initargs)} des pools de
+                processus
+            delai_reprise: Délai avant la première reprise (s)
+            verbose: Afficher chaque produit terminé
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.ordre = topological_order(stages)
+        fit_workers = fit_workers or max((os.cpu_count() or 1) - render_workers, 1)
+        self.workers = {"fit": fit_workers, "rendu": render_workers, "io": io_workers}
+        self.en_cours = en_cours or EN_COURS_PAR_WORKER * fit_workers
+        self.initializers = initializers or {}
+        self.delai_reprise = delai_reprise
+        self.verbose = verbose
+        self.duree_s = None
+        self.annule = False
+        self._pools = {}
+        self._loop = None
+        self._cancel = None
+
+    def run(self, items):
+        """
+        Traite les produits
+
+        Args:
+            items: Itérable de (produit, contexte) ; un générateur ne
+                construit le contexte d'un produit qu'à son admission
+
+        Returns:
+            dict: {produit: {statut, etapes: {nom: {statut, tentatives,
+            duree_s, cpu_s, attente_s, erreur}}, resultats: {nom: valeur}}}
+        """
+        return asyncio.run(self._run(items))
+
+    def cancel(self):
+        """Annule l'exécution (appelable depuis un autre thread)"""
+        if self._loop is not None and self._cancel is not None:
+            self._loop.call_soon_threadsafe(self._cancel.set)
+
+    async def submit(self, executor, func, *args):
+        """
+        Exécute func(*args) sur un exécuteur (fit, rendu ou io) ; la durée
+        d'exécution est ajoutée à celle de l'étape en cours
+        """
+        value, duree, cpu = await self._loop.run_in_executor(self._pools[executor], _timed,
+                                                             func, *args)
+        mesure = _MESURE_ETAPE.get()
+        if mesure is not None:
+            mesure["execution"] += duree
+            mesure["cpu"] += cpu
+        return value
+
+    def _make_pools(self):
+        pools = {}
+        for executor in {stage.executor for stage in self.stages.values()} | {"io"}:
+            if executor == "io":
+                pools[executor] = ThreadPoolExecutor(max_workers=self.workers["io"],
+                                                     thread_name_prefix="pipeline-io")
+                continue
+            initializer, initargs = self.initializers.get(executor, (None, ()))
+            pools[executor] = ProcessPoolExecutor(max_workers=self.workers[executor],
+                                                  initializer=_init_process,
+                                                  initargs=(initializer, initargs))
+        return pools
+
+    async def _run(self, items):
+        self._loop = asyncio.get_running_loop()
+        self._cancel = asyncio.Event()
+        try:
+            self._loop.add_signal_handler(signal.SIGINT, self.cancel)
+            signal_handler = True
+        except (NotImplementedError, RuntimeError, ValueError):
+            signal_handler = False   # Windows, ou boucle hors du thread principal
+
+        start = time.perf_counter()
+        results = {}
+        queue = asyncio.Queue(maxsize=self.en_cours)
+        self._pools = self._make_pools()
+        try:
+            tasks = [asyncio.create_task(self._produce(items, queue))]
+            tasks += [asyncio.create_task(self._consume(queue, results))
+                      for _ in range(self.en_cours)]
+            travail = asyncio.gather(*tasks)
+            annulation = asyncio.create_task(self._cancel.wait())
+            await asyncio.wait([travail, annulation], return_when=asyncio.FIRST_COMPLETED)
+
+            if self._cancel.is_set():
+                self.annule = True
+                print("🛑 Annulation : plus aucun produit admis, étapes en attente annulées")
+                for task in tasks:
+                    task.cancel()
+            else:
+                annulation.cancel()
+            outcome = await asyncio.gather(travail, return_exceptions=True)
+            if isinstance(outcome[0], Exception):
+                raise outcome[0]
+        finally:
+            if signal_handler:
+                self._loop.remove_signal_handler(signal.SIGINT)
+            for pool in self._pools.values():
+                pool.shutdown(wait=True, cancel_futures=True)
+            self.duree_s = time.perf_counter() - start
+        return results
+
+    async def _produce(self, items, queue):
+        for item in items:
+            await queue.put(item)
+        for _ in range(self.en_cours):
+            await queue.put(None)
+
+    async def _consume(self, queue, results):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            produit, contexte = item
+            etat = results[produit] = {"statut": "en_cours", "etapes": {}, "resultats": {}}
+            await self._run_product(produit, contexte, etat)
+            if self.verbose:
+                self._print_product(produit, etat)
+
+    async def _run_product(self, produit, contexte, etat):
+        tasks = {}
+        for name in self.ordre:
+            stage = self.stages[name]
+            tasks[name] = asyncio.create_task(
+                self._run_stage(stage, produit, contexte, etat, [tasks[d] for d in stage.deps])
+            )
+        try:
+            await asyncio.gather(*tasks.values())
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            for name in self.ordre:
+                info = etat["etapes"].setdefault(name, {"tentatives": 0})
+                if info.get("statut") not in ("ok", "erreur"):
+                    info["statut"] = "annule"
+            etat["statut"] = "annule"
+            raise
+
+        statuts = {info["statut"] for info in etat["etapes"].values()}
+        etat["statut"] = "ok" if statuts == {"ok"} else "erreur"
+
+    async def _run_stage(self, stage, produit, contexte, etat, deps):
+        info = etat["etapes"][stage.name] = {"statut": "en_attente", "tentatives": 0}
+        if not all(await asyncio.gather(*deps)):
+            info["statut"] = "annule"
+            info["erreur"] = "dépendance en échec"
+            return False
+
+        entrees = {dep: etat["resultats"][dep] for dep in stage.deps}
+        start = time.perf_counter()
+        mesure = {"execution": 0.0, "cpu": 0.0}
+        _MESURE_ETAPE.set(mesure)   # Contexte propre à la tâche de l'étape
+        for tentative in range(stage.reprises + 1):
+            info["tentatives"] = tentative + 1
+            try:
+                if asyncio.iscoroutinefunction(stage.func):
+                    value = await stage.func(self, produit, contexte, entrees)
+                else:
+                    value = await self.submit(stage.executor, stage.func,
+                                              produit, contexte, entrees)
+            except BrokenProcessPool as e:
+                # Pool inutilisable (worker tué) : une reprise échouerait aussi
+                info["erreur"] = f"{type(e).__name__}: {e}"
+                break
+            except Exception as e:
+                info["erreur"] = f"{type(e).__name__}: {e}"
+                if tentative < stage.reprises:
+                    await asyncio.sleep(self.delai_reprise * 2 ** tentative)
+                continue
+            etat["resultats"][stage.name] = value
+            info["statut"] = "ok"
+            info.pop("erreur", None)
+            break
+
+        if info["statut"] != "ok":
+            info["statut"] = "erreur"
+        # Attente : file des exécuteurs et délais de reprise (nulle si les
+        # tâches d'une coroutine ont tourné en parallèle)
+        info["duree_s"] = round(mesure["execution"], 3)
+        info["cpu_s"] = round(mesure["cpu"], 3)
+        info["attente_s"] = round(max(time.perf_counter() - start - mesure["execution"], 0.0), 3)
+        return info["statut"] == "ok"
+
+    def _print_product(self, produit, etat):
+        if etat["statut"] == "ok":
+            durees = "  ".join(f"{name} {info['duree_s']:.1f}s"
+                               for name, info in etat["etapes"].items())
+            print(f"   ✅ {produit:25s} {durees}")
+            return
+        for name, info in etat["etapes"].items():
+            if info["statut"] == "erreur":
+                print(f"   ❌ {produit:25s} {name} ({info['tentatives']} tentative(s)) : "
+                      f"{info.get('erreur')}")
+
+    def stage_totals(self, results):
+        """
+        Durées cumulées par étape sur tous les produits
+
+        `chevauchement` : somme des durées d'exécution (temps passé sur les
+        exécuteurs) rapportée à la durée totale (1 = étapes exécutées l'une
+        après l'autre)
+
+        Returns:
+            dict: {etape: {appels, duree_s, attente_s, erreurs, reprises},
+            chevauchement}
+        """
+        totals = {name: {"appels": 0, "duree_s": 0.0, "attente_s": 0.0, "erreurs": 0,
+                         "reprises": 0} for name in self.ordre}
+        for etat in results.values():
+            for name, info in etat["etapes"].items():
+                total = totals[name]
+                if "duree_s" in info:
+                    total["appels"] += 1
+                    total["duree_s"] += info["duree_s"]
+                    total["attente_s"] += info["attente_s"]
+                total["erreurs"] += info["statut"] == "erreur"
+                total["reprises"] += max(info["tentatives"] - 1, 0)
+        for total in totals.values():
+            total["duree_s"] = round(total["duree_s"], 3)
+            total["attente_s"] = round(total["attente_s"], 3)
+        execution = sum(total["duree_s"] for total in totals.values())
+        return {
+            "etapes": totals,
+            "chevauchement": round(execution / self.duree_s, 2) if self.duree_s else None,
+        }
+
+
+# ----------------------------------------------------------------------
+# Étapes de prévision d'un produit
+# ----------------------------------------------------------------------
+
+def _file_stem(produit):
+    return produit.replace(" ", "_")
+
+
+def forecast_stage(produit, contexte, entrees):
+    """
+    Fit et predict dans un worker du pool de fit : le modèle reste dans le
+    worker, seuls l'export, les métriques et les données des graphiques
+    sont renvoyés
+    """
+    from plot_report import payload_from_prophet
+
+    instr = Instrumentation.for_worker(contexte.get("profiling"), produit)
+    result = forecast_product(contexte["prophet_df"], produit, horizon=contexte["horizon"],
+                              store=contexte.get("store"), instr=instr,
+                              config=contexte.get("config"),
+                              intervalles=contexte.get("intervalles", "prophet"),
+                              echantillons=contexte.get("echantillons", ECHANTILLONS_INCERTITUDE))
+    return {
+        "predictions": result["predictions"],
+        "metrics": result["metrics"],
+        "durees": result["durees"],
+        "cache": result["cache"]["final"],
+        "etapes": result["etapes"],
+        "payload": payload_from_prophet(result["model"], result["forecast"], produit),
+    }
+
+
+async def graphs_stage(orchestrator, produit, contexte, entrees):
+    """
+    Graphiques du produit : cache et fichiers sur les threads d'E/S, rendu
+    sur le pool de rendu
+    """
+    from plot_report import place_figures, plan_figures, render_figure
+
+    payload = entrees["prevision"]["payload"]
+    fichiers, jobs, reused = await orchestrator.submit(
+        "io", plan_figures, payload, contexte["graphs_dir"], None, contexte["preset"],
+        contexte.get("cache_dir")
+    )
+    await asyncio.gather(*(
+        orchestrator.submit("rendu", render_figure, kind, payload, cached or dest,
+                            contexte["preset"])
+        for kind, payload, dest, cached in jobs
+    ))
+    await orchestrator.submit("io", place_figures, jobs)
+    return {"fichiers": [str(path) for path in fichiers], "rendus": len(jobs), "caches": reused}
+
+
+def csv_stage(produit, contexte, entrees):
+    """Export CSV des prédictions du produit (même nom que le rapport enrichi)"""
+    filename = f'predictions_{_file_stem(produit)}_enrichi_{contexte["horizon"]}j.csv'
+    path = Path(contexte["output_dir"]) / filename
+    entrees["prevision"]["predictions"].to_csv(path, index=False)
+    return str(path)
+
+
+def json_stage(produit, contexte, entrees):
+    """Résumé JSON du produit : métriques, prédictions et fichiers produits"""
+    import json
+    from datetime import datetime
+
+    prevision = entrees["prevision"]
+    predictions = prevision["predictions"]
+    summary = {
+        "produit": produit,
+        "date_analyse": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "performance_modele": {key: round(value, 2) for key, value in prevision["metrics"].items()},
+        "durees_entrainement_s": {"evaluation": round(prevision["durees"]["fit_evaluation_s"], 2),
+                                  "final": round(prevision["durees"]["fit_final_s"], 2),
+                                  "cache": prevision["cache"]},
+        "predictions": {
+            "horizon": f"{contexte['horizon']} jours",
+            "total_prevu": round(float(predictions['quantite_prevue'].sum()), 2),
+            "moyenne_jour": round(float(predictions['quantite_prevue'].mean()), 2),
+        },
+        "fichiers": {"csv": Path(entrees["csv"]).name,
+                     "graphiques": [Path(p).name
+                                    for p in entrees.get("graphiques", {}).get("fichiers", [])]},
+        "etapes": prevision["etapes"],
+    }
+    path = Path(contexte["output_dir"]) / f'summary_{_file_stem(produit)}_enrichi.json'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return str(path)
+
+
+def forecast_stages(graphiques=True, reprises=REPRISES):
+    """
+    DAG d'un produit : prevision → (graphiques, csv) → json
+
+    Args:
+        graphiques: Inclure le rendu des graphiques
+        reprises: Nouvelles tentatives des étapes d'E/S et de rendu (le fit
+            n'est retenté qu'une fois : un échec y est rarement transitoire)
+    """
+    stages = [Stage("prevision", forecast_stage, executor="fit", reprises=min(reprises, 1)),
+              Stage("csv", csv_stage, deps=["prevision"], reprises=reprises)]
+    if graphiques:
+        stages.append(Stage("graphiques", graphs_stage, deps=["prevision"], executor="rendu",
+                            reprises=reprises))
+    stages.append(Stage("json", json_stage,
+                        deps=["prevision", "csv"] + (["graphiques"] if graphiques else []),
+                        reprises=reprises))
+    return stages
+
+
+def main(args):
+    """
+    Pipeline asynchrone en ligne de commande (voir cli.add_pipeline_arguments)
+    """
+    import json
+    from datetime import datetime
+
+    import pandas as pd
+
+    from batch_forecast import _scenario_label, resolve_products
+    from demand_matrix import load_demand_matrix
+    from holiday_calendar import calendar_for
+    from instrumentation import stage_regressions
+    from plot_report import prune_cache, use_headless_backend
+    from regressor_projection import projection_for
+
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+    except ImportError:
+        results_mgr = None
+
+    run_dir = results_mgr.get_run_path() if results_mgr is not None else Path(".")
+    instr = Instrumentation(args.profil, args.trace_memoire, output_dir=run_dir)
+
+    with instr.stage("agregation") as m:
+        demand = load_demand_matrix(args.csv, chunksize=args.chunksize)
+        m["lignes"] = int(demand.nb_sorties.sum())
+    produits = resolve_products(demand, args.produits)
+
+    store = None
+    if results_mgr is not None and not args.no_cache:
+        from model_store import ModelStore
+        store = ModelStore.from_results_manager(results_mgr)
+
+    with instr.stage("holidays"):
+        calendar = calendar_for(demand, fenetres=dict(args.fenetre or []))
+    print(f"📅 {calendar}")
+    with instr.stage("projection"):
+        projection = projection_for(demand, args.horizon)
+        if args.scenario:
+            projection = projection.with_scenario(args.scenario)
+    print(f"🌡️  {projection}")
+
+    graphs_dir = run_dir / "graphs"
+    graphs_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = results_mgr.get_store_dir("plots") if results_mgr is not None else None
+    options = {
+        "horizon": args.horizon,
+        "store": store,
+        "intervalles": args.intervalles,
+        "echantillons": args.echantillons,
+        "preset": args.preset,
+        "output_dir": str(run_dir),
+        "graphs_dir": str(graphs_dir),
+        "cache_dir": str(cache_dir) if cache_dir is not None else None,
+        "profiling": instr.worker_options(),
+    }
+
+    orchestrator = Orchestrator(
+        forecast_stages(graphiques=not args.sans_graphiques, reprises=args.reprises),
+        fit_workers=args.workers, render_workers=args.workers_rendu, io_workers=args.workers_io,
+        en_cours=args.en_cours,
+        initializers={"fit": (init_worker, (calendar, projection)),
+                      "rendu": (use_headless_backend, ())},
+    )
+    print(f"🚀 {len(produits)} produit(s) : {orchestrator.workers['fit']} worker(s) de fit, "
+          f"{orchestrator.workers['rendu']} de rendu, {orchestrator.workers['io']} thread(s) d'E/S, "
+          f"{orchestrator.en_cours} produit(s) en cours au plus")
+
+    # Séries construites au fil de l'admission des produits
+    items = ((p, {**options, "prophet_df": demand.prophet_frame(p)}) for p in produits)
+    results = orchestrator.run(items)
+    if cache_dir is not None:
+        prune_cache(cache_dir)
+
+    for etat in results.values():
+        prevision = etat["resultats"].get("prevision")
+        if prevision is not None:
+            instr.merge(prevision["etapes"])
+        for name, info in etat["etapes"].items():
+            if name in ETAPES_INSTRUMENTATION and "duree_s" in info:
+                instr.record(ETAPES_INSTRUMENTATION[name],
+                             {"duree_s": info["duree_s"], "cpu_s": info["cpu_s"]})
+    totals = orchestrator.stage_totals(results)
+    print(f"\n⏱️  {len(results)} produit(s) en {orchestrator.duree_s:.1f}s "
+          f"(chevauchement des étapes ×{totals['chevauchement']})")
+
+    rows = []
+    for produit, etat in sorted(results.items()):
+        prevision = etat["resultats"].get("prevision") or {}
+        erreurs = {name: info["erreur"] for name, info in etat["etapes"].items() if "erreur" in info}
+        rows.append({"produit": produit, "statut": etat["statut"], **prevision.get("metrics", {}),
+                     "cache": prevision.get("cache", False),
+                     **{f"{name}_s": info.get("duree_s") for name, info in etat["etapes"].items()},
+                     "erreur": "; ".join(f"{k}: {v}" for k, v in erreurs.items()) or None})
+    metrics_df = pd.DataFrame(rows)
+
+    label = f"Pipeline ({len(produits)} produits)"
+    etapes = instr.as_dict()
+    instr.print_summary()
+    summary = {
+        "date_analyse": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "horizon": f"{args.horizon} jours",
+        "duree_totale_s": round(orchestrator.duree_s, 2),
+        "annule": orchestrator.annule,
+        "pipeline": totals,
+        "etapes": etapes,
+        "scenario": args.scenario or [],
+        "produits": json.loads(metrics_df.round(2).to_json(orient='records', force_ascii=False)),
+    }
+    if results_mgr is not None:
+        summary["alertes_etapes"] = stage_regressions(results_mgr, label, etapes)
+    filename_json = run_dir / 'summary_pipeline.json'
+    with open(filename_json, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"✅ {filename_json}")
+
+    if results_mgr is not None:
+        ok = metrics_df['statut'] == 'ok'
+        results_mgr.create_summary_file(label, {
+            "Produits OK": int(ok.sum()),
+            "Produits en erreur": int((metrics_df['statut'] == 'erreur').sum()),
+            "Annulé": "oui" if orchestrator.annule else "non",
+            "MAPE médian": f"{metrics_df.loc[ok, 'MAPE'].median():.2f}%" if 'MAPE' in metrics_df else "N/A",
+            "Durée": f"{orchestrator.duree_s:.1f}s",
+            "Chevauchement des étapes": f"×{totals['chevauchement']}",
+            "Scénario": _scenario_label(args.scenario),
+            "etapes": etapes,
+        })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_pipeline_arguments
+
+    parser = argparse.ArgumentParser(description="Pipeline asynchrone de prévision multi-produits")
+    add_pipeline_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,373 @@
+"""
+Plot Report - Rendu des graphiques en parallèle, sans affichage
+Les graphiques sont décrits par des DataFrames légers (historique, prévision,
+composantes, changepoints) et rendus avec le backend Agg sur un pool de
+processus. Un graphique dont les données et le preset n'ont pas changé
+depuis la dernière exécution est repris du cache au lieu d'être redessiné.
+
+Usage:
+    from plot_report import payload_from_prophet, render_reports
+    render_reports([payload_from_prophet(model, forecast, "Poulet frais")],
+                   results_mgr=results_mgr, preset="ecran")
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from defaults import PRESETS
+from model_store import frame_digest
+
+
+# Version du rendu : à incrémenter quand l'apparence des graphiques change
+RENDER_VERSION = 1
+
+GRAPHIQUES = ("predictions", "components", "changepoints")
+
+# Nombre maximum de graphiques gardés dans le cache (results/_plots)
+MAX_CACHE = 5000
+
+# Décimales des données prises en compte dans la clé du cache (bien en
+# dessous de ce qu'un graphique peut montrer)
+DECIMALES_CLE = 6
+
+# Variation de pente en dessous de laquelle un changepoint n'est pas tracé
+# (même seuil que prophet.plot.add_changepoints_to_plot)
+SEUIL_CHANGEPOINT = 0.01
+
+JOURS_SEMAINE = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+
+
+def use_headless_backend():
+    """Force le backend non interactif Agg (initializer des workers de rendu)"""
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+# ----------------------------------------------------------------------
+# Données des graphiques
+# ----------------------------------------------------------------------
+
+def payload_from_prophet(model, forecast, produit):
+    """
+    Données nécessaires aux trois graphiques d'un modèle Prophet entraîné
+
+    Args:
+        model: Modèle Prophet entraîné
+        forecast: Résultat de model.predict (historique + futur)
+        produit: Nom du produit
+
+    Returns:
+        dict: produit, history (ds, y), forecast, changepoints (ds, delta)
+    """
+    colonnes = ['ds', 'yhat', 'yhat_lower', 'yhat_upper', 'trend', 'weekly', 'yearly',
+                'holidays', 'extra_regressors_multiplicative', 'extra_regressors_additive']
+    changepoints = pd.DataFrame({'ds': pd.to_datetime(model.changepoints)})
+    if len(changepoints):
+        changepoints['delta'] = model.params['delta'].mean(axis=0)[:len(changepoints)]
+
+    return {
+        "produit": produit,
+        "history": model.history[['ds', 'y']].reset_index(drop=True),
+        "forecast": forecast[[c for c in colonnes if c in forecast.columns]].reset_index(drop=True),
+        "changepoints": changepoints,
+    }
+
+
+def payloads_from_predictions(demand, predictions, history_days=90):
+    """
+    Données du graphique de prédictions pour chaque produit d'un export
+    (batch Prophet ou baseline) : historique récent + prévision
+
+    Args:
+        demand: DemandMatrix
+        predictions: Export (date, quantite_prevue, quantite_min, quantite_max, produit)
+        history_days: Nombre de jours d'historique affichés
+
+    Returns:
+        list: Un payload par produit
+    """
+    payloads = []
+    for produit, prev in predictions.groupby('produit', sort=True):
+        history = demand.prophet_frame(produit)[['ds', 'y']].tail(history_days)
+        forecast = pd.DataFrame({
+            'ds': pd.to_datetime(prev['date']).to_numpy(),
+            'yhat': prev['quantite_prevue'].to_numpy(),
+            'yhat_lower': prev['quantite_min'].to_numpy(),
+            'yhat_upper': prev['quantite_max'].to_numpy(),
+        })
+        payloads.append({
+            "produit": produit,
+            "history": history.reset_index(drop=True),
+            "forecast": forecast,
+        })
+    return payloads
+
+
+def available_kinds(payload):
+    """Graphiques réalisables avec les données d'un payload"""
+    kinds = ["predictions"]
+    if 'trend' in payload["forecast"].columns:
+        kinds.append("components")
+        if payload.get("changepoints") is not None:
+            kinds.append("changepoints")
+    return kinds
+
+
+def figure_filename(kind, produit, preset="impression"):
+    """Nom du fichier d'un graphique (même convention que le script enrichi)"""
+    return f'{kind}_{produit.replace(" ", "_")}_enrichi.{PRESETS[preset]["format"]}'
+
+
+def _normalized(frame):
+    """
+    Données normalisées pour la clé du cache : un modèle rechargé du cache
+    de modèles (paramètres relus en JSON) prédit les mêmes valeurs aux
+    derniers bits près, et ses dates peuvent avoir une autre résolution
+    (datetime64[s] ou [us]) ; ni l'un ni l'autre ne change la clé
+    """
+    normalized = frame.copy()
+    floats = normalized.select_dtypes('float').columns
+    normalized[floats] = normalized[floats].round(DECIMALES_CLE) + 0.0   # -0.0 -> 0.0
+    for col in normalized.select_dtypes('datetime').columns:
+        normalized[col] = normalized[col].astype('datetime64[ns]')
+    return normalized
+
+
+def figure_key(kind, payload, preset):
+    """Clé du cache : données du graphique (normalisées), type, preset et version du rendu"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([RENDER_VERSION, kind, preset, PRESETS[preset],
+                              payload["produit"]]).encode())
+    for name in ("history", "forecast", "changepoints"):
+        frame = payload.get(name)
+        digest.update(frame_digest(_normalized(frame)).encode() if frame is not None else b'-')
+    return digest.hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Rendu (exécuté dans les workers)
+# ----------------------------------------------------------------------
+
+def _plot_forecast(ax, payload):
+    history, forecast = payload["history"], payload["forecast"]
+    ax.plot(history['ds'], history['y'], 'k.', markersize=3, label='Historique')
+    ax.plot(forecast['ds'], forecast['yhat'], color='#0072B2', linewidth=1.5, label='Prévision')
+    if 'yhat_lower' in forecast:
+        ax.fill_between(forecast['ds'], forecast['yhat_lower'], forecast['yhat_upper'],
+                        color='#0072B2', alpha=0.2, label='Intervalle de confiance')
+    ax.axvline(history['ds'].max(), color='green', linestyle='--', linewidth=1.5, alpha=0.7)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Consommation')
+    ax.grid(True, alpha=0.3)
+
+
+def _render_predictions(plt, payload):
+    fig, ax = plt.subplots(figsize=(16, 8))
+    _plot_forecast(ax, payload)
+    ax.set_title(f'Prédictions - {payload["produit"]}', fontsize=14, fontweight='bold')
+    ax.legend(loc='upper left')
+    return fig
+
+
+def _render_changepoints(plt, payload):
+    fig, ax = plt.subplots(figsize=(16, 8))
+    _plot_forecast(ax, payload)
+    forecast = payload["forecast"]
+    ax.plot(forecast['ds'], forecast['trend'], color='red', linewidth=1.5, label='Tendance')
+
+    changepoints = payload["changepoints"]
+    if len(changepoints):
+        significatifs = changepoints[changepoints['delta'].abs() >= SEUIL_CHANGEPOINT]
+        for ds in significatifs['ds']:
+            ax.axvline(ds, color='red', linestyle='--', linewidth=1, alpha=0.6)
+    ax.set_title(f'Changepoints - {payload["produit"]}', fontsize=14, fontweight='bold')
+    ax.legend(loc='upper left')
+    return fig
+
+
+def _render_components(plt, payload):
+    forecast = payload["forecast"]
+    panels = ['trend']
+    for col in ('holidays', 'weekly', 'yearly', 'extra_regressors_multiplicative',
+                'extra_regressors_additive'):
+        if col in forecast.columns and forecast[col].abs().sum() > 0:
+            panels.append(col)
+
+    fig, axes = plt.subplots(len(panels), 1, figsize=(12, 3 * len(panels)), squeeze=False)
+    for ax, col in zip(axes[:, 0], panels):
+        if col == 'weekly':
+            profil = forecast.groupby(forecast['ds'].dt.dayofweek)[col].mean()
+            ax.plot(profil.index, profil.values, color='#0072B2', marker='o')
+            ax.set_xticks(range(7))
+            ax.set_xticklabels(JOURS_SEMAINE)
+        elif col == 'yearly':
+            profil = forecast.groupby(forecast['ds'].dt.dayofyear)[col].mean()
+            ax.plot(profil.index, profil.values, color='#0072B2')
+            ax.set_xlabel('Jour de l\'année')
+        else:
+            ax.plot(forecast['ds'], forecast[col], color='#0072B2')
+        ax.set_ylabel(col)
+        ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+_RENDERERS = {
+    "predictions": _render_predictions,
+    "components": _render_components,
+    "changepoints": _render_changepoints,
+}
+
+
+def render_figure(kind, payload, path, preset="impression"):
+    """
+    Rend un graphique dans un fichier
+
+    Args:
+        kind: predictions, components ou changepoints
+        payload: Données du graphique (voir payload_from_prophet)
+        path: Fichier de sortie
+        preset: Voir PRESETS
+
+    Returns:
+        float: Durée du rendu en secondes
+    """
+    start = time.perf_counter()
+    use_headless_backend()
+    import matplotlib.pyplot as plt
+
+    options = PRESETS[preset]
+    fig = _RENDERERS[kind](plt, payload)
+
+    # Écriture atomique : un rendu interrompu ne laisse pas de fichier tronqué
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    fig.savefig(tmp_path, dpi=options["dpi"], format=options["format"], bbox_inches='tight')
+    plt.close(fig)
+    os.replace(tmp_path, path)
+    return time.perf_counter() - start
+
+
+# ----------------------------------------------------------------------
+# Étape de rapport
+# ----------------------------------------------------------------------
+
+def _link_or_copy(source, dest):
+    """Place un graphique du cache dans le dossier de sortie (lien dur si possible)"""
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
+
+def prune_cache(cache_dir, max_files=MAX_CACHE):
+    """Supprime les graphiques les moins récemment utilisés au-delà de max_files"""
+    files = sorted(Path(cache_dir).glob("*.*"), key=lambda p: p.stat().st_mtime)
+    for path in files[:max(len(files) - max_files, 0)]:
+        path.unlink(missing_ok=True)
+
+
+def plan_figures(payload, output_dir, kinds=None, preset="impression", cache_dir=None):
+    """
+    Graphiques d'un produit : repris du cache (placés tout de suite dans
+    output_dir) ou à rendre
+
+    Returns:
+        tuple: (fichiers de sortie, rendus à faire [(kind, payload, dest,
+        fichier du cache ou None)], nombre repris du cache)
+    """
+    fichiers, jobs, reused = [], [], 0
+    for kind in kinds or available_kinds(payload):
+        if kind not in available_kinds(payload):
+            continue
+        dest = Path(output_dir) / figure_filename(kind, payload["produit"], preset)
+        fichiers.append(dest)
+        if cache_dir is None:
+            jobs.append((kind, payload, dest, None))
+            continue
+
+        cached = Path(cache_dir) / f"{figure_key(kind, payload, preset)}.{PRESETS[preset]['format']}"
+        if cached.exists():
+            os.utime(cached)  # LRU
+            _link_or_copy(cached, dest)
+            reused += 1
+        else:
+            jobs.append((kind, payload, dest, cached))
+    return fichiers, jobs, reused
+
+
+def place_figures(jobs):
+    """Place dans le dossier de sortie les graphiques rendus dans le cache"""
+    for _, _, dest, cached in jobs:
+        if cached is not None:
+            _link_or_copy(cached, dest)
+
+
+def render_reports(payloads, output_dir=None, results_mgr=None, kinds=None,
+                   preset="impression", n_workers=None, cache_dir=None, verbose=True):
+    """
+    Rend les graphiques de plusieurs produits en parallèle
+
+    Args:
+        payloads: Données des graphiques (un dict par produit)
+        output_dir: Dossier de sortie (défaut : graphs/ de l'exécution, ou
+            répertoire courant sans Results Manager)
+        results_mgr: ResultsManager de l'exécution (optionnel)
+        kinds: Graphiques à produire (défaut : tous ceux réalisables)
+        preset: miniature, ecran, svg ou impression (300 dpi)
+        n_workers: Nombre de processus (défaut : nombre de CPU)
+        cache_dir: Cache des rendus (défaut : results/_plots)
+        verbose: Afficher la progression
+
+    Returns:
+        dict: fichiers (chemins créés), rendus, repris du cache, durée
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Preset inconnu : {preset} ({', '.join(PRESETS)})")
+    if cache_dir is None and results_mgr is not None:
+        cache_dir = results_mgr.get_store_dir("plots")
+    if output_dir is None:
+        output_dir = results_mgr.get_run_path() / "graphs" if results_mgr is not None else Path('.')
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    fichiers, jobs, reused = [], [], 0
+    for payload in payloads:
+        planned = plan_figures(payload, output_dir, kinds, preset, cache_dir)
+        fichiers += planned[0]
+        jobs += planned[1]
+        reused += planned[2]
+
+    n_workers = min(n_workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if verbose:
+        print(f"🎨 {len(jobs)} graphique(s) à rendre ({preset}, {n_workers} worker(s)), "
+              f"{reused} repris du cache")
+
+    targets = [cached or dest for _, _, dest, cached in jobs]
+    if n_workers <= 1:
+        for (kind, payload, _, _), target in zip(jobs, targets):
+            render_figure(kind, payload, target, preset)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=use_headless_backend) as pool:
+            futures = [pool.submit(render_figure, kind, payload, target, preset)
+                       for (kind, payload, _, _), target in zip(jobs, targets)]
+            for future in futures:
+                future.result()
+
+    place_figures(jobs)
+    if cache_dir is not None:
+        prune_cache(cache_dir)
+
+    duree = time.perf_counter() - start
+    if verbose:
+        print(f"✅ {len(fichiers)} graphique(s) dans {output_dir} ({duree:.1f}s)")
+    return {"fichiers": fichiers, "rendus": len(jobs), "caches": reused, "duree_s": duree}
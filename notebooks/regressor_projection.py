@@ -0,0 +1,283 @@
+"""
+Regressor Projection - Projection des régresseurs exogènes sur l'horizon
+Les régresseurs (température, occupation, patients, épidémie de grippe)
+sont ceux du site : ils sont projetés une seule fois pour tous les produits
+par des modèles saisonniers rapides, au lieu d'être remplis par la moyenne
+historique dans chaque fit.
+
+- temperature, epidemie_grippe : climatologie par jour de l'année (moyenne
+  des années passées, lissée), plus l'écart des derniers jours à cette
+  climatologie, qui s'estompe avec l'horizon
+- taux_occupation, nb_patients : profil hebdomadaire des dernières semaines
+
+Un scénario ("épidémie de grippe la semaine prochaine") remplace les
+valeurs projetées ; les modèles déjà entraînés (cache de modèles) sont
+seulement réutilisés pour prédire.
+
+Usage:
+    projection = projection_for(demand, horizon=28)
+    future = projection.complete(model.make_future_dataframe(periods=28), prophet_df)
+    grippe = projection.with_scenario([{"regresseur": "epidemie_grippe", "valeur": 1,
+                                        "debut": "2025-01-06", "fin": "2025-01-12"}])
+"""
+
+import copy
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from forecasting import HORIZON_JOURS, REGRESSEURS_PROPHET, regressors_in
+
+
+# Modèle de projection de chaque régresseur
+METHODES = {
+    'temperature': 'climatologie',
+    'taux_occupation': 'hebdomadaire',
+    'nb_patients': 'hebdomadaire',
+    'epidemie_grippe': 'climatologie',
+}
+
+# Bornes des régresseurs (drapeau : fréquence attendue entre 0 et 1)
+BORNES = {'epidemie_grippe': (0.0, 1.0), 'taux_occupation': (0.0, 100.0),
+          'nb_patients': (0.0, None)}
+
+# Climatologie : fenêtre de lissage circulaire (jours)
+LISSAGE_JOURS = 15
+
+# Écart récent à la climatologie : jours moyennés, puis demi-vie (jours)
+JOURS_ANOMALIE = 7
+DEMI_VIE_ANOMALIE = 7
+
+# Profil hebdomadaire : semaines les plus récentes prises en compte
+SEMAINES_PROFIL = 8
+
+# Projections déjà calculées, par matrice puis par horizon
+_CACHE = weakref.WeakKeyDictionary()
+
+# Projection partagée avec les tâches d'un worker (voir share_projection)
+_SHARED = None
+
+
+def _fill_gaps(history):
+    """Dates complètes, jours sans valeur interpolés"""
+    full = pd.date_range(history.index.min(), history.index.max(), freq='D')
+    return history.reindex(full).interpolate(limit_direction='both')
+
+
+def climatology(values, dates, lissage=LISSAGE_JOURS):
+    """
+    Moyenne par jour de l'année (366 valeurs), lissée sur une fenêtre circulaire
+
+    Les jours de l'année jamais observés (historique de moins d'un an) sont
+    interpolés entre leurs voisins.
+    """
+    doy = dates.dayofyear.to_numpy() - 1
+    sums = np.bincount(doy, weights=values, minlength=366)
+    counts = np.bincount(doy, minlength=366)
+    seen = counts > 0
+    clim = np.interp(np.arange(366), np.flatnonzero(seen), sums[seen] / counts[seen], period=366)
+    if lissage > 1:
+        half = lissage // 2
+        padded = np.concatenate([clim[-half:], clim, clim[:half]])
+        clim = np.convolve(padded, np.ones(lissage) / lissage, mode='valid')[:366]
+    return clim
+
+
+def project_climatology(series, future_dates, lissage=LISSAGE_JOURS, jours=JOURS_ANOMALIE,
+                        demi_vie=DEMI_VIE_ANOMALIE):
+    """Climatologie plus l'écart des derniers jours, amorti avec l'horizon"""
+    values = series.to_numpy(dtype=float)
+    clim = climatology(values, series.index, lissage)
+    recent = series.index[-jours:].dayofyear.to_numpy() - 1
+    anomalie = float(np.mean(values[-jours:] - clim[recent]))
+    steps = np.arange(1, len(future_dates) + 1)
+    return clim[future_dates.dayofyear.to_numpy() - 1] + anomalie * 0.5 ** (steps / demi_vie)
+
+
+def project_weekly(series, future_dates, semaines=SEMAINES_PROFIL):
+    """Moyenne par jour de la semaine sur les dernières semaines"""
+    recent = series.iloc[-semaines * 7:]
+    sums = np.bincount(recent.index.dayofweek, weights=recent.to_numpy(dtype=float), minlength=7)
+    counts = np.bincount(recent.index.dayofweek, minlength=7)
+    profile = np.where(counts > 0, sums / np.maximum(counts, 1), recent.mean())
+    return profile[future_dates.dayofweek.to_numpy()]
+
+
+PROJECTIONS = {'climatologie': project_climatology, 'hebdomadaire': project_weekly}
+
+
+class RegressorProjection:
+    """
+    Valeurs du site (historique puis projection) de chaque régresseur
+
+    Calculée une fois par site et partagée par tous les produits : un
+    produit dont l'historique s'arrête plus tôt reprend les valeurs
+    observées du site, puis la projection.
+    """
+
+    def __init__(self, history, horizon=HORIZON_JOURS):
+        """
+        Args:
+            history: DataFrame indexé par date, une colonne par régresseur
+            horizon: Jours projetés après la dernière date
+        """
+        self.history = _fill_gaps(history)
+        self.horizon = horizon
+        self.scenario = []
+
+        future_dates = pd.date_range(self.history.index[-1] + pd.Timedelta(days=1),
+                                     periods=horizon, freq='D')
+        projected = {}
+        for col in self.history.columns:
+            values = PROJECTIONS[METHODES.get(col, 'hebdomadaire')](self.history[col], future_dates)
+            projected[col] = np.clip(values, *BORNES[col]) if col in BORNES else values
+        self.future = pd.DataFrame(projected, index=future_dates)
+        # Historique puis projection, indexés par date
+        self.frame = pd.concat([self.history, self.future])
+
+    @classmethod
+    def from_demand(cls, demand, horizon=HORIZON_JOURS):
+        """
+        Projection du site d'une DemandMatrix : moyenne, chaque jour, des
+        valeurs des produits présents
+
+        Args:
+            demand: DemandMatrix
+            horizon: Jours projetés
+        """
+        columns = {}
+        for col in REGRESSEURS_PROPHET:
+            if col not in demand.regresseurs:
+                continue
+            matrix = demand.regresseurs[col]
+            valid = ~np.isnan(matrix)
+            counts = valid.sum(axis=1)
+            sums = np.where(valid, matrix, 0.0).sum(axis=1)
+            columns[col] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return cls(pd.DataFrame(columns, index=demand.dates), horizon)
+
+    @classmethod
+    def from_daily(cls, daily, date_col='date', horizon=HORIZON_JOURS):
+        """
+        Projection d'une série quotidienne ou d'un ledger (plusieurs lignes
+        par date possibles)
+
+        Args:
+            daily: DataFrame contenant les régresseurs
+            date_col: Nom de la colonne de dates ('date' ou 'ds')
+            horizon: Jours projetés
+        """
+        cols = [col for col in REGRESSEURS_PROPHET if col in daily.columns]
+        history = daily[cols].astype(float).groupby(daily[date_col].to_numpy()).mean()
+        return cls(history, horizon)
+
+    def with_scenario(self, chocs):
+        """
+        Projection modifiée par un scénario (l'historique est inchangé)
+
+        Args:
+            chocs: Liste de {"regresseur", "valeur" ou "facteur", "debut",
+                "fin"} ; sans debut/fin, tout l'horizon projeté
+
+        Returns:
+            RegressorProjection: Nouvelle projection (celle-ci reste intacte)
+        """
+        scenario = copy.copy(self)
+        scenario.future = self.future.copy()
+        scenario.scenario = self.scenario + list(chocs)
+        for choc in chocs:
+            col = choc["regresseur"]
+            if col not in scenario.future:
+                raise KeyError(f"Régresseur inconnu : {col} ({', '.join(scenario.future)})")
+            debut = pd.Timestamp(choc.get("debut") or scenario.future.index[0])
+            fin = pd.Timestamp(choc.get("fin") or scenario.future.index[-1])
+            rows = (scenario.future.index >= debut) & (scenario.future.index <= fin)
+            if not rows.any():
+                raise ValueError(f"Scénario hors de l'horizon projeté : {debut.date()} → {fin.date()} "
+                                 f"(projection {scenario.future.index[0].date()} → "
+                                 f"{scenario.future.index[-1].date()})")
+            if "facteur" in choc:
+                scenario.future.loc[rows, col] *= choc["facteur"]
+            else:
+                scenario.future.loc[rows, col] = choc["valeur"]
+        scenario.frame = pd.concat([scenario.history, scenario.future])
+        return scenario
+
+    def complete(self, future, prophet_df):
+        """
+        Complète les régresseurs d'un DataFrame futur Prophet
+
+        Les dates de l'historique du produit gardent ses propres valeurs ;
+        les suivantes prennent celles du site (observées puis projetées).
+
+        Args:
+            future: DataFrame avec la colonne ds (make_future_dataframe)
+            prophet_df: Série du produit (ds, y, régresseurs)
+
+        Returns:
+            DataFrame: future avec une colonne par régresseur
+        """
+        regs = regressors_in(prophet_df)
+        if not regs:
+            return future
+        future = future.merge(prophet_df[['ds'] + regs], on='ds', how='left')
+        site = self.frame.reindex(pd.DatetimeIndex(future['ds']))
+        for col in regs:
+            future[col] = future[col].fillna(pd.Series(site[col].to_numpy(), index=future.index))
+        missing = future[regs].isna().any(axis=1)
+        if missing.any():
+            raise ValueError(f"Régresseurs non projetés après {self.future.index[-1].date()} "
+                             f"({int(missing.sum())} jour(s)) : augmenter l'horizon de projection")
+        return future
+
+    def summary(self):
+        """Moyenne projetée de chaque régresseur (et scénario appliqué)"""
+        return {
+            "methodes": {col: METHODES.get(col, 'hebdomadaire') for col in self.future},
+            "moyennes_projetees": {col: round(float(self.future[col].mean()), 3)
+                                   for col in self.future},
+            "scenario": self.scenario,
+        }
+
+    def __repr__(self):
+        return (f"RegressorProjection({self.future.index[0].date()} → "
+                f"{self.future.index[-1].date()}, {list(self.future)}"
+                f"{', scénario' if self.scenario else ''})")
+
+
+def projection_for(demand, horizon=HORIZON_JOURS):
+    """
+    Projection d'une DemandMatrix, calculée une seule fois par matrice et
+    par horizon (appliquer ensuite un scénario avec with_scenario)
+
+    Returns:
+        RegressorProjection
+    """
+    projections = _CACHE.setdefault(demand, {})
+    if horizon not in projections:
+        projections[horizon] = RegressorProjection.from_demand(demand, horizon)
+    return projections[horizon]
+
+
+def share_projection(projection):
+    """Rend la projection disponible aux tâches du processus (initializer des pools)"""
+    global _SHARED
+    _SHARED = projection
+
+
+def shared_projection():
+    """Projection partagée avec le processus (None si aucune)"""
+    return _SHARED
+
+
+def resolve_projection(projection, prophet_df, horizon=HORIZON_JOURS):
+    """
+    Projection donnée, sinon celle partagée avec le worker, sinon celle de
+    la série elle-même (analyse d'un produit isolé)
+    """
+    if projection is not None:
+        return projection
+    if _SHARED is not None:
+        return _SHARED
+    return RegressorProjection.from_daily(prophet_df, date_col='ds', horizon=horizon)
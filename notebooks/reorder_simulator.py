@@ -0,0 +1,377 @@
+"""
+Reorder Simulator - Simulation Monte Carlo des politiques de commande
+Tire des milliers de trajectoires de demande à partir des intervalles de
+prévision (ou des predictive_samples de Prophet) et évalue en une passe
+vectorisée (trajectoires × jours × politiques) des politiques (s, S) ou
+order-up-to, avec durée de vie des lots et délai fournisseur
+
+Usage:
+    python reorder_simulator.py          # prévisions de la dernière exécution batch
+    python reorder_simulator.py --predictions predictions_batch_28j.csv --delai 2 --trajectoires 5000
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from forecasting import INTERVAL_WIDTH
+
+
+NB_TRAJECTOIRES = 2000
+DELAI_LIVRAISON = 2     # Jours entre la commande et la réception
+PERIODE_REVUE = 1       # Jours entre deux décisions de commande
+RUPTURE_MAX = 0.05      # Probabilité de rupture acceptable pour la recommandation
+
+# Multiples de la demande moyenne sur (délai + revue) testés pour S, et
+# fractions de S testées pour le seuil s (1.0 = order-up-to)
+MULTIPLES_S = np.array([0.75, 1.0, 1.25, 1.5, 2.0, 2.5, 3.0])
+FRACTIONS_SEUIL = np.array([0.25, 0.5, 0.75, 1.0])
+
+
+def sample_demand(yhat, lower, upper, n_paths=NB_TRAJECTOIRES,
+                  interval_width=INTERVAL_WIDTH, rng=None):
+    """
+    Tire des trajectoires de demande à partir d'un intervalle de prévision
+
+    Chaque jour suit une loi normale scindée : l'écart-type à gauche et à
+    droite de yhat est déduit de la borne correspondante, ce qui respecte
+    les intervalles asymétriques. Les quantités négatives sont ramenées à 0.
+
+    Args:
+        yhat, lower, upper: Prévision et bornes par jour (tableaux de même taille)
+        n_paths: Nombre de trajectoires
+        interval_width: Niveau de l'intervalle (0.85 par défaut)
+        rng: np.random.Generator ou graine
+
+    Returns:
+        np.ndarray: Demande (trajectoires × jours)
+    """
+    rng = np.random.default_rng(rng)
+    yhat = np.asarray(yhat, dtype=np.float64)
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    sigma_low = np.maximum(yhat - np.asarray(lower, dtype=np.float64), 0.0) / z
+    sigma_high = np.maximum(np.asarray(upper, dtype=np.float64) - yhat, 0.0) / z
+
+    eps = rng.standard_normal((n_paths, len(yhat)))
+    demand = yhat + eps * np.where(eps < 0, sigma_low, sigma_high)
+    return np.maximum(demand, 0.0)
+
+
+def samples_from_prophet(model, future, n_paths=None):
+    """
+    Trajectoires issues de model.predictive_samples (bruit d'observation et
+    incertitude de tendance inclus)
+
+    Returns:
+        np.ndarray: Demande (trajectoires × jours)
+    """
+    samples = model.predictive_samples(future)['yhat'].T
+    if n_paths is not None:
+        samples = samples[:n_paths]
+    return np.maximum(samples, 0.0)
+
+
+def initial_stock_by_life(lots, date, shelf_life):
+    """
+    Répartit le stock disponible par durée de vie restante
+
+    Args:
+        lots: Lots en stock (LotLedger.on_hand) d'un produit
+        date: Date de la simulation (veille du premier jour simulé)
+        shelf_life: Durée de vie d'un lot neuf en jours
+
+    Returns:
+        np.ndarray: Stock par jour de vie restant (indice 0 = périme ce jour)
+    """
+    stock = np.zeros(shelf_life)
+    if len(lots) == 0:
+        return stock
+    restant = (pd.to_datetime(lots['date_expiration']) - pd.Timestamp(date)).dt.days.to_numpy()
+    valide = restant >= 1
+    index = np.minimum(restant[valide] - 1, shelf_life - 1)
+    np.add.at(stock, index, lots['quantite_restante'].to_numpy(np.float64)[valide])
+    return stock
+
+
+def policy_grid(demande_jour, delai=DELAI_LIVRAISON, periode_revue=PERIODE_REVUE,
+                multiples=MULTIPLES_S, fractions=FRACTIONS_SEUIL, shelf_life=None):
+    """
+    Grille de politiques (s, S) autour de la demande moyenne
+
+    Les niveaux cibles sont des multiples de la demande sur
+    min(durée de vie, délai + revue) jours, plafonnés à la demande sur
+    délai + durée de vie : au-delà, même le lot commandé ce jour-là ne peut
+    pas être consommé avant de périmer.
+
+    Args:
+        demande_jour: Demande moyenne par jour
+        delai, periode_revue: Voir simulate_policies
+        multiples: Multiples testés pour S
+        fractions: Fractions de S testées pour s (1.0 = order-up-to)
+        shelf_life: Durée de vie d'un lot en jours (None = pas de péremption)
+
+    Returns:
+        DataFrame: seuil (s) et niveau_cible (S), une ligne par politique
+    """
+    demande_jour = max(demande_jour, 1e-9)
+    jours = delai + periode_revue
+    cible = np.asarray(multiples, dtype=np.float64) * demande_jour
+    if shelf_life is not None:
+        shelf_life = max(int(round(shelf_life)), 1)
+        cible = np.unique(np.minimum(cible * min(shelf_life, jours),
+                                     demande_jour * (delai + shelf_life)))
+    else:
+        cible = cible * jours
+    S, frac = np.meshgrid(cible, fractions, indexing='ij')
+    return pd.DataFrame({'seuil': (S * frac).ravel(), 'niveau_cible': S.ravel()})
+
+
+def simulate_policies(demand, seuils, cibles, shelf_life, stock_initial=0.0,
+                      delai=DELAI_LIVRAISON, periode_revue=PERIODE_REVUE):
+    """
+    Simule toutes les politiques sur toutes les trajectoires
+
+    Chaque jour : réception des commandes arrivées, consommation FEFO
+    (lots les plus proches de l'expiration d'abord), mise au rebut des lots
+    qui expirent, puis revue : si la position de stock (disponible + en
+    commande) est <= s, on commande S - position, reçu `delai` jours plus
+    tard.
+
+    Args:
+        demand: Demande (trajectoires × jours)
+        seuils, cibles: s et S de chaque politique (tableaux de même taille)
+        shelf_life: Durée de vie d'un lot reçu, en jours
+        stock_initial: Stock de départ, neuf (nombre) ou par durée de vie
+            restante (tableau, voir initial_stock_by_life)
+        delai: Délai fournisseur en jours (>= 1)
+        periode_revue: Une décision de commande tous les `periode_revue` jours
+
+    Returns:
+        DataFrame: une ligne par politique avec probabilité de rupture,
+        taux de service, gaspillage, stock moyen et commandes
+    """
+    demand = np.asarray(demand, dtype=np.float64)
+    n_paths, n_days = demand.shape
+    seuils = np.asarray(seuils, dtype=np.float64)
+    cibles = np.asarray(cibles, dtype=np.float64)
+    delai = max(int(delai), 1)
+
+    # Au-delà de l'horizon, un lot ne peut plus périmer pendant la simulation
+    shelf_life = max(int(round(shelf_life)), 1)
+    n_life = min(shelf_life, n_days + 1)
+
+    stock0 = np.zeros(n_life)
+    if np.isscalar(stock_initial):
+        stock0[-1] = stock_initial
+    else:
+        stock_initial = np.asarray(stock_initial, dtype=np.float64)
+        stock0[:min(len(stock_initial), n_life)] = stock_initial[:n_life]
+        stock0[-1] += stock_initial[n_life:].sum()
+
+    # État : stock cumulé par durée de vie restante (cumul[..., k] = stock
+    # périmant dans au plus k + 1 jours). La consommation FEFO devient
+    # alors un simple max(cumul - demande, 0) sur tous les âges à la fois.
+    shape = (n_paths, len(seuils))
+    cumul = np.broadcast_to(np.cumsum(stock0), shape + (n_life,)).copy()
+    pipeline = np.zeros(shape + (delai,))
+
+    manque = np.zeros(shape)
+    gaspillage = np.zeros(shape)
+    stock_cumule = np.zeros(shape)
+    jours_rupture = np.zeros(shape, dtype=np.int32)
+    nb_commandes = np.zeros(shape, dtype=np.int32)
+    quantite_commandee = np.zeros(shape)
+
+    for t in range(n_days):
+        # Réception
+        cumul[..., -1] += pipeline[..., 0]
+        pipeline[..., :-1] = pipeline[..., 1:]
+        pipeline[..., -1] = 0.0
+
+        # Consommation FEFO
+        d = demand[:, t][:, None]
+        non_servi = np.maximum(d - cumul[..., -1], 0.0)
+        np.subtract(cumul, d[..., None], out=cumul)
+        np.maximum(cumul, 0.0, out=cumul)
+
+        manque += non_servi
+        jours_rupture += non_servi > 1e-9
+
+        # Péremption des lots dont c'était le dernier jour, puis vieillissement
+        perime = cumul[..., 0].copy()
+        gaspillage += perime
+        cumul[..., :-1] = cumul[..., 1:] - perime[..., None]
+        cumul[..., -1] -= perime
+        stock_cumule += cumul[..., -1]
+
+        # Revue de la politique
+        if t % periode_revue == 0:
+            position = cumul[..., -1] + pipeline.sum(axis=-1)
+            commande = np.where(position <= seuils, np.maximum(cibles - position, 0.0), 0.0)
+            pipeline[..., -1] += commande
+            nb_commandes += commande > 0
+            quantite_commandee += commande
+
+    demande_totale = np.maximum(demand.sum(axis=1), 1e-9)[:, None]
+    return pd.DataFrame({
+        'seuil': seuils,
+        'niveau_cible': cibles,
+        'proba_rupture': (jours_rupture > 0).mean(axis=0),
+        'jours_rupture': jours_rupture.mean(axis=0),
+        'taux_service': 1 - (manque / demande_totale).mean(axis=0),
+        'manque_moyen': manque.mean(axis=0),
+        'gaspillage_moyen': gaspillage.mean(axis=0),
+        'gaspillage_p95': np.quantile(gaspillage, 0.95, axis=0),
+        'stock_moyen': stock_cumule.mean(axis=0) / n_days,
+        'nb_commandes': nb_commandes.mean(axis=0),
+        'quantite_commandee': quantite_commandee.mean(axis=0),
+    })
+
+
+def best_policy(results, rupture_max=RUPTURE_MAX):
+    """
+    Politique recommandée : la moins génératrice de gaspillage (puis de
+    stock) parmi celles dont la probabilité de rupture est acceptable ; à
+    défaut, celle qui minimise les quantités perdues (demande non servie
+    + gaspillage), la probabilité de rupture départageant les ex aequo
+    """
+    acceptables = results[results['proba_rupture'] <= rupture_max]
+    if acceptables.empty:
+        pertes = results['manque_moyen'] + results['gaspillage_moyen']
+        return (results.assign(_pertes=pertes)
+                .sort_values(['_pertes', 'proba_rupture'])
+                .iloc[0].drop('_pertes'))
+    return acceptables.sort_values(['gaspillage_moyen', 'stock_moyen']).iloc[0]
+
+
+def simulate_catalogue(predictions, ledger, date=None, delai=DELAI_LIVRAISON,
+                       periode_revue=PERIODE_REVUE, n_paths=NB_TRAJECTOIRES,
+                       interval_width=INTERVAL_WIDTH, rupture_max=RUPTURE_MAX, seed=0,
+                       verbose=True):
+    """
+    Évalue une grille de politiques pour chaque produit des prévisions
+
+    Args:
+        predictions: Prévisions au format d'export (date, quantite_prevue,
+            quantite_min, quantite_max, produit)
+        ledger: LotLedger (stock initial par lot et durée de vie des produits)
+        date: Date du stock initial (défaut : veille de la première prévision)
+        delai, periode_revue: Voir simulate_policies
+        n_paths: Nombre de trajectoires par produit
+        interval_width: Niveau des intervalles de prévision
+        rupture_max: Probabilité de rupture acceptable
+        seed: Graine du générateur aléatoire
+        verbose: Afficher la progression
+
+    Returns:
+        tuple: (toutes les politiques simulées, politique recommandée par produit)
+    """
+    rng = np.random.default_rng(seed)
+    predictions = predictions.sort_values(['produit', 'date'])
+    if date is None:
+        date = pd.Timestamp(predictions['date'].min()) - pd.Timedelta(days=1)
+
+    lots = ledger.lots
+    durees_vie = ((pd.to_datetime(lots['date_expiration']) - pd.to_datetime(lots['date_entree']))
+                  .dt.days.groupby(lots['produit']).mean())
+    en_stock = ledger.on_hand(date)
+    en_stock = en_stock[~en_stock['perime']]
+
+    resultats, recommandations = [], []
+    for produit, prev in predictions.groupby('produit', sort=True):
+        demand = sample_demand(prev['quantite_prevue'], prev['quantite_min'],
+                               prev['quantite_max'], n_paths, interval_width, rng)
+        shelf_life = int(round(durees_vie.get(produit, len(prev))))
+        stock = initial_stock_by_life(en_stock[en_stock['produit'] == produit], date, shelf_life)
+
+        grid = policy_grid(prev['quantite_prevue'].mean(), delai, periode_revue,
+                           shelf_life=shelf_life)
+        result = simulate_policies(demand, grid['seuil'], grid['niveau_cible'], shelf_life,
+                                   stock, delai, periode_revue)
+        result.insert(0, 'produit', produit)
+        resultats.append(result)
+
+        best = best_policy(result, rupture_max)
+        position = stock.sum()
+        recommandations.append({
+            'produit': produit,
+            'stock_initial': position,
+            'duree_vie_jours': shelf_life,
+            **best.drop('produit').to_dict(),
+            'commande_immediate': max(best['niveau_cible'] - position, 0.0)
+            if position <= best['seuil'] else 0.0,
+        })
+        if verbose:
+            print(f"   🎲 {produit:25s} s={best['seuil']:8.2f} S={best['niveau_cible']:8.2f} "
+                  f"rupture {best['proba_rupture']:5.1%} gaspillage {best['gaspillage_moyen']:7.2f}")
+
+    return pd.concat(resultats, ignore_index=True), pd.DataFrame(recommandations)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from pathlib import Path
+
+    from data_loader import load_stock_data
+    from lot_ledger import build_lot_ledger
+
+    parser = argparse.ArgumentParser(description="Simulation Monte Carlo des politiques de commande")
+    parser.add_argument("--csv", default="../data/dataset_stock_hopital_ENRICHI.csv")
+    parser.add_argument("--predictions", default=None,
+                        help="Prévisions au format d'export (défaut : dernière exécution batch)")
+    parser.add_argument("--date", default=None, help="Date du stock initial")
+    parser.add_argument("--delai", type=int, default=DELAI_LIVRAISON)
+    parser.add_argument("--revue", type=int, default=PERIODE_REVUE)
+    parser.add_argument("--trajectoires", type=int, default=NB_TRAJECTOIRES)
+    parser.add_argument("--rupture-max", type=float, default=RUPTURE_MAX)
+    args = parser.parse_args()
+
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+    except ImportError:
+        results_mgr = None
+
+    predictions_csv = args.predictions
+    if predictions_csv is None and results_mgr is not None:
+        for run_dir in results_mgr.list_previous_runs(limit=50):
+            found = sorted(run_dir.glob("predictions_batch_*.csv"))
+            if found:
+                predictions_csv = found[0]
+                break
+    if predictions_csv is None:
+        raise SystemExit("❌ Aucune prévision batch trouvée : lancer batch_forecast.py ou --predictions")
+    print(f"📂 Prévisions : {predictions_csv}")
+
+    df = load_stock_data(args.csv)
+    ledger = build_lot_ledger(df)
+    predictions = pd.read_csv(predictions_csv, parse_dates=['date'])
+
+    start = time.perf_counter()
+    simulations, recommandations = simulate_catalogue(
+        predictions, ledger, date=args.date, delai=args.delai, periode_revue=args.revue,
+        n_paths=args.trajectoires, rupture_max=args.rupture_max
+    )
+    duree = time.perf_counter() - start
+    print(f"\n⏱️  {len(simulations)} politiques × {args.trajectoires} trajectoires en {duree:.1f}s")
+
+    # Écriture directe dans le dossier de l'exécution (sinon répertoire courant)
+    def output(filename):
+        return results_mgr.output_path(filename) if results_mgr is not None else Path(filename)
+
+    filename_csv = output('politiques_commande.csv')
+    recommandations.round(3).to_csv(filename_csv, index=False)
+    filename_simulations = output('simulations_politiques.csv')
+    simulations.round(4).to_csv(filename_simulations, index=False)
+    print(f"✅ {filename_csv}")
+    print(f"✅ {filename_simulations}")
+
+    if results_mgr is not None:
+        results_mgr.create_summary_file(f"Politiques de commande ({len(recommandations)} produits)", {
+            "Trajectoires": args.trajectoires,
+            "Délai fournisseur": f"{args.delai} jours",
+            "Rupture max": f"{args.rupture_max:.0%}",
+            "Gaspillage attendu": f"{recommandations['gaspillage_moyen'].sum():.2f}",
+        })
@@ -1,14 +1,81 @@
 """
 Results Manager - Gestion intelligente des résultats d'analyse
-Crée automatiquement des dossiers horodatés pour stocker les résultats
+Crée automatiquement des dossiers horodatés pour stocker les résultats,
+tient un catalogue des exécutions (manifeste par exécution + index
+JSON-lines à la racine des résultats) et déduplique les fichiers identiques
+d'une exécution à l'autre (stockage par contenu, liens durs)
 """
 
+import hashlib
+import json
 import os
+import re
 import shutil
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
 
+MANIFEST_FILENAME = "manifest.json"
+INDEX_FILENAME = "_runs.jsonl"
+
+# Fichiers propres à chaque exécution, réécrits sur place : jamais partagés
+NON_DEDUPLIQUES = {"README.txt", MANIFEST_FILENAME}
+
+# Clés du résumé présentées dans une section dédiée du README
+SECTIONS_README = ("etapes", "alertes_etapes")
+
+# Valeur de résumé convertible en métrique : "12.34%", "3.1s", "28 jours"...
+_NOMBRE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(%|[^\W\d]{0,6})\s*$")
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash SHA-256 d'un fichier, lu par blocs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_metrics(summary, prefix=""):
+    """
+    Extrait les valeurs numériques d'un résumé (dictionnaires imbriqués
+    aplatis avec des clés "parent.enfant")
+
+    Returns:
+        dict: {nom: valeur}
+    """
+    metrics = {}
+    for key, value in (summary or {}).items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(extract_metrics(value, prefix=f"{name}."))
+        elif isinstance(value, bool):
+            continue
+        elif isinstance(value, (int, float)):
+            metrics[name] = value
+        elif isinstance(value, str):
+            match = _NOMBRE.match(value)
+            if match:
+                metrics[name] = float(match.group(1))
+    return metrics
+
+
+def _run_date(run_id):
+    """Date lisible d'un dossier YYYYMMDD_HHMMSS"""
+    try:
+        return datetime.strptime(run_id[:15], "%Y%m%d_%H%M%S").strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+
+
+def _date_key(date):
+    """Normalise une date (str, date, datetime) au format des dossiers : YYYYMMDD"""
+    if hasattr(date, 'strftime'):
+        return date.strftime("%Y%m%d")
+    return str(date).replace('-', '')[:8]
+
+
 class ResultsManager:
     """Gestionnaire de résultats avec organisation par timestamp"""
 
@@ -20,6 +87,7 @@ class ResultsManager:
             base_results_dir: Chemin vers le dossier de résultats de base
         """
         self.base_results_dir = Path(base_results_dir)
+        self.index_path = self.base_results_dir / INDEX_FILENAME
         self.current_run_dir = None
         self.timestamp = None
 
@@ -38,45 +106,75 @@ class ResultsManager:
         self.current_run_dir.mkdir(parents=True, exist_ok=True)
         (self.current_run_dir / "graphs").mkdir(exist_ok=True)
 
+        # Visible dans le catalogue dès sa création (complété par le manifeste)
+        self._append_index({
+            "run_id": self.timestamp,
+            "date": _run_date(self.timestamp),
+            "statut": "en_cours",
+        })
+
         print(f"📁 Dossier de résultats créé : {self.current_run_dir}")
         return self.current_run_dir
 
-    def save_file(self, source_path, subdirectory=None):
+    def output_path(self, filename, subdirectory=None):
         """
-        Sauvegarde un fichier dans le dossier de résultats
+        Chemin où écrire directement un fichier dans le dossier de l'exécution
+
+        À préférer à save_file : le fichier n'est écrit qu'une fois, sans
+        copie depuis le répertoire courant.
 
         Args:
-            source_path: Chemin du fichier source
+            filename: Nom du fichier
             subdirectory: Sous-dossier optionnel (ex: "graphs")
+
+        Returns:
+            Path: Chemin de destination
         """
         if self.current_run_dir is None:
             self.create_run_directory()
 
-        source = Path(source_path)
-        if not source.exists():
-            print(f"⚠️  Fichier introuvable : {source_path}")
-            return
-
-        # Déterminer la destination
         if subdirectory:
             dest_dir = self.current_run_dir / subdirectory
             dest_dir.mkdir(exist_ok=True)
         else:
             dest_dir = self.current_run_dir
 
-        dest = dest_dir / source.name
+        dest = dest_dir / Path(filename).name
+        # Déjà dédupliqué : on détache le lien pour ne pas réécrire le blob partagé
+        if dest.exists() and dest.stat().st_nlink > 1:
+            dest.unlink()
+        return dest
+
+    def save_file(self, source_path, subdirectory=None, move=False):
+        """
+        Sauvegarde un fichier dans le dossier de résultats
+
+        Args:
+            source_path: Chemin du fichier source
+            subdirectory: Sous-dossier optionnel (ex: "graphs")
+            move: Déplacer le fichier au lieu de le copier (pas de doublon
+                laissé dans le répertoire courant)
+        """
+        source = Path(source_path)
+        if not source.exists():
+            print(f"⚠️  Fichier introuvable : {source_path}")
+            return
+
+        dest = self.output_path(source.name, subdirectory)
 
-        # Copier le fichier
-        shutil.copy2(source, dest)
+        if move:
+            shutil.move(source, dest)
+        else:
+            shutil.copy2(source, dest)
         print(f"✅ Sauvegardé : {dest.relative_to(self.base_results_dir.parent)}")
 
-    def save_graph(self, graph_path):
+    def save_graph(self, graph_path, move=False):
         """Sauvegarde un graphique dans le sous-dossier graphs"""
-        self.save_file(graph_path, subdirectory="graphs")
+        self.save_file(graph_path, subdirectory="graphs", move=move)
 
-    def save_data(self, data_path):
+    def save_data(self, data_path, move=False):
         """Sauvegarde un fichier de données dans le dossier principal"""
-        self.save_file(data_path)
+        self.save_file(data_path, move=move)
 
     def create_summary_file(self, product_name, summary_dict):
         """
@@ -101,7 +199,26 @@ class ResultsManager:
             if summary_dict:
                 f.write("Résultats clés :\n")
                 for key, value in summary_dict.items():
-                    f.write(f"  - {key}: {value}\n")
+                    if key not in SECTIONS_README:
+                        f.write(f"  - {key}: {value}\n")
+
+            etapes = (summary_dict or {}).get("etapes")
+            if etapes:
+                f.write("\n" + "=" * 70 + "\n")
+                f.write("DURÉES PAR ÉTAPE\n")
+                f.write("=" * 70 + "\n\n")
+                total = sum(e["duree_s"] for e in etapes.values()) or 1.0
+                f.write(f"  {'Étape':12s} {'Durée':>9s} {'Part':>7s} {'CPU':>9s} "
+                        f"{'RSS max':>9s} {'Lignes':>11s}\n")
+                for name, etape in etapes.items():
+                    lignes = etape.get("lignes")
+                    rss = f"{etape['rss_max_mb']:.0f}" if etape.get("rss_max_mb") is not None else "-"
+                    f.write(f"  {name:12s} {etape['duree_s']:8.2f}s {etape['duree_s'] / total:7.1%} "
+                            f"{etape['cpu_s']:8.2f}s {rss:>6s} MB "
+                            f"{lignes if lignes is not None else '-':>11}\n")
+                for alerte in summary_dict.get("alertes_etapes") or []:
+                    f.write(f"  ⚠️  {alerte['etape']} : {alerte['duree_s']:.1f}s contre "
+                            f"{alerte['reference_s']:.1f}s habituellement (×{alerte['ratio']})\n")
 
             f.write("\n" + "=" * 70 + "\n")
             f.write("FICHIERS GÉNÉRÉS\n")
@@ -111,7 +228,7 @@ class ResultsManager:
             f.write("Graphiques (dans graphs/) :\n")
             graphs_dir = self.current_run_dir / "graphs"
             if graphs_dir.exists():
-                for file in sorted(graphs_dir.glob("*.png")):
+                for file in sorted(graphs_dir.glob("*.*")):
                     f.write(f"  - {file.name}\n")
 
             f.write("\nDonnées :\n")
@@ -122,34 +239,331 @@ class ResultsManager:
 
         print(f"✅ Fichier résumé créé : {summary_file.relative_to(self.base_results_dir.parent)}")
 
+        self.write_manifest(product_name, summary_dict)
+
     def get_run_path(self):
         """Retourne le chemin du dossier d'exécution actuel"""
         if self.current_run_dir is None:
             self.create_run_directory()
         return self.current_run_dir
 
-    def list_previous_runs(self, limit=10):
+    def get_store_dir(self, name):
+        """
+        Retourne un dossier de stockage partagé entre les exécutions
+
+        Ces dossiers sont préfixés par "_" pour ne pas être confondus avec
+        les dossiers horodatés des exécutions.
+
+        Args:
+            name: Nom du stockage (ex: "models")
+
+        Returns:
+            Path: Chemin du dossier (créé si nécessaire)
+        """
+        store_dir = self.base_results_dir / f"_{name}"
+        store_dir.mkdir(parents=True, exist_ok=True)
+        return store_dir
+
+    # ------------------------------------------------------------------
+    # Catalogue des exécutions
+    # ------------------------------------------------------------------
+
+    def _build_manifest(self, run_dir, product_name=None, summary_dict=None, deduplicate=False):
+        """
+        Décrit une exécution : produit, date, métriques et fichiers produits
+
+        Avec deduplicate, chaque fichier est aussi rattaché au stockage par
+        contenu (voir _link_blob) : le hash n'est calculé qu'une fois.
+        """
+        artifacts = []
+        for path in sorted(run_dir.rglob("*")):
+            if not path.is_file() or path.name == MANIFEST_FILENAME:
+                continue
+            digest = file_sha256(path)
+            if deduplicate and path.name not in NON_DEDUPLIQUES:
+                self._link_blob(path, digest)
+            artifacts.append({
+                "chemin": path.relative_to(run_dir).as_posix(),
+                "taille": path.stat().st_size,
+                "sha256": digest,
+            })
+
+        return {
+            "run_id": run_dir.name,
+            "date": _run_date(run_dir.name),
+            "produit": product_name,
+            "statut": "termine",
+            "metriques": extract_metrics(summary_dict),
+            "resume": summary_dict or {},
+            "fichiers": artifacts,
+        }
+
+    @staticmethod
+    def _index_entry(manifest):
+        """Ligne d'index : le manifeste sans le détail des fichiers"""
+        fichiers = manifest.get("fichiers", [])
+        suffixes = [Path(a["chemin"]).suffix for a in fichiers]
+        return {
+            "run_id": manifest["run_id"],
+            "date": manifest.get("date"),
+            "produit": manifest.get("produit"),
+            "statut": manifest.get("statut"),
+            "metriques": manifest.get("metriques", {}),
+            "nb_graphiques": sum(a["chemin"].startswith("graphs/") for a in fichiers),
+            "nb_csv": suffixes.count(".csv"),
+            "nb_json": suffixes.count(".json"),
+            "taille": sum(a["taille"] for a in fichiers),
+        }
+
+    def write_manifest(self, product_name, summary_dict=None):
+        """
+        Écrit manifest.json dans le dossier de l'exécution et l'ajoute à l'index
+
+        Args:
+            product_name: Nom du produit analysé
+            summary_dict: Résumé de l'exécution (les valeurs numériques
+                deviennent des métriques comparables entre exécutions)
+
+        Returns:
+            dict: Manifeste écrit
+        """
+        if self.current_run_dir is None:
+            self.create_run_directory()
+
+        manifest = self._build_manifest(self.current_run_dir, product_name, summary_dict,
+                                        deduplicate=True)
+        with open(self.current_run_dir / MANIFEST_FILENAME, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False, default=str)
+
+        self._append_index(self._index_entry(manifest))
+        return manifest
+
+    # ------------------------------------------------------------------
+    # Stockage par contenu et rétention
+    # ------------------------------------------------------------------
+
+    def _link_blob(self, path, digest):
+        """
+        Déduplique un fichier de l'exécution
+
+        Le contenu est conservé une seule fois dans results/_blobs/<hash> ;
+        le fichier de l'exécution devient un lien dur vers ce blob. Si les
+        liens durs ne sont pas possibles (autre volume, système de fichiers
+        sans liens), la copie est simplement conservée.
+        """
+        blob = self.get_store_dir("blobs") / digest[:2] / digest
+        try:
+            if not blob.exists():
+                blob.parent.mkdir(exist_ok=True)
+                os.link(path, blob)
+            elif not os.path.samefile(blob, path):
+                tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                os.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def collect_garbage(self, keep_last=None, max_age_days=None, dry_run=False):
+        """
+        Supprime les anciennes exécutions puis les blobs qui ne sont plus
+        utilisés par aucune exécution (plus aucun autre lien dur)
+
+        Args:
+            keep_last: Nombre d'exécutions récentes à conserver
+            max_age_days: Âge maximum des exécutions conservées
+            dry_run: Seulement lister ce qui serait supprimé
+
+        Returns:
+            dict: executions (supprimées), blobs, octets libérés
+        """
+        runs = []
+        if self.base_results_dir.exists():
+            runs = sorted((d for d in self.base_results_dir.iterdir()
+                           if d.is_dir() and not d.name.startswith("_")), reverse=True)
+        limite = datetime.now() - timedelta(days=max_age_days) if max_age_days is not None else None
+
+        expired = []
+        for i, run_dir in enumerate(runs):
+            if run_dir == self.current_run_dir:
+                continue
+            date = _run_date(run_dir.name)
+            too_old = limite is not None and date is not None and datetime.fromisoformat(date) < limite
+            if (keep_last is not None and i >= keep_last) or too_old:
+                expired.append(run_dir)
+
+        freed = 0
+        for run_dir in expired:
+            # Seul le contenu non partagé avec le stockage par contenu est libéré ici
+            freed += sum(p.stat().st_size for p in run_dir.rglob("*")
+                         if p.is_file() and p.stat().st_nlink == 1)
+            if not dry_run:
+                shutil.rmtree(run_dir)
+                self._append_index({"run_id": run_dir.name, "statut": "supprime"})
+
+        orphans = []
+        blobs_dir = self.base_results_dir / "_blobs"
+        if blobs_dir.exists():
+            orphans = [b for b in blobs_dir.glob("*/*") if b.stat().st_nlink == 1]
+        for blob in orphans:
+            freed += blob.stat().st_size
+            if not dry_run:
+                blob.unlink()
+
+        prefix = "🔍 [simulation] " if dry_run else "🧹 "
+        print(f"{prefix}{len(expired)} exécution(s), {len(orphans)} blob(s), "
+              f"{freed / 1024 ** 2:.1f} MB libérés")
+        return {"executions": [d.name for d in expired], "blobs": len(orphans), "octets": freed}
+
+    def _append_index(self, entry):
+        """Ajoute une ligne à l'index (la dernière ligne d'une exécution fait foi)"""
+        if not self.index_path.exists():
+            self.rebuild_index()
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        # Une seule écriture en mode ajout : pas d'entrelacement entre processus
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def rebuild_index(self):
+        """
+        Reconstruit l'index à partir des dossiers d'exécution
+
+        Les exécutions antérieures au catalogue (sans manifest.json) sont
+        décrites à partir de leurs fichiers et de leur README.txt.
+
+        Returns:
+            int: Nombre d'exécutions indexées
+        """
+        if not self.base_results_dir.exists():
+            return 0
+
+        entries = []
+        for run_dir in sorted(d for d in self.base_results_dir.iterdir()
+                              if d.is_dir() and not d.name.startswith("_")):
+            manifest_path = run_dir / MANIFEST_FILENAME
+            if manifest_path.exists():
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            else:
+                manifest = self._build_manifest(run_dir, *self._read_readme(run_dir))
+                if manifest["produit"] is None:
+                    manifest["statut"] = "en_cours"
+            entries.append(self._index_entry(manifest))
+
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        os.replace(tmp_path, self.index_path)
+        return len(entries)
+
+    @staticmethod
+    def _read_readme(run_dir):
+        """Produit et résultats clés lus dans le README.txt d'une ancienne exécution"""
+        readme = run_dir / "README.txt"
+        product_name, summary = None, {}
+        if not readme.exists():
+            return product_name, summary
+
+        with open(readme, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("Produit analysé"):
+                    product_name = line.split(":", 1)[1].strip()
+                elif line.startswith("FICHIERS GÉNÉRÉS"):
+                    break
+                elif line.startswith("  - ") and ":" in line:
+                    key, value = line[4:].split(":", 1)
+                    summary[key.strip()] = value.strip()
+        return product_name, summary
+
+    def read_index(self):
+        """
+        Lit l'index des exécutions
+
+        Returns:
+            List[dict]: Une entrée par exécution (la plus récente ligne),
+            triées de la plus récente à la plus ancienne
+        """
+        if not self.index_path.exists():
+            if self.rebuild_index() == 0:
+                return []
+
+        entries = {}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # ligne tronquée (écriture interrompue)
+                entries[entry["run_id"]] = {**entries.get(entry["run_id"], {}), **entry}
+        return sorted(entries.values(), key=lambda e: e["run_id"], reverse=True)
+
+    def find_runs(self, produit=None, depuis=None, jusqu_a=None, limit=None):
+        """
+        Recherche des exécutions dans l'index
+
+        Args:
+            produit: Nom exact du produit (ou None)
+            depuis: Date minimum incluse (ex: "2025-01-01")
+            jusqu_a: Date maximum incluse
+            limit: Nombre maximum d'exécutions
+
+        Returns:
+            List[dict]: Entrées d'index, de la plus récente à la plus ancienne
+        """
+        runs = []
+        for entry in self.read_index():
+            jour = entry["run_id"][:8]
+            if produit is not None and entry.get("produit") != produit:
+                continue
+            if depuis is not None and jour < _date_key(depuis):
+                continue
+            if jusqu_a is not None and jour > _date_key(jusqu_a):
+                continue
+            # Dossier supprimé à la main depuis son indexation
+            if not (self.base_results_dir / entry["run_id"]).is_dir():
+                continue
+            runs.append(entry)
+            if limit is not None and len(runs) >= limit:
+                break
+        return runs
+
+    def compare_runs(self, metriques=None, **filters):
+        """
+        Tableau des métriques de plusieurs exécutions
+
+        Args:
+            metriques: Noms des métriques à garder (défaut : toutes)
+            **filters: Voir find_runs (produit, depuis, jusqu_a, limit)
+
+        Returns:
+            List[dict]: Une ligne par exécution (run_id, produit, métriques),
+            convertible avec pd.DataFrame
+        """
+        rows = []
+        for entry in self.find_runs(**filters):
+            values = entry.get("metriques", {})
+            if metriques is not None:
+                values = {m: values.get(m) for m in metriques}
+            rows.append({"run_id": entry["run_id"], "produit": entry.get("produit"), **values})
+        return rows
+
+    def list_previous_runs(self, limit=10, **filters):
         """
         Liste les exécutions précédentes
 
         Args:
             limit: Nombre maximum d'exécutions à afficher
+            **filters: Voir find_runs (produit, depuis, jusqu_a)
 
         Returns:
             List[Path]: Liste des dossiers d'exécutions
         """
-        if not self.base_results_dir.exists():
-            return []
-
-        runs = sorted(
-            [d for d in self.base_results_dir.iterdir() if d.is_dir()],
-            reverse=True
-        )
-        return runs[:limit]
+        return [self.base_results_dir / entry["run_id"]
+                for entry in self.find_runs(limit=limit, **filters)]
 
-    def print_previous_runs(self, limit=10):
+    def print_previous_runs(self, limit=10, **filters):
         """Affiche les exécutions précédentes"""
-        runs = self.list_previous_runs(limit)
+        runs = self.find_runs(limit=limit, **filters)
 
         if not runs:
             print("📁 Aucune exécution précédente trouvée")
@@ -158,24 +572,15 @@ class ResultsManager:
         print(f"\n📁 {len(runs)} exécution(s) précédente(s) :")
         print("=" * 70)
 
-        for i, run_dir in enumerate(runs, 1):
-            # Compter les fichiers
-            num_graphs = len(list((run_dir / "graphs").glob("*.png"))) if (run_dir / "graphs").exists() else 0
-            num_csv = len(list(run_dir.glob("*.csv")))
-            num_json = len(list(run_dir.glob("*.json")))
-
-            print(f"\n{i}. {run_dir.name}")
-            print(f"   📊 {num_graphs} graphiques, {num_csv} CSV, {num_json} JSON")
-
-            # Afficher le README s'il existe
-            readme = run_dir / "README.txt"
-            if readme.exists():
-                with open(readme, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    for line in lines:
-                        if "Produit analysé" in line:
-                            print(f"   {line.strip()}")
-                            break
+        for i, entry in enumerate(runs, 1):
+            print(f"\n{i}. {entry['run_id']}")
+            if entry.get("statut") == "termine":
+                print(f"   📊 {entry['nb_graphiques']} graphiques, {entry['nb_csv']} CSV, "
+                      f"{entry['nb_json']} JSON")
+            else:
+                print("   ⏳ Exécution non terminée (pas de résumé)")
+            if entry.get("produit"):
+                print(f"   Produit analysé : {entry['produit']}")
 
 
 # Fonction utilitaire pour faciliter l'utilisation
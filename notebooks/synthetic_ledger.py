@@ -0,0 +1,399 @@
+"""
+Synthetic Ledger - Générateur de ledgers de stock synthétiques
+Produit un ledger au schéma du dataset enrichi (lots, péremptions,
+fournisseurs, régresseurs) à n'importe quelle échelle : des centaines de
+produits, plusieurs sites, des millions de lignes. Les stocks sont simulés
+jour par jour, vectorisés sur toutes les séries (produit × site) : entrées
+par lot quand le stock passe sous le seuil, consommation FEFO, destruction
+des lots périmés.
+
+Usage:
+    python cli.py generate --produits 200 --sites 3 --output ../data/synthetique.csv
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from defaults import DEBUT, FIN
+
+
+# Catalogue de référence (calé sur dataset_stock_hopital_REALISTE.csv) :
+# nom, type, unité, fournisseur (id, nom), durée de vie (jours), taille de
+# lot, consommation moyenne par jour, part de jours sans consommation
+CATALOGUE = [
+    ("Poulet frais", "Aliment", "kg", 1, "Volailles Dupont", 2, 22.0, 7.4, 0.10),
+    ("Poisson blanc", "Aliment", "kg", 2, "Poissonnerie Martin", 2, 20.0, 2.0, 0.30),
+    ("Pain frais", "Aliment", "kg", 3, "Boulangerie Moderne", 1, 40.0, 5.6, 0.05),
+    ("Lait entier", "Aliment", "L", 7, "Laiterie Régionale", 6, 105.0, 24.7, 0.05),
+    ("Yaourt nature", "Aliment", "kg", 7, "Laiterie Régionale", 13, 84.0, 7.9, 0.10),
+    ("Fromage frais", "Aliment", "kg", 6, "Fromagerie du Mont", 6, 21.0, 4.6, 0.10),
+    ("Beurre", "Aliment", "kg", 7, "Laiterie Régionale", 26, 35.0, 3.3, 0.10),
+    ("Viande de boeuf", "Aliment", "kg", 8, "Boucherie Centrale", 4, 35.0, 5.9, 0.15),
+    ("Légumes frais", "Aliment", "kg", 10, "Maraîcher Local", 8, 210.0, 16.4, 0.10),
+    ("Fruits frais", "Aliment", "kg", 10, "Maraîcher Local", 8, 175.0, 12.6, 0.10),
+    ("Oeufs", "Aliment", "unité", 11, "Ferme Avicole", 24, 560.0, 52.1, 0.10),
+    ("Riz", "Aliment", "kg", 14, "Épicerie Grossiste", 261, 210.0, 10.7, 0.07),
+    ("Pâtes", "Aliment", "kg", 14, "Épicerie Grossiste", 258, 168.0, 8.6, 0.08),
+    ("Huile végétale", "Aliment", "L", 14, "Épicerie Grossiste", 246, 70.0, 3.4, 0.09),
+    ("Farine", "Aliment", "kg", 15, "Minoterie Régionale", 144, 112.0, 5.5, 0.08),
+    ("Détergent sol", "Entretien", "L", 18, "Hygiène Pro", 548, 86.0, 2.7, 0.30),
+    ("Désinfectant", "Entretien", "L", 18, "Hygiène Pro", 530, 106.0, 4.0, 0.30),
+    ("Savon liquide", "Entretien", "L", 18, "Hygiène Pro", 565, 112.0, 5.8, 0.30),
+]
+
+# Profil hebdomadaire (lundi → dimanche) par type de produit
+PROFIL_HEBDO = {
+    "Aliment": np.array([1.05, 1.05, 1.0, 1.05, 1.05, 0.9, 0.9]),
+    "Entretien": np.array([1.2, 1.2, 1.1, 1.2, 1.2, 0.6, 0.5]),
+}
+
+# Vacances scolaires (zone C, approximatives) : (mois, jour) de début et de fin
+VACANCES = [((1, 1), (1, 3)), ((2, 10), (2, 25)), ((4, 12), (4, 27)),
+            ((7, 6), (9, 1)), ((10, 19), (11, 3)), ((12, 20), (12, 31))]
+
+JOURS_FERIES_FIXES = [(1, 1), (5, 1), (5, 8), (7, 14), (8, 15), (11, 1), (11, 11), (12, 25)]
+
+COVID = [("2020-03-15", "2020-06-30"), ("2020-10-30", "2021-06-30")]
+
+# Nombre maximum de lots actifs par série
+MAX_LOTS = 8
+
+
+def paques(annee):
+    """Date de Pâques (algorithme de Meeus/Jones/Butcher)"""
+    a, b, c = annee % 19, annee // 100, annee % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mois = (h + l - 7 * m + 114) // 31
+    jour = (h + l - 7 * m + 114) % 31 + 1
+    return date(annee, mois, jour)
+
+
+def calendar_flags(dates):
+    """
+    Drapeaux calendaires communs à tous les sites
+
+    Returns:
+        dict: jour_ferie, vacances_scolaires, covid_impact (tableaux 0/1)
+    """
+    dates = pd.DatetimeIndex(dates)
+    feries = set()
+    for annee in range(dates.year.min(), dates.year.max() + 1):
+        feries.update(date(annee, m, j) for m, j in JOURS_FERIES_FIXES)
+        p = paques(annee)
+        feries.update([p + timedelta(days=1), p + timedelta(days=39), p + timedelta(days=50)])
+
+    mmdd = dates.month * 100 + dates.day
+    vacances = np.zeros(len(dates), dtype=bool)
+    for (m1, j1), (m2, j2) in VACANCES:
+        vacances |= (mmdd >= m1 * 100 + j1) & (mmdd <= m2 * 100 + j2)
+
+    covid = np.zeros(len(dates), dtype=bool)
+    for debut, fin in COVID:
+        covid |= (dates >= debut) & (dates <= fin)
+
+    return {
+        "jour_ferie": np.isin(dates.date, list(feries)).astype(np.int8),
+        "vacances_scolaires": vacances.astype(np.int8),
+        "covid_impact": covid.astype(np.int8),
+    }
+
+
+def site_regressors(dates, n_sites, rng):
+    """
+    Régresseurs quotidiens de chaque site (mêmes plages que le dataset enrichi)
+
+    Returns:
+        dict: {colonne: matrice (jours × sites)}
+    """
+    n_days = len(dates)
+    doy = np.asarray(pd.DatetimeIndex(dates).dayofyear)[:, None]
+    dow = np.asarray(pd.DatetimeIndex(dates).dayofweek)[:, None]
+    saison = np.cos(2 * np.pi * (doy - 200) / 365.25)   # +1 fin juillet, -1 fin janvier
+
+    temperature = (15 + rng.normal(0, 1.5, n_sites) + 11 * saison
+                   + rng.normal(0, 3, (n_days, n_sites)))
+
+    # Épidémie de grippe : 6 à 10 semaines par hiver, début variable
+    grippe = np.zeros((n_days, n_sites), dtype=np.int8)
+    months = np.asarray(pd.DatetimeIndex(dates).month)
+    years = np.asarray(pd.DatetimeIndex(dates).year)
+    for annee in np.unique(years):
+        debut = pd.Timestamp(f"{annee}-01-01") - pd.Timedelta(days=int(rng.integers(0, 45)))
+        fin = debut + pd.Timedelta(weeks=int(rng.integers(6, 11)))
+        grippe[(pd.DatetimeIndex(dates) >= debut) & (pd.DatetimeIndex(dates) < fin)] = 1
+    grippe[(months >= 4) & (months <= 10)] = 0
+
+    occupation = (77 - 6 * saison + 4 * grippe - 3 * (dow >= 5)
+                  + rng.normal(0, 4, (n_days, n_sites)))
+    occupation = np.clip(occupation, 50, 100)
+    patients = np.round(occupation * 2.5 + rng.normal(0, 6, (n_days, n_sites)))
+
+    return {
+        "temperature": np.clip(temperature, -5, 35).round(1),
+        "taux_occupation": occupation.round(1),
+        "nb_patients": np.clip(patients, 125, 250).astype(np.int64),
+        "epidemie_grippe": grippe,
+    }
+
+
+def catalogue(n_produits):
+    """
+    Produits générés : le catalogue de référence, puis des variantes
+    ("Poulet frais 2"...) de mêmes caractéristiques
+
+    Returns:
+        DataFrame: Une ligne par produit
+    """
+    rows = []
+    for i in range(n_produits):
+        nom, type_p, unite, id_f, fournisseur, vie, lot, conso, zeros = CATALOGUE[i % len(CATALOGUE)]
+        variante = i // len(CATALOGUE)
+        rows.append({
+            "id_produit": i + 1,
+            "nom_produit": nom if variante == 0 else f"{nom} {variante + 1}",
+            "type_produit": type_p, "unite": unite,
+            "id_fournisseur": id_f, "nom_fournisseur": fournisseur,
+            "duree_vie": vie, "taille_lot": lot, "conso_jour": conso, "part_zeros": zeros,
+        })
+    return pd.DataFrame(rows)
+
+
+def demand_matrix(produits, dates, n_sites, regresseurs, flags, rng):
+    """
+    Demande quotidienne de chaque série (jours × séries, série = site × produit)
+
+    Saisonnalités hebdomadaire et annuelle, effets d'occupation, de grippe,
+    de jours fériés et de COVID, bruit gamma et jours sans consommation.
+    """
+    n_prod = len(produits)
+    dow = np.asarray(pd.DatetimeIndex(dates).dayofweek)
+    doy = np.asarray(pd.DatetimeIndex(dates).dayofyear)
+
+    entretien = (produits['type_produit'] == "Entretien").to_numpy()
+    hebdo = np.where(entretien[None, :], PROFIL_HEBDO["Entretien"][dow][:, None],
+                     PROFIL_HEBDO["Aliment"][dow][:, None])                     # jours × produits
+    amplitude = rng.uniform(0.05, 0.3, n_prod)
+    phase = rng.uniform(0, 365, n_prod)
+    annuel = 1 + amplitude * np.cos(2 * np.pi * (doy[:, None] - phase) / 365.25)
+    base = produits['conso_jour'].to_numpy() * rng.uniform(0.8, 1.2, n_prod)
+    zeros = produits['part_zeros'].to_numpy()
+
+    calendrier = (1 - 0.3 * flags["jour_ferie"] - 0.15 * flags["covid_impact"])[:, None]
+
+    series = []
+    for site in range(n_sites):
+        taille = rng.uniform(0.6, 1.4)
+        occupation = (regresseurs["taux_occupation"][:, site] / 77)[:, None]
+        grippe = regresseurs["epidemie_grippe"][:, site][:, None]
+        effet_grippe = 1 + np.where(entretien, 0.25, 0.05)[None, :] * grippe
+        mu = taille * base * hebdo * annuel * occupation * effet_grippe * calendrier
+        realise = rng.gamma(4.0, mu / 4.0)
+        realise[rng.random(mu.shape) < zeros] = 0.0
+        series.append(realise.round(2))
+    return np.concatenate(series, axis=1)
+
+
+def simulate_stock(demande, vie, taille_lot, conso, rng):
+    """
+    Simule les lots de chaque série jour par jour (vectorisé sur les séries)
+
+    Ordre des opérations d'une journée : destruction des lots arrivés à
+    péremption, entrée d'un lot si le stock est sous le seuil, puis
+    consommation FEFO (un mouvement par lot entamé). La demande non servie
+    est perdue.
+
+    Args:
+        demande: Matrice (jours × séries)
+        vie: Durée de vie par série (jours)
+        taille_lot: Taille de lot par série
+        conso: Consommation moyenne par série (fixe le seuil de commande)
+
+    Returns:
+        dict: Tableaux des mouvements (jour, serie, operation, quantite,
+        lot, expiration, stock) ; operation : 0 entrée, 1 consommation,
+        2 destruction
+    """
+    n_days, n_series = demande.shape
+    qty = np.zeros((n_series, MAX_LOTS))
+    exp = np.full((n_series, MAX_LOTS), np.iinfo(np.int64).max)
+    lot_id = np.zeros((n_series, MAX_LOTS), dtype=np.int64)
+    seuil = conso * np.minimum(vie, 3)
+    rows = {k: [] for k in ("jour", "serie", "operation", "quantite", "lot", "expiration", "stock")}
+    next_lot = 1
+    series_idx = np.arange(n_series)
+
+    def emit(jour, serie, op, quantite, lot, expiration, stock):
+        rows["jour"].append(np.full(len(serie), jour, dtype=np.int32))
+        rows["serie"].append(serie.astype(np.int32))
+        rows["operation"].append(np.full(len(serie), op, dtype=np.int8))
+        rows["quantite"].append(quantite)
+        rows["lot"].append(lot)
+        rows["expiration"].append(expiration)
+        rows["stock"].append(stock)
+
+    for d in range(n_days):
+        stock = qty.sum(axis=1)
+
+        # Destruction des lots arrivés à péremption
+        perimes = (qty > 0) & (exp <= d)
+        if perimes.any():
+            s, k = np.nonzero(perimes)
+            # Stock après chaque destruction (plusieurs lots possibles par série)
+            detruit = np.where(perimes, qty, 0.0).cumsum(axis=1)[s, k]
+            emit(d, s, 2, qty[s, k], lot_id[s, k], exp[s, k], stock[s] - detruit)
+            qty[perimes] = 0.0
+            exp[perimes] = np.iinfo(np.int64).max
+            stock = qty.sum(axis=1)
+
+        # Entrée d'un lot dans un emplacement libre
+        libre = qty == 0
+        commande = (stock < seuil) & libre.any(axis=1)
+        if commande.any():
+            s = series_idx[commande]
+            k = libre[s].argmax(axis=1)
+            quantite = (taille_lot[s] * rng.uniform(0.9, 1.1, len(s))).round(2)
+            qty[s, k] = quantite
+            exp[s, k] = d + np.maximum(vie[s] + rng.integers(-1, 2, len(s)), 1)
+            lot_id[s, k] = next_lot + np.arange(len(s))
+            next_lot += len(s)
+            stock = stock.copy()
+            stock[s] += quantite
+            emit(d, s, 0, quantite, lot_id[s, k], exp[s, k], stock[s])
+
+        # Consommation FEFO : lots triés par date de péremption
+        reste = demande[d].copy()
+        if (reste > 0).any():
+            order = np.argsort(exp, axis=1, kind='stable')
+            for rank in range(MAX_LOTS):
+                k = order[:, rank]
+                disponible = qty[series_idx, k]
+                prise = np.minimum(reste, disponible).round(2)
+                s = np.nonzero(prise > 0)[0]
+                if len(s) == 0:
+                    if not (reste > 0).any():
+                        break
+                    continue
+                qty[s, k[s]] = (qty[s, k[s]] - prise[s]).round(2)
+                reste[s] -= prise[s]
+                stock[s] = (stock[s] - prise[s]).round(2)
+                emit(d, s, 1, prise[s], lot_id[s, k[s]], exp[s, k[s]], stock[s])
+                # Reliquats d'arrondi : un lot vidé libère son emplacement
+                vide = qty[s, k[s]] <= 0
+                qty[s[vide], k[s][vide]] = 0.0
+                exp[s[vide], k[s][vide]] = np.iinfo(np.int64).max
+
+    return {k: np.concatenate(v) if v else np.array([]) for k, v in rows.items()}
+
+
+def generate_ledger(n_produits=len(CATALOGUE), n_sites=1, debut=DEBUT, fin=FIN, seed=0,
+                    verbose=True):
+    """
+    Génère un ledger synthétique au schéma du dataset enrichi
+
+    Args:
+        n_produits: Nombre de produits par site
+        n_sites: Nombre de sites (colonne `site` ajoutée si plusieurs)
+        debut: Première date
+        fin: Dernière date
+        seed: Graine (même graine -> même ledger)
+        verbose: Afficher la progression
+
+    Returns:
+        DataFrame: Ledger trié par date (colonnes du dataset enrichi)
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(debut, fin, freq='D')
+    produits = catalogue(n_produits)
+
+    flags = calendar_flags(dates)
+    regresseurs = site_regressors(dates, n_sites, rng)
+    demande = demand_matrix(produits, dates, n_sites, regresseurs, flags, rng)
+
+    # Série = site × produit (colonnes de `demande`)
+    serie_produit = np.tile(np.arange(n_produits), n_sites)
+    serie_site = np.repeat(np.arange(n_sites), n_produits)
+    vie = produits['duree_vie'].to_numpy()[serie_produit]
+    lot = produits['taille_lot'].to_numpy()[serie_produit]
+    conso = demande.mean(axis=0)
+
+    m = simulate_stock(demande, vie, lot, conso, rng)
+
+    # Tri par date puis série ; lexsort est stable : l'ordre des mouvements
+    # d'une journée (destruction, entrée, consommations) est conservé
+    order = np.lexsort((m["serie"], m["jour"]))
+    m = {k: v[order] for k, v in m.items()}
+    jour, serie, operation = m["jour"], m["serie"], m["operation"]
+    p = serie_produit[serie]
+    site = serie_site[serie]
+
+    def from_products(col):
+        values = produits[col].to_numpy()[p]
+        return pd.Categorical(values) if values.dtype == object else values
+
+    type_sortie = np.array([None, "CONSOMMATION", "DESTRUCTION"], dtype=object)[operation]
+    temperature_stockage = np.where(
+        produits['type_produit'].to_numpy()[p] == "Entretien", np.nan,
+        rng.uniform(2.0, 8.0, len(p)).round(1)
+    )
+
+    df = pd.DataFrame({
+        "date": dates[jour],
+        "id_produit": produits['id_produit'].to_numpy()[p],
+        "nom_produit": from_products('nom_produit'),
+        "type_produit": from_products('type_produit'),
+        "type_operation": pd.Categorical(np.where(operation == 0, "ENTREE", "SORTIE")),
+        "type_sortie": pd.Categorical(type_sortie),
+        "quantite": m["quantite"],
+        "unite": from_products('unite'),
+        "id_lot": m["lot"],
+        "id_arrivage": m["lot"],
+        "id_fournisseur": produits['id_fournisseur'].to_numpy()[p],
+        "nom_fournisseur": from_products('nom_fournisseur'),
+        "date_expiration": dates[0] + pd.to_timedelta(m["expiration"], unit='D'),
+        "stock_theorique": np.maximum(m["stock"], 0.0).round(2),
+        "temperature_stockage": temperature_stockage,
+    })
+    for col, matrix in regresseurs.items():
+        df[col] = matrix[jour, site]
+    for col, values in flags.items():
+        df[col] = values[jour]
+    if n_sites > 1:
+        df.insert(1, "site", pd.Categorical([f"Site {s + 1}" for s in range(n_sites)])[site])
+
+    if verbose:
+        print(f"✅ Ledger synthétique : {len(df):,} lignes, {n_produits} produit(s) × "
+              f"{n_sites} site(s), {dates[0].date()} → {dates[-1].date()}")
+    return df
+
+
+def write_ledger(df, path, chunksize=500_000):
+    """Écrit le ledger au format CSV du dataset (dates ISO)"""
+    df.to_csv(path, index=False, date_format='%Y-%m-%d', chunksize=chunksize)
+
+
+def main(args):
+    """Génération en ligne de commande (voir cli.add_generate_arguments)"""
+    import time
+
+    start = time.perf_counter()
+    df = generate_ledger(args.produits, args.sites, args.debut, args.fin, args.seed)
+    write_ledger(df, args.output)
+    print(f"✅ {args.output} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_generate_arguments
+
+    parser = argparse.ArgumentParser(description="Générateur de ledger synthétique")
+    add_generate_arguments(parser)
+    main(parser.parse_args())
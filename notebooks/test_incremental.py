@@ -0,0 +1,118 @@
+"""
+Tests du mode incrémental : une exécution interrompue ne compte pas deux
+fois les mêmes lignes, et les agrégats incrémentaux et en streaming sont
+identiques à une reconstruction complète.
+
+Usage:
+    cd notebooks && python -m pytest -q test_incremental.py
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from data_loader import read_stock_csv
+from data_validation import DataValidator
+from demand_matrix import DemandAccumulator, build_demand_matrix, build_demand_matrix_streaming
+from incremental import STATE_FILENAME, config_key, ingest, refresh
+from synthetic_ledger import generate_ledger, write_ledger
+
+
+@pytest.fixture(scope="module")
+def ledger_lines(tmp_path_factory):
+    """Lignes d'un petit ledger synthétique (en-tête, lignes de données)"""
+    path = tmp_path_factory.mktemp("ledger") / "complet.csv"
+    write_ledger(generate_ledger(n_produits=4, debut="2023-01-01", fin="2023-12-31",
+                                 verbose=False), path)
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    return lines[0], lines[1:]
+
+
+def _write(path, header, lines):
+    path.write_text(header + "".join(lines), encoding="utf-8")
+
+
+def _append(path, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+def _committed(state_dir):
+    """Agrégats et validateur référencés par state.json"""
+    state = json.loads((state_dir / STATE_FILENAME).read_text(encoding="utf-8"))
+    fichiers = state["fichiers"]
+    validator = (DataValidator.load(state_dir / fichiers["validation"])
+                 if fichiers["validation"] else None)
+    return DemandAccumulator.load(state_dir / fichiers["aggregat"]), validator
+
+
+def assert_same_matrix(a, b):
+    assert a.products == b.products
+    assert a.dates.equals(b.dates)
+    np.testing.assert_allclose(a.quantite, b.quantite)
+    np.testing.assert_array_equal(a.debut, b.debut)
+    np.testing.assert_array_equal(a.fin, b.fin)
+    np.testing.assert_array_equal(a.nb_sorties, b.nb_sorties)
+    assert a.regresseurs.keys() == b.regresseurs.keys()
+    for col in a.regresseurs:
+        np.testing.assert_allclose(a.regresseurs[col], b.regresseurs[col], equal_nan=True)
+
+
+def test_streaming_and_incremental_match_rebuild(tmp_path, ledger_lines):
+    header, lines = ledger_lines
+    complet = tmp_path / "complet.csv"
+    _write(complet, header, lines)
+    expected = build_demand_matrix(read_stock_csv(complet))
+
+    assert_same_matrix(build_demand_matrix_streaming(complet, chunksize=997, verbose=False),
+                       expected)
+
+    # Trois exécutions quotidiennes sur un CSV complété entre chacune
+    csv_path, state_dir = tmp_path / "ledger.csv", tmp_path / "state"
+    coupures = [len(lines) // 3, 2 * len(lines) // 3, len(lines)]
+    _write(csv_path, header, lines[:coupures[0]])
+    for debut, fin in zip([0] + coupures, coupures):
+        _append(csv_path, lines[debut:fin] if debut else [])
+        refresh(csv_path, state_dir, methode="baseline", chunksize=997, verbose=False)
+
+    accumulator, _ = _committed(state_dir)
+    assert_same_matrix(accumulator.to_matrix(), expected)
+
+
+@pytest.mark.parametrize("validation", [None, "signaler"])
+def test_interrupted_run_does_not_double_count(tmp_path, ledger_lines, validation):
+    header, lines = ledger_lines
+    csv_path, state_dir = tmp_path / "ledger.csv", tmp_path / "state"
+    moitie = len(lines) // 2
+    _write(csv_path, header, lines[:moitie])
+    refresh(csv_path, state_dir, methode="baseline", validation=validation, verbose=False)
+
+    # Exécution interrompue entre l'ingestion et l'écriture de state.json
+    _append(csv_path, lines[moitie:])
+    key = config_key(csv_path, "baseline", 28, validation=validation)
+    ingest(csv_path, state_dir, key, validation=validation, verbose=False)
+
+    _, report, validator = refresh(csv_path, state_dir, methode="baseline",
+                                   validation=validation, verbose=False)
+    assert len(report) > 0
+
+    accumulator, committed_validator = _committed(state_dir)
+    assert_same_matrix(accumulator.to_matrix(), build_demand_matrix(read_stock_csv(csv_path)))
+
+    # Seul l'état validé reste sur disque
+    assert sorted(p.name for p in state_dir.glob("aggregat.*.pkl")) == [
+        json.loads((state_dir / STATE_FILENAME).read_text())["fichiers"]["aggregat"]
+    ]
+
+    if validation is not None:
+        # Les sorties des lots ne sont pas comptées deux fois
+        rebuild_dir = tmp_path / "rebuild"
+        _, _, rebuild_validator = refresh(csv_path, rebuild_dir, methode="baseline",
+                                          validation=validation, verbose=False)
+        _, rebuild_state = _committed(rebuild_dir)
+        assert validator.counts().get("sortie_depasse_solde", 0) <= \
+            rebuild_validator.counts().get("sortie_depasse_solde", 0)
+        assert committed_validator.lots.sort_values(list(committed_validator.lots.columns),
+                                                    ignore_index=True).equals(
+            rebuild_state.lots.sort_values(list(rebuild_state.lots.columns), ignore_index=True))
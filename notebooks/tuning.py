@@ -0,0 +1,419 @@
+"""
+Tuning - Recherche parallèle des paramètres Prophet par produit ou famille
+Chaque candidat (configuration Prophet) est évalué par backtest à origine
+glissante sur les derniers cutoffs de chaque produit. Les évaluations sont
+réparties sur un pool de processus et mémorisées sur disque par (données,
+configuration, protocole) : relancer une recherche ne réévalue que les
+candidats nouveaux ou les produits dont l'historique a changé.
+
+Usage:
+    python cli.py tune --produits "Poulet frais" --recherche grille
+    python cli.py tune --produits all --par famille --candidats 24
+    python cli.py forecast --produits all --configs-tunees
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backtest import INITIAL_JOURS, add_errors, backtest_metrics, make_cutoffs, split_at_cutoff
+from defaults import CRITERES, NB_CANDIDATS, NB_CUTOFFS, PERIODE_TUNING
+from forecasting import (
+    HORIZON_JOURS, PROPHET_CONFIG, REGRESSEURS_PROPHET, changepoints_within, init_worker,
+    make_prophet_model, regressors_in,
+)
+from holiday_calendar import HolidayCalendar, shared_calendar
+from model_store import frame_digest
+
+
+# Version du protocole d'évaluation : à incrémenter si le calcul des
+# métriques change (invalide les évaluations mémorisées)
+TUNING_VERSION = 1
+
+# Espace de recherche : paramètre Prophet -> valeurs candidates
+ESPACE_RECHERCHE = {
+    'changepoint_prior_scale': [0.01, 0.05, 0.1, 0.5],
+    'seasonality_prior_scale': [1.0, 10.0],
+    'seasonality_mode': ['additive', 'multiplicative'],
+    'yearly_seasonality': [10, 20],
+    'regressors_prior_scale': [0.1, 0.5],
+}
+
+CONFIGS_FILENAME = "meilleures_configs.json"
+
+
+def default_config():
+    """Configuration actuelle du projet, exprimée dans l'espace de recherche"""
+    config = {param: PROPHET_CONFIG[param] for param in ESPACE_RECHERCHE if param in PROPHET_CONFIG}
+    if 'regressors_prior_scale' in ESPACE_RECHERCHE:
+        config['regressors_prior_scale'] = None  # prior_scale propres à chaque régresseur
+    return config
+
+
+def candidates(espace=None, recherche="aleatoire", n=NB_CANDIDATS, seed=0):
+    """
+    Configurations à évaluer (la configuration actuelle toujours en premier)
+
+    Args:
+        espace: {paramètre: valeurs} (défaut : ESPACE_RECHERCHE)
+        recherche: "grille" (toutes les combinaisons) ou "aleatoire"
+        n: Nombre de combinaisons tirées en recherche aléatoire
+        seed: Graine du tirage
+
+    Returns:
+        List[dict]: Configurations (paramètres remplaçant PROPHET_CONFIG)
+    """
+    espace = ESPACE_RECHERCHE if espace is None else espace
+    params = list(espace)
+    grid = [dict(zip(params, values)) for values in itertools.product(*espace.values())]
+    if recherche == "aleatoire":
+        grid = random.Random(seed).sample(grid, min(n, len(grid)))
+    elif recherche != "grille":
+        raise ValueError(f"Recherche inconnue : {recherche} (grille ou aleatoire)")
+
+    reference = default_config()
+    return [reference] + [c for c in grid if c != reference]
+
+
+def evaluation_key(prophet_df, config, horizon, period, nb_cutoffs, changepoints, holidays):
+    """
+    Clé d'une évaluation : données du produit, holidays (fenêtres comprises),
+    configuration complète et protocole de backtest
+
+    Returns:
+        str: Hash SHA-256 hexadécimal
+    """
+    payload = {
+        "version": TUNING_VERSION,
+        "data": frame_digest(prophet_df),
+        "holidays": frame_digest(holidays),
+        "config": {**PROPHET_CONFIG, **config},
+        "regresseurs": {k: list(v) for k, v in REGRESSEURS_PROPHET.items()},
+        "changepoints": [str(pd.Timestamp(cp).date()) for cp in changepoints],
+        "protocole": [horizon, period, nb_cutoffs, INITIAL_JOURS],
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class EvaluationMemo:
+    """Évaluations déjà calculées, une petite fiche JSON par clé"""
+
+    def __init__(self, memo_dir):
+        self.memo_dir = Path(memo_dir)
+        self.memo_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_results_manager(cls, results_mgr):
+        """Mémo dans results/_tuning"""
+        return cls(results_mgr.get_store_dir("tuning") / "evaluations")
+
+    def _path(self, key):
+        return self.memo_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, evaluation):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(evaluation, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+
+def _evaluate_task(produit, prophet_df, config, horizon, period, nb_cutoffs, changepoints):
+    """
+    Backtest d'un candidat sur un produit (exécuté dans un worker) :
+    derniers nb_cutoffs cutoffs, prédictions ponctuelles seulement
+
+    Returns:
+        dict: MAPE, WAPE, MAE, RMSE, cutoffs, duree_s (ou erreur)
+    """
+    start = time.perf_counter()
+    try:
+        holidays = shared_calendar().holidays
+        regressors = regressors_in(prophet_df)
+        cutoffs = make_cutoffs(prophet_df['ds'], horizon, period, INITIAL_JOURS)[-nb_cutoffs:]
+        if not cutoffs:
+            raise ValueError("historique trop court pour le backtest")
+
+        frames = []
+        for cutoff in cutoffs:
+            train, test = split_at_cutoff(prophet_df, cutoff, horizon)
+            model = make_prophet_model(holidays, changepoints_within(changepoints, train),
+                                       regressors, uncertainty_samples=0, **config)
+            model.fit(train)
+            frames.append(pd.DataFrame({
+                'produit': produit, 'cutoff': cutoff, 'ds': test['ds'].to_numpy(),
+                'y': test['y'].to_numpy(), 'yhat': model.predict(test)['yhat'].to_numpy(),
+            }))
+
+        backtest_df = add_errors(pd.concat(frames, ignore_index=True))
+        metrics = backtest_metrics(backtest_df, by=['produit']).iloc[0]
+        total = float(backtest_df['y'].abs().sum())
+        return {
+            "MAPE": float(metrics['MAPE']),
+            "WAPE": float(backtest_df['erreur_abs'].sum() / total * 100) if total else None,
+            "MAE": float(metrics['MAE']),
+            "RMSE": float(metrics['RMSE']),
+            "cutoffs": len(cutoffs),
+            "duree_s": round(time.perf_counter() - start, 2),
+        }
+    except Exception as e:
+        return {"erreur": f"{type(e).__name__}: {e}", "duree_s": round(time.perf_counter() - start, 2)}
+
+
+def _config_label(config):
+    return ", ".join(f"{k}={v}" for k, v in config.items())
+
+
+def run_search(frames, configs, horizon=HORIZON_JOURS, period=PERIODE_TUNING,
+               nb_cutoffs=NB_CUTOFFS, changepoints=None, memo=None, n_workers=None,
+               calendar=None, verbose=True):
+    """
+    Évalue chaque configuration sur chaque produit, en parallèle
+
+    Args:
+        frames: {produit: série Prophet (ds, y, régresseurs)}
+        configs: Configurations candidates (voir candidates)
+        horizon: Jours prédits après chaque cutoff
+        period: Écart entre deux cutoffs
+        nb_cutoffs: Nombre de cutoffs (les plus récents)
+        changepoints: Changepoints manuels (défaut : ceux du calendrier)
+        memo: EvaluationMemo (optionnel) : seules les évaluations absentes
+            sont calculées
+        n_workers: Nombre de processus (défaut : nombre de CPU)
+        calendar: HolidayCalendar commun aux produits (défaut : construit
+            sur toutes les séries de `frames`)
+        verbose: Afficher la progression
+
+    Returns:
+        DataFrame: Une ligne par (produit, candidat) : candidat, config,
+        métriques, memo (évaluation reprise du disque)
+    """
+    calendar = HolidayCalendar.from_frames(frames) if calendar is None else calendar
+    changepoints = calendar.changepoints if changepoints is None else changepoints
+    rows, tasks = [], []
+    for produit, prophet_df in frames.items():
+        for i, config in enumerate(configs):
+            key = evaluation_key(prophet_df, config, horizon, period, nb_cutoffs, changepoints,
+                                 calendar.holidays)
+            row = {"produit": produit, "candidat": i, "config": config, "cle": key}
+            cached = memo.get(key) if memo is not None else None
+            if cached is not None:
+                rows.append({**row, **cached, "memo": True})
+            else:
+                tasks.append((row, (produit, prophet_df, config, horizon, period, nb_cutoffs,
+                                    changepoints)))
+
+    if verbose:
+        print(f"🎛️  {len(frames)} produit(s) × {len(configs)} candidat(s) : "
+              f"{len(rows)} évaluation(s) mémorisée(s), {len(tasks)} à calculer")
+
+    if tasks:
+        n_workers = min(n_workers or os.cpu_count() or 1, len(tasks))
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker,
+                                 initargs=(calendar,)) as pool:
+            futures = {pool.submit(_evaluate_task, *args): row for row, args in tasks}
+            for i, future in enumerate(as_completed(futures), 1):
+                row, evaluation = futures[future], future.result()
+                if memo is not None and "erreur" not in evaluation:
+                    memo.put(row["cle"], evaluation)
+                rows.append({**row, **evaluation, "memo": False})
+                if verbose and (i % 10 == 0 or i == len(futures)):
+                    print(f"   ⏳ {i}/{len(futures)} évaluations ({time.perf_counter() - start:.1f}s)")
+
+    columns = ["produit", "candidat", "config", "cle", *CRITERES, "cutoffs", "duree_s",
+               "memo", "erreur"]
+    results = pd.DataFrame(rows).reindex(columns=columns)
+    return results.sort_values(['produit', 'candidat'], ignore_index=True)
+
+
+def best_configs(results, critere="WAPE", familles=None):
+    """
+    Meilleure configuration par produit, ou par famille de produits
+
+    En mode famille, chaque candidat est classé sur la moyenne du critère
+    sur les produits de la famille (critères relatifs, MAPE ou WAPE,
+    conseillés : MAE et RMSE dépendent de l'échelle de chaque produit).
+
+    Args:
+        results: Résultat de run_search
+        critere: Colonne minimisée (voir CRITERES)
+        familles: {produit: famille} (optionnel)
+
+    Returns:
+        dict: {produit: {config, groupe, critere, score, reference, gain_pct}}
+    """
+    df = results.dropna(subset=[critere]).copy()
+    df['groupe'] = df['produit'].map(familles).fillna(df['produit']) if familles else df['produit']
+    scores = df.groupby(['groupe', 'candidat'])[critere].mean().reset_index()
+
+    best = {}
+    for groupe, rows in scores.groupby('groupe', sort=False):
+        winner = rows.loc[rows[critere].idxmin()]
+        reference = rows.loc[rows['candidat'] == 0, critere]
+        reference = float(reference.iloc[0]) if len(reference) else None
+        score = float(winner[critere])
+        config = df.loc[df['candidat'] == winner['candidat'], 'config'].iloc[0]
+        for produit in df.loc[df['groupe'] == groupe, 'produit'].unique():
+            best[produit] = {
+                "config": {k: v for k, v in config.items() if v is not None},
+                "groupe": groupe,
+                "critere": critere,
+                "score": round(score, 3),
+                "reference": None if reference is None else round(reference, 3),
+                "gain_pct": (None if not reference else
+                             round((reference - score) / reference * 100, 1)),
+            }
+    return best
+
+
+def load_best_configs(results_mgr):
+    """
+    Configurations retenues par les recherches (results/_tuning)
+
+    Returns:
+        dict: {produit: paramètres Prophet} (vide si aucune recherche)
+    """
+    path = results_mgr.get_store_dir("tuning") / CONFIGS_FILENAME
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return {produit: entry["config"] for produit, entry in json.load(f).items()}
+
+
+def save_best_configs(results_mgr, best):
+    """
+    Met à jour les configurations retenues (results/_tuning) : seuls les
+    produits de cette recherche sont remplacés, les autres sont conservés
+
+    Returns:
+        dict: Toutes les configurations enregistrées
+    """
+    path = results_mgr.get_store_dir("tuning") / CONFIGS_FILENAME
+    configs = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+    configs.update(best)
+
+    # Écriture atomique : un arrêt pendant l'écriture ne perd pas les configurations
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(configs, f, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+    return configs
+
+
+def product_families(csv_path):
+    """
+    Famille (type_produit) de chaque produit, lue en streaming
+
+    Returns:
+        dict: {produit: famille}
+    """
+    from data_loader import iter_stock_chunks
+
+    familles = {}
+    for chunk in iter_stock_chunks(csv_path, columns=['nom_produit', 'type_produit']):
+        pairs = chunk.drop_duplicates()
+        familles.update(zip(pairs['nom_produit'].astype(str), pairs['type_produit'].astype(str)))
+    return familles
+
+
+def main(args):
+    """Recherche en ligne de commande (voir cli.add_tune_arguments)"""
+    from batch_forecast import resolve_products
+    from demand_matrix import load_demand_matrix
+    from forecasting import PROPHET_AVAILABLE
+    from holiday_calendar import calendar_for
+
+    if not PROPHET_AVAILABLE:
+        print("❌ Prophet non disponible : rien à régler (pip install prophet)")
+        raise SystemExit(1)
+
+    try:
+        from results_manager import ResultsManager
+        results_mgr = ResultsManager()
+    except ImportError:
+        results_mgr = None
+
+    def output(filename):
+        return results_mgr.output_path(filename) if results_mgr is not None else Path(filename)
+
+    demand = load_demand_matrix(args.csv, chunksize=args.chunksize)
+    produits = resolve_products(demand, args.produits)
+    familles = product_families(args.csv) if args.par == "famille" else None
+
+    memo = None
+    if not args.no_cache:
+        memo = (EvaluationMemo.from_results_manager(results_mgr) if results_mgr is not None
+                else EvaluationMemo(Path("_tuning") / "evaluations"))
+
+    configs = candidates(recherche=args.recherche, n=args.candidats, seed=args.seed)
+    start = time.perf_counter()
+    results = run_search({p: demand.prophet_frame(p) for p in produits}, configs,
+                         horizon=args.horizon, period=args.period, nb_cutoffs=args.cutoffs,
+                         memo=memo, n_workers=args.workers,
+                         calendar=calendar_for(demand, fenetres=dict(args.fenetre or [])))
+    duree = time.perf_counter() - start
+
+    best = best_configs(results, args.critere, familles)
+    print(f"\n🏆 MEILLEURES CONFIGURATIONS ({args.critere}, {duree:.1f}s)")
+    for produit, entry in best.items():
+        reference = f"{entry['reference']:.2f}" if entry['reference'] is not None else "-"
+        gain = f"{entry['gain_pct']:+.1f}%" if entry['gain_pct'] is not None else "-"
+        print(f"   {produit:25s} {entry['score']:8.2f} (actuelle {reference}, {gain})  "
+              f"{_config_label(entry['config'])}")
+
+    table = results.assign(config=results['config'].map(_config_label))
+    filename_csv = output('tuning_resultats.csv')
+    table.drop(columns='cle').to_csv(filename_csv, index=False)
+    filename_json = output('tuning_meilleures_configs.json')
+    with open(filename_json, 'w', encoding='utf-8') as f:
+        json.dump(best, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\n✅ {filename_csv}")
+    print(f"✅ {filename_json}")
+
+    if results_mgr is not None:
+        # Configurations utilisées par `forecast --configs-tunees`
+        configs_enregistrees = save_best_configs(results_mgr, best)
+        print(f"✅ {len(configs_enregistrees)} configuration(s) enregistrée(s) pour --configs-tunees")
+
+        gains = [e['gain_pct'] for e in best.values() if e['gain_pct'] is not None]
+        results_mgr.create_summary_file(f"Tuning ({len(produits)} produits)", {
+            "Candidats": len(configs),
+            "Évaluations mémorisées": int(results['memo'].sum()),
+            "Critère": args.critere,
+            "Gain médian": f"{np.median(gains):.1f}%" if gains else "N/A",
+            "Durée": f"{duree:.1f}s",
+        })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from cli import add_tune_arguments
+
+    parser = argparse.ArgumentParser(description="Recherche des paramètres Prophet")
+    add_tune_arguments(parser)
+    main(parser.parse_args())